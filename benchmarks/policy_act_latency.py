@@ -0,0 +1,59 @@
+"""
+Benchmark the per-step latency of sampling a single action from a policy.
+
+We compare the default call ``pi(s, return_logp=True)``, which dispatches the preprocessor, the
+sampler and the postprocessor separately, with the fused ``pi.act(s, return_logp=True)``, which
+does the same thing in a single compiled call. We report the p50 and p99 latency per step, after
+a number of warmup steps that trigger the compilation.
+
+Usage:
+
+    python benchmarks/policy_act_latency.py --num-steps 5000
+
+"""
+import argparse
+from timeit import default_timer as timer
+
+import gymnasium
+import haiku as hk
+import jax
+import numpy as onp
+
+from coax import Policy
+
+
+def func_pi(S, is_training):
+    logits = hk.Sequential((hk.Linear(32), jax.nn.relu, hk.Linear(2)))
+    return {'logits': logits(S)}
+
+
+def run(act, args):
+    rnd = onp.random.RandomState(13)
+    S = rnd.randn(args.num_warmup + args.num_steps, 4).astype('float32')
+
+    for s in S[:args.num_warmup]:
+        act(s)
+
+    dt = onp.empty(args.num_steps)
+    for t, s in enumerate(S[args.num_warmup:]):
+        t0 = timer()
+        a, logp = act(s)
+        dt[t] = timer() - t0
+    return onp.percentile(dt, [50, 99]) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num-steps', type=int, default=5000)
+    parser.add_argument('--num-warmup', type=int, default=100)
+    args = parser.parse_args()
+
+    pi = Policy(func_pi, gymnasium.make('CartPole-v1'), random_seed=13)
+    for label, act in (('__call__', lambda s: pi(s, return_logp=True)),
+                       ('act', lambda s: pi.act(s, return_logp=True))):
+        p50, p99 = run(act, args)
+        print(f"{label:>10s}:  p50 = {p50:8.1f} us,  p99 = {p99:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
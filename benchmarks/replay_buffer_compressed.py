@@ -0,0 +1,85 @@
+"""
+Benchmark memory per transition and sample latency of SimpleReplayBuffer with and without
+compress_observations=True.
+
+The observations are synthetic Atari-like frames: a flat background with a few sprites and
+scanline patterns. This compresses roughly as well as actual pixel observations do. Random
+noise would be incompressible.
+
+Usage:
+
+    python benchmarks/replay_buffer_compressed.py --capacity 20000 --obs-shape 84 84 4
+
+"""
+import argparse
+from timeit import default_timer as timer
+
+import numpy as onp
+
+from coax.experience_replay import SimpleReplayBuffer
+from coax.reward_tracing import TransitionBatch
+
+
+def make_frames(batch_size, obs_shape, rnd):
+    S = onp.full((batch_size, *obs_shape), 40, dtype='uint8')
+    S[:, ::8] = 90  # scanlines
+    for b in range(batch_size):
+        for _ in range(6):  # sprites
+            y, x = rnd.randint(obs_shape[0] - 8), rnd.randint(obs_shape[1] - 8)
+            S[b, y:(y + 8), x:(x + 8)] = rnd.randint(256, size=(8, 8, *obs_shape[2:]))
+    return S
+
+
+def make_transition_batch(batch_size, obs_shape, rnd):
+    S = make_frames(batch_size, obs_shape, rnd)
+    return TransitionBatch(
+        S=S,
+        A=rnd.randint(6, size=batch_size),
+        logP=onp.zeros(batch_size),
+        Rn=rnd.randn(batch_size),
+        In=onp.full(batch_size, 0.99),
+        S_next=make_frames(batch_size, obs_shape, rnd),
+        A_next=rnd.randint(6, size=batch_size),
+        logP_next=onp.zeros(batch_size),
+    )
+
+
+def run(buffer, args):
+    rnd = onp.random.RandomState(13)
+    batches = [
+        make_transition_batch(args.add_batch_size, args.obs_shape, rnd) for _ in range(16)]
+
+    num_adds = args.capacity // args.add_batch_size
+    t0 = timer()
+    for i in range(num_adds):
+        buffer.add(batches[i % len(batches)].copy())
+    dt_add = (timer() - t0) / (num_adds * args.add_batch_size)
+
+    t0 = timer()
+    for _ in range(args.num_samples):
+        buffer.sample(batch_size=args.sample_batch_size)
+    dt_sample = (timer() - t0) / args.num_samples
+
+    return sum(buffer.memory_usage().values()) / len(buffer), dt_add, dt_sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--capacity', type=int, default=20000)
+    parser.add_argument('--obs-shape', type=int, nargs='+', default=[84, 84, 4])
+    parser.add_argument('--add-batch-size', type=int, default=32)
+    parser.add_argument('--sample-batch-size', type=int, default=32)
+    parser.add_argument('--num-samples', type=int, default=500)
+    args = parser.parse_args()
+
+    for name, compress in (('columnar', False), ('compressed', True)):
+        buffer = SimpleReplayBuffer(
+            capacity=args.capacity, random_seed=13, compress_observations=compress)
+        bytes_per_transition, dt_add, dt_sample = run(buffer, args)
+        print(
+            f"{name:>10s}:  memory: {bytes_per_transition / 1024:8.2f} KiB/transition   "
+            f"add: {1e6 * dt_add:8.2f} µs/transition   sample: {1e3 * dt_sample:8.3f} ms/batch")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark the priority-update throughput of PrioritizedReplayBuffer with and without
+defer_updates.
+
+We fill a buffer and then repeatedly call update() with random transition ids, taking a sample
+after every few updates. This mimics several learners that share a buffer, or a single learner
+that updates priorities at a high rate. We report the number of update() calls per second,
+including the cost of the bulk updates.
+
+Usage:
+
+    python benchmarks/replay_buffer_deferred_updates.py --capacity 1000000 --batch-size 256
+
+"""
+import argparse
+from timeit import default_timer as timer
+
+import numpy as onp
+
+from coax.experience_replay import PrioritizedReplayBuffer
+from coax.reward_tracing import TransitionBatch
+
+
+def make_transition_batch(batch_size, rnd):
+    return TransitionBatch(
+        S=rnd.randn(batch_size, 4),
+        A=rnd.randint(2, size=batch_size),
+        logP=onp.zeros(batch_size),
+        Rn=rnd.randn(batch_size),
+        In=onp.full(batch_size, 0.99),
+        S_next=rnd.randn(batch_size, 4),
+        A_next=rnd.randint(2, size=batch_size),
+        logP_next=onp.zeros(batch_size),
+    )
+
+
+def run(buffer, args):
+    rnd = onp.random.RandomState(13)
+    transition_batch = make_transition_batch(10000, rnd)
+    for _ in range(args.capacity // transition_batch.batch_size):
+        buffer.add(transition_batch.copy(), Adv=transition_batch.Rn)
+
+    updates = [
+        (rnd.randint(args.capacity, size=args.batch_size), rnd.randn(args.batch_size))
+        for _ in range(64)]
+
+    t0 = timer()
+    for i in range(args.num_updates):
+        buffer.update(*updates[i % len(updates)])
+        if (i + 1) % args.updates_per_sample == 0:
+            buffer.sample(batch_size=args.batch_size)
+    return args.num_updates / (timer() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--capacity', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--num-updates', type=int, default=2000)
+    parser.add_argument('--updates-per-sample', type=int, default=4)
+    parser.add_argument('--defer-updates', type=int, nargs='+', default=[4, 16, 64])
+    args = parser.parse_args()
+
+    for defer_updates in (None, *args.defer_updates):
+        buffer = PrioritizedReplayBuffer(
+            capacity=args.capacity, random_seed=13, defer_updates=defer_updates)
+        updates_per_sec = run(buffer, args)
+        print(f"defer_updates={str(defer_updates):>4s}:  {updates_per_sec:10.1f} updates/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark multi-threaded throughput of ShardedPrioritizedReplayBuffer against a
+PrioritizedReplayBuffer that is guarded by a single global lock.
+
+A number of rollout threads add transition batches while a single learner thread keeps sampling
+and updating priorities. We report the total number of transitions added per second and the
+number of batches sampled per second, for an increasing number of rollout threads.
+
+Usage:
+
+    python benchmarks/replay_buffer_sharded.py --capacity 100000 --obs-shape 84 84 4
+
+"""
+import argparse
+import threading
+from timeit import default_timer as timer
+
+import numpy as onp
+
+from coax.experience_replay import PrioritizedReplayBuffer, ShardedPrioritizedReplayBuffer
+from coax.reward_tracing import TransitionBatch
+
+
+class LockedPrioritizedReplayBuffer:
+    """ reference: a single global lock around PrioritizedReplayBuffer """
+    def __init__(self, capacity, random_seed=None):
+        self._buffer = PrioritizedReplayBuffer(capacity, random_seed=random_seed)
+        self._lock = threading.Lock()
+
+    def add(self, transition_batch, Adv):
+        with self._lock:
+            self._buffer.add(transition_batch, Adv)
+
+    def sample(self, batch_size=32):
+        with self._lock:
+            return self._buffer.sample(batch_size)
+
+    def update(self, idx, Adv):
+        with self._lock:
+            self._buffer.update(idx, Adv)
+
+
+def make_transition_batch(batch_size, obs_shape, rnd):
+    S = rnd.randint(256, size=(batch_size, *obs_shape), dtype='uint8')
+    return TransitionBatch(
+        S=S,
+        A=rnd.randint(6, size=batch_size),
+        logP=onp.zeros(batch_size),
+        Rn=rnd.randn(batch_size),
+        In=onp.full(batch_size, 0.99),
+        S_next=S.copy(),
+        A_next=rnd.randint(6, size=batch_size),
+        logP_next=onp.zeros(batch_size),
+    )
+
+
+def run(buffer, num_threads, args):
+    rnd = onp.random.RandomState(13)
+    batches = [make_transition_batch(args.add_batch_size, args.obs_shape, rnd) for _ in range(8)]
+    for i in range(args.sample_batch_size // args.add_batch_size + 1):  # warmup
+        buffer.add(batches[i % len(batches)].copy(), Adv=batches[0].Rn)
+
+    stop = threading.Event()
+    num_added = [0] * num_threads
+    num_sampled = [0]
+
+    def rollout(thread_id):
+        i = 0
+        while not stop.is_set():
+            transition_batch = batches[(thread_id + i) % len(batches)].copy()
+            buffer.add(transition_batch, Adv=transition_batch.Rn)
+            num_added[thread_id] += transition_batch.batch_size
+            i += 1
+
+    def learner():
+        while not stop.is_set():
+            transition_batch = buffer.sample(batch_size=args.sample_batch_size)
+            buffer.update(transition_batch.idx, transition_batch.Rn)
+            num_sampled[0] += 1
+
+    threads = [threading.Thread(target=rollout, args=(i,)) for i in range(num_threads)]
+    threads.append(threading.Thread(target=learner))
+    t0 = timer()
+    for thread in threads:
+        thread.start()
+    stop.wait(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    dt = timer() - t0
+    return sum(num_added) / dt, num_sampled[0] / dt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--capacity', type=int, default=100000)
+    parser.add_argument('--num-shards', type=int, default=8)
+    parser.add_argument('--obs-shape', type=int, nargs='+', default=[84, 84, 4])
+    parser.add_argument('--add-batch-size', type=int, default=32)
+    parser.add_argument('--sample-batch-size', type=int, default=32)
+    parser.add_argument('--num-threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--duration', type=float, default=5., help="seconds per run")
+    args = parser.parse_args()
+
+    factories = (
+        ('global lock', lambda: LockedPrioritizedReplayBuffer(args.capacity, random_seed=13)),
+        ('sharded', lambda: ShardedPrioritizedReplayBuffer(
+            args.capacity, num_shards=args.num_shards, random_seed=13)),
+    )
+    for name, factory in factories:
+        for num_threads in args.num_threads:
+            add_rate, sample_rate = run(factory(), num_threads, args)
+            print(
+                f"{name:>12s}  threads: {num_threads:2d}   "
+                f"add: {add_rate:10.0f} transitions/s   "
+                f"sample+update: {sample_rate:8.1f} batches/s")
+
+
+if __name__ == '__main__':
+    main()
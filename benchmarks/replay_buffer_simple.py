@@ -0,0 +1,94 @@
+"""
+Benchmark the columnar SimpleReplayBuffer against the former list-based implementation.
+
+Usage:
+
+    python benchmarks/replay_buffer_simple.py --capacity 100000 --obs-shape 84 84 4
+
+"""
+import argparse
+import random
+from timeit import default_timer as timer
+
+import jax
+import numpy as onp
+
+from coax.experience_replay import SimpleReplayBuffer
+from coax.reward_tracing import TransitionBatch
+
+
+class ListReplayBuffer:
+    """ reference: the list-of-singles implementation that SimpleReplayBuffer used to have """
+    def __init__(self, capacity, random_seed=None):
+        self.capacity = int(capacity)
+        random.seed(random_seed)
+        self._random_state = random.getstate()
+        self._storage = []
+        self._index = 0
+
+    def add(self, transition_batch):
+        transition_batch.idx = onp.arange(self._index, self._index + transition_batch.batch_size)
+        self._index += transition_batch.batch_size
+        self._storage.extend(transition_batch.to_singles())
+        while len(self._storage) > self.capacity:
+            self._storage.pop(0)
+
+    def sample(self, batch_size=32):
+        random.setstate(self._random_state)
+        transitions = random.sample(self._storage, batch_size)
+        self._random_state = random.getstate()
+        return jax.tree_map(lambda *leaves: onp.concatenate(leaves, axis=0), *transitions)
+
+
+def make_transition_batch(batch_size, obs_shape, rnd):
+    S = rnd.randint(256, size=(batch_size, *obs_shape), dtype='uint8')
+    return TransitionBatch(
+        S=S,
+        A=rnd.randint(6, size=batch_size),
+        logP=onp.zeros(batch_size),
+        Rn=rnd.randn(batch_size),
+        In=onp.full(batch_size, 0.99),
+        S_next=S.copy(),
+        A_next=rnd.randint(6, size=batch_size),
+        logP_next=onp.zeros(batch_size),
+    )
+
+
+def run(buffer, args):
+    rnd = onp.random.RandomState(13)
+    batches = [
+        make_transition_batch(args.add_batch_size, args.obs_shape, rnd) for _ in range(16)]
+
+    # fill the buffer (and then some, to exercise eviction)
+    num_adds = 2 * args.capacity // args.add_batch_size
+    t0 = timer()
+    for i in range(num_adds):
+        buffer.add(batches[i % len(batches)])
+    dt_add = (timer() - t0) / (num_adds * args.add_batch_size)
+
+    t0 = timer()
+    for _ in range(args.num_samples):
+        buffer.sample(batch_size=args.sample_batch_size)
+    dt_sample = (timer() - t0) / args.num_samples
+
+    return dt_add, dt_sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--capacity', type=int, default=100000)
+    parser.add_argument('--obs-shape', type=int, nargs='+', default=[84, 84, 4])
+    parser.add_argument('--add-batch-size', type=int, default=32)
+    parser.add_argument('--sample-batch-size', type=int, default=32)
+    parser.add_argument('--num-samples', type=int, default=1000)
+    args = parser.parse_args()
+
+    for name, cls in (('list', ListReplayBuffer), ('columnar', SimpleReplayBuffer)):
+        dt_add, dt_sample = run(cls(capacity=args.capacity, random_seed=13), args)
+        print(
+            f"{name:>10s}:  add: {1e6 * dt_add:8.2f} µs/transition   "
+            f"sample: {1e3 * dt_sample:8.3f} ms/batch")
+
+
+if __name__ == '__main__':
+    main()
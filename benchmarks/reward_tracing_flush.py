@@ -0,0 +1,55 @@
+"""
+Benchmark the flush() throughput of the NStep and MonteCarlo reward tracers.
+
+We add a long episode to a tracer and flush it in one go. We compare the vectorized flush() with
+the generic one that pops the transitions one at a time (BaseRewardTracer.flush). We report the
+number of flushed transitions per second, excluding the calls to add().
+
+Usage:
+
+    python benchmarks/reward_tracing_flush.py --episode-length 10000 --n 5
+
+"""
+import argparse
+from timeit import default_timer as timer
+
+import numpy as onp
+
+from coax.reward_tracing import NStep, MonteCarlo
+from coax.reward_tracing._base import BaseRewardTracer
+
+
+def run(tracer, flush, args):
+    rnd = onp.random.RandomState(13)
+    S = rnd.randn(args.episode_length, 4).astype('float32')
+    A = rnd.randint(2, size=args.episode_length)
+    R = rnd.randn(args.episode_length)
+
+    dt = 0.
+    for _ in range(args.num_episodes):
+        for t in range(args.episode_length):
+            tracer.add(S[t], A[t], R[t], t == args.episode_length - 1)
+        t0 = timer()
+        transition_batch = flush(tracer)
+        dt += timer() - t0
+        assert transition_batch.batch_size == args.episode_length
+    return args.num_episodes * args.episode_length / dt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--episode-length', type=int, default=10000)
+    parser.add_argument('--num-episodes', type=int, default=3)
+    parser.add_argument('--n', type=int, default=5)
+    parser.add_argument('--gamma', type=float, default=0.99)
+    args = parser.parse_args()
+
+    for tracer in (NStep(args.n, args.gamma), MonteCarlo(args.gamma)):
+        name = type(tracer).__name__
+        for label, flush in (('pop', BaseRewardTracer.flush), ('vectorized', type(tracer).flush)):
+            transitions_per_sec = run(tracer, flush, args)
+            print(f"{name:>10s} {label:>10s}:  {transitions_per_sec:12.1f} transitions/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,13 @@
+from functools import partial
+
 import numpy as onp
 import jax
 
 
 class RandomStateMixin:
+    # number of keys that are generated in one go, so that self.rng is mostly just an index lookup
+    rng_block_size = 1024
+
     @property
     def random_seed(self):
         return self._random_seed
@@ -13,8 +18,24 @@ class RandomStateMixin:
             new_random_seed = onp.random.randint(2147483647)
         self._random_seed = new_random_seed
         self._random_key = jax.random.PRNGKey(self._random_seed)
+        self._rng_block = None
+        self._rng_index = 0
 
     @property
     def rng(self):
-        self._random_key, key = jax.random.split(self._random_key)
+        if getattr(self, '_rng_block', None) is None or self._rng_index >= len(self._rng_block):
+            self._random_key, keys = _split_sequentially(self._random_key, self.rng_block_size)
+            self._rng_block = jax.device_get(keys)
+            self._rng_index = 0
+        key = self._rng_block[self._rng_index]
+        self._rng_index += 1
         return key
+
+
+@partial(jax.jit, static_argnums=1)
+def _split_sequentially(key, num_keys):
+    # yields the same keys as num_keys consecutive calls to: key, subkey = jax.random.split(key)
+    def split(key, _):
+        key, subkey = jax.random.split(key)
+        return key, subkey
+    return jax.lax.scan(split, key, None, length=num_keys)
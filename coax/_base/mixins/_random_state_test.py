@@ -0,0 +1,41 @@
+import jax
+import numpy as onp
+
+from ._random_state import RandomStateMixin
+
+
+class Obj(RandomStateMixin):
+    rng_block_size = 4
+
+    def __init__(self, random_seed=None):
+        self.random_seed = random_seed
+
+
+def test_reproducible():
+    obj1, obj2 = Obj(random_seed=13), Obj(random_seed=13)
+    keys1 = onp.stack([obj1.rng for _ in range(10)])  # crosses two block boundaries
+    keys2 = onp.stack([obj2.rng for _ in range(10)])
+    onp.testing.assert_array_equal(keys1, keys2)
+    assert len(onp.unique(keys1, axis=0)) == 10
+
+
+def test_reset_seed():
+    obj = Obj(random_seed=13)
+    key = obj.rng
+    obj.rng
+    obj.random_seed = 13
+    onp.testing.assert_array_equal(obj.rng, key)
+
+
+def test_usable_as_key():
+    obj = Obj(random_seed=13)
+    assert jax.random.normal(obj.rng).shape == ()
+    assert jax.random.split(obj.rng).shape == (2, 2)
+
+
+def test_consistent_with_sequential_split():
+    obj = Obj(random_seed=13)
+    key = jax.random.PRNGKey(13)
+    for _ in range(10):
+        key, subkey = jax.random.split(key)
+        onp.testing.assert_array_equal(obj.rng, subkey)
@@ -77,6 +77,8 @@ class BaseFunc(ABC, RandomStateMixin, CopyMixin):
         transformed = hk.transform_with_state(func)
         self._function = jit(transformed.apply, static_argnums=static_argnums)
 
+        self._example_inputs = example_data.inputs  # used in self.warmup()
+
         # init function params and state
         self._params, self._function_state = transformed.init(self.rng, *example_data.inputs.args)
 
@@ -116,6 +118,45 @@ class BaseFunc(ABC, RandomStateMixin, CopyMixin):
         self.params = self._soft_update_func(self.params, other.params, tau)
         self.function_state = self._soft_update_func(self.function_state, other.function_state, tau)
 
+    def warmup(self, batch_sizes=(1,)):
+        r"""
+
+        Compile the forward pass ahead of time (AOT) for the given batch sizes.
+
+        This moves the XLA compilation out of the first call with a new batch size. Combine this
+        with :func:`coax.utils.enable_compilation_cache` in order to reuse the compiled functions
+        across processes.
+
+        Parameters
+        ----------
+        batch_sizes : sequence of positive ints, optional
+
+            The batch sizes to compile for.
+
+        Returns
+        -------
+        report : dict
+
+            The compile time (in seconds) per function and batch size.
+
+        """
+        rng = jax.random.PRNGKey(0)  # dummy key, so that warmup doesn't advance self.rng
+        report = {}
+        for batch_size in batch_sizes:
+            report[f'function[batch_size={batch_size}]'] = self.function.warmup(
+                self.params, self.function_state, rng, *self._example_args(batch_size))
+        return report
+
+    def _example_args(self, batch_size):
+        """ abstract function inputs with the given batch size, with is_training=False """
+        if not (isinstance(batch_size, int) and batch_size > 0):
+            raise TypeError(f"batch_size must be a positive int, got: {batch_size}")
+        args, static_argnums = self._example_inputs
+        return tuple(
+            False if i in static_argnums else jax.tree_map(
+                lambda x: jax.ShapeDtypeStruct((batch_size, *x.shape[1:]), x.dtype), arg)
+            for i, arg in enumerate(args))
+
     @property
     def params(self):
         """ The parameters (weights) of the function approximator. """
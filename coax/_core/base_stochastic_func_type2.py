@@ -5,7 +5,7 @@ import jax
 import jax.numpy as jnp
 import numpy as onp
 import haiku as hk
-from gymnasium.spaces import Space
+from gymnasium.spaces import Space, Discrete, Tuple, Dict
 
 from ..utils import safe_sample, batch_to_single, jit
 from .base_func import BaseFunc, ExampleData, Inputs, ArgsType2
@@ -33,6 +33,26 @@ class StochasticFuncType2Mixin:
         x = self.proba_dist.postprocess_variate(self.rng, X)
         return (x, batch_to_single(logP)) if return_logp else x
 
+    def act(self, s, return_logp=False):
+        if not getattr(self, '_act_eagerly', False):
+            try:
+                X, logP = jax.device_get(
+                    self.act_func(self.params, self.function_state, self.rng, s))
+            except jax.errors.JAXTypeError:
+                # preprocessor or postprocessor isn't jittable, so fall back to the eager path
+                self._act_eagerly = True
+            else:
+                x = _single_variate(self.proba_dist.space, X)
+                return (x, logP[0]) if return_logp else x
+        return self(s, return_logp=return_logp)
+
+    def batch(self, S, return_logp=False):
+        S = self.observation_preprocessor(self.rng, S)
+        X, logP = self.sample_func(self.params, self.function_state, self.rng, S)
+        X = self.proba_dist.postprocess_variate(self.rng, X, batch_mode=True)
+        X = jax.tree_map(onp.asarray, X)
+        return (X, onp.asarray(logP)) if return_logp else X
+
     def mean(self, s):
         S = self.observation_preprocessor(self.rng, s)
         X = self.mean_func(self.params, self.function_state, self.rng, S)
@@ -72,6 +92,37 @@ class StochasticFuncType2Mixin:
             self._sample_func = jit(sample_func)
         return self._sample_func
 
+    @property
+    def act_func(self):
+        r"""
+
+        The function that is used for acting, defined as a JIT-compiled pure function. It fuses
+        the observation preprocessor, sampling, the log-propensities and the variate postprocessor
+        into a single compiled call that is driven by a single random key. This function may be
+        called directly as:
+
+        .. code:: python
+
+            X, logP = obj.act_func(obj.params, obj.function_state, obj.rng, S)
+
+        Here, :code:`S` are raw state observations, either a single one or a batch. The output
+        :code:`X` is a batch of postprocessed variates. Note that this requires the
+        :attr:`observation_preprocessor` and the postprocessor of the :attr:`proba_dist` to be
+        jittable.
+
+        """
+        if not hasattr(self, '_act_func'):
+            def act_func(params, state, rng, S):
+                rngs = hk.PRNGSequence(rng)
+                S = self.observation_preprocessor(next(rngs), S)
+                dist_params, _ = self.function(params, state, next(rngs), S, False)
+                X = self.proba_dist.sample(dist_params, next(rngs))
+                logP = self.proba_dist.log_proba(dist_params, X)
+                X = self.proba_dist.postprocess_variate(next(rngs), X, batch_mode=True)
+                return X, logP
+            self._act_func = jit(act_func)
+        return self._act_func
+
     @property
     def mean_func(self):
         r"""
@@ -135,6 +186,24 @@ class BaseStochasticFuncType2(BaseFunc, StochasticFuncType2Mixin):
             action_space=action_space,
             random_seed=random_seed)
 
+    def warmup(self, batch_sizes=(1,)):
+        report = super().warmup(batch_sizes)
+        rng = jax.random.PRNGKey(0)  # dummy key, so that warmup doesn't advance self.rng
+        for batch_size in batch_sizes:
+            S, _ = self._example_args(batch_size)
+            args = (self.params, self.function_state, rng, S)
+            report[f'sample_func[batch_size={batch_size}]'] = self.sample_func.warmup(*args)
+            report[f'mode_func[batch_size={batch_size}]'] = self.mode_func.warmup(*args)
+        if 1 in batch_sizes:
+            # a single raw observation, as passed to self.act(s)
+            s = safe_sample(self.observation_space, seed=self.random_seed)
+            try:
+                report['act_func[batch_size=1]'] = self.act_func.warmup(
+                    self.params, self.function_state, rng, s)
+            except jax.errors.JAXTypeError:
+                self._act_eagerly = True  # act() falls back to __call__ anyway
+        return report
+
     @classmethod
     def example_data(
             cls, env, observation_preprocessor=None, proba_dist=None,
@@ -206,3 +275,14 @@ class BaseStochasticFuncType2(BaseFunc, StochasticFuncType2Mixin):
                 lambda a, b: f"{a.shape} {'!=' if a.shape != b.shape else '=='} {b.shape}",
                 actual, expected)
             raise TypeError(f"found leaves with unexpected shapes: {shapes_tree}")
+
+
+def _single_variate(space, X):
+    """ extract a single variate from a batch, with the same types as postprocess_variate """
+    if isinstance(space, Discrete):
+        return int(X[0])
+    if isinstance(space, Tuple):
+        return tuple(_single_variate(sp, X[i]) for i, sp in enumerate(space.spaces))
+    if isinstance(space, Dict):
+        return {k: _single_variate(sp, X[k]) for k, sp in space.spaces.items()}
+    return X[0]
@@ -98,6 +98,86 @@ class TestPolicy(TestCase):
         self.assertArrayShape(a, (3, 5))
         self.assertArraySubdtypeFloat(a)
 
+    def test_batch_discrete(self):
+        env = Env(boxspace, discrete)
+        S = onp.stack([safe_sample(boxspace, seed=i) for i in range(11)])
+        pi = Policy(func_discrete, env, random_seed=19)
+
+        A, logP = pi.batch(S, return_logp=True)
+        self.assertArrayShape(A, (11,))
+        self.assertArrayShape(logP, (11,))
+        self.assertTrue(all(discrete.contains(int(a)) for a in A))
+        self.assertTrue(onp.all(logP <= 0))
+
+    def test_batch_box(self):
+        env = Env(boxspace, boxspace)
+        S = onp.stack([safe_sample(boxspace, seed=i) for i in range(11)])
+        pi = Policy(func_boxspace, env, random_seed=19)
+
+        A = pi.batch(S)
+        self.assertArrayShape(A, (11, 3, 5))
+        self.assertArraySubdtypeFloat(A)
+        self.assertTrue(all(boxspace.contains(a) for a in A))
+
+    def test_act_discrete(self):
+        env = Env(boxspace, discrete)
+        s = safe_sample(boxspace, seed=17)
+        pi = Policy(func_discrete, env, random_seed=19)
+
+        a, logp = pi.act(s, return_logp=True)
+        self.assertIsInstance(a, int)
+        self.assertTrue(discrete.contains(a))
+        self.assertArrayShape(logp, ())
+        self.assertLessEqual(logp, 0)
+
+    def test_act_box(self):
+        env = Env(boxspace, boxspace)
+        s = safe_sample(boxspace, seed=17)
+        pi = Policy(func_boxspace, env, random_seed=19)
+
+        a = pi.act(s)
+        self.assertArrayShape(a, (3, 5))
+        self.assertArraySubdtypeFloat(a)
+        self.assertTrue(boxspace.contains(a))
+
+    def test_non_jittable_preprocessor(self):
+        def preprocessor(rng, S):
+            S = onp.asarray(S, dtype='float32')  # not jittable
+            return S if S.ndim == 3 else S[None]
+
+        env = Env(boxspace, discrete)
+        S = onp.stack([safe_sample(boxspace, seed=i) for i in range(11)])
+        pi = Policy(func_discrete, env, observation_preprocessor=preprocessor, random_seed=19)
+
+        A, logP = pi.batch(S, return_logp=True)
+        self.assertArrayShape(A, (11,))
+        self.assertArrayShape(logP, (11,))
+
+        a, logp = pi.act(S[0], return_logp=True)  # falls back to __call__
+        self.assertTrue(discrete.contains(a))
+        self.assertLessEqual(logp, 0)
+        self.assertTrue(pi._act_eagerly)
+
+    def test_warmup(self):
+        env = Env(boxspace, discrete)
+        pi = Policy(func_discrete, env, random_seed=19)
+        report = pi.warmup(batch_sizes=(1, 8))
+        self.assertEqual(set(report), {
+            'function[batch_size=1]', 'function[batch_size=8]',
+            'sample_func[batch_size=1]', 'sample_func[batch_size=8]',
+            'mode_func[batch_size=1]', 'mode_func[batch_size=8]',
+            'act_func[batch_size=1]'})
+        a = pi.act(safe_sample(boxspace, seed=17))
+        self.assertTrue(discrete.contains(a))
+
+    def test_warmup_preserves_rng(self):
+        env = Env(boxspace, discrete)
+        pi1 = Policy(func_discrete, env, random_seed=19)
+        pi2 = Policy(func_discrete, env, random_seed=19)
+        pi1.warmup(batch_sizes=(1, 8))
+        for _ in range(3):
+            self.assertArrayAlmostEqual(pi1.rng, pi2.rng)
+
     def test_greedy_discrete(self):
         env = Env(boxspace, discrete)
         s = safe_sample(boxspace, seed=17)
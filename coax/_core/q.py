@@ -130,6 +130,41 @@ class Q(BaseFunc):
         Q = self.value_transform.inverse_func(Q)
         return onp.asarray(Q[0])
 
+    def batch(self, S, A=None):
+        r"""
+
+        Evaluate the state-action function on a batch of state observations or state-action pairs
+        in a single call.
+
+        Parameters
+        ----------
+        S : state observations
+
+            A batch of state observations, stacked along a leading batch axis.
+
+        A : actions, optional
+
+            A batch of actions.
+
+        Returns
+        -------
+        Q_sa or Q_s : ndarray
+
+            Depending on whether :code:`A` is provided, this either returns an array of shape
+            :code:`(batch_size,)` representing :math:`q(S_i,A_i)` or an array of shape
+            :code:`(batch_size, n)` representing :math:`q(S_i,.)`, where :math:`n` is the number of
+            discrete actions.
+
+        """
+        S = self.observation_preprocessor(self.rng, S)
+        if A is None:
+            Q, _ = self.function_type2(self.params, self.function_state, self.rng, S, False)
+        else:
+            A = self.action_preprocessor(self.rng, A)
+            Q, _ = self.function_type1(self.params, self.function_state, self.rng, S, A, False)
+        Q = self.value_transform.inverse_func(Q)
+        return onp.asarray(Q)
+
     @property
     def function_type1(self):
         r"""
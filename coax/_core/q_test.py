@@ -90,6 +90,28 @@ class TestQ(TestCase):
         self.assertArraySubdtypeFloat(q_s)
         self.assertArrayAlmostEqual(q_sa, q_s[a])
 
+    def test_batch_type2_discrete(self):
+        env = env_discrete
+        S = onp.array([safe_sample(env.observation_space, seed=i) for i in range(5)])
+        A = onp.array([safe_sample(env.action_space, seed=i) for i in range(5)])
+        q = Q(func_type2, env, random_seed=42)
+
+        Q_s = q.batch(S)
+        self.assertArrayShape(Q_s, (5, env.action_space.n))
+        self.assertArrayAlmostEqual(Q_s, onp.stack([q(s) for s in S]))
+
+        Q_sa = q.batch(S, A)
+        self.assertArrayShape(Q_sa, (5,))
+        self.assertArrayAlmostEqual(Q_sa, Q_s[onp.arange(5), A])
+
+    def test_warmup(self):
+        q = Q(func_type1, env_discrete, random_seed=42)
+        report = q.warmup(batch_sizes=(1, 8))
+        self.assertEqual(set(report), {'function[batch_size=1]', 'function[batch_size=8]'})
+        self.assertTrue(all(t > 0 for t in report.values()))
+        with self.assertRaises(TypeError):
+            q.warmup(batch_sizes=(0,))
+
     def test_call_type1_box(self):
         env = env_boxspace
         func = func_type1
@@ -107,6 +107,29 @@ class V(BaseFunc):
         V = self.value_transform.inverse_func(V)
         return onp.asarray(V[0])
 
+    def batch(self, S):
+        r"""
+
+        Evaluate the value function on a batch of state observations in a single call.
+
+        Parameters
+        ----------
+        S : state observations
+
+            A batch of state observations, stacked along a leading batch axis.
+
+        Returns
+        -------
+        V : ndarray, shape: (batch_size,)
+
+            The estimated expected values associated with the input state observations.
+
+        """
+        S = self.observation_preprocessor(self.rng, S)
+        V, _ = self.function(self.params, self.function_state, self.rng, S, False)
+        V = self.value_transform.inverse_func(V)
+        return onp.asarray(V)
+
     @classmethod
     def example_data(cls, env, observation_preprocessor=None, batch_size=1, random_seed=None):
 
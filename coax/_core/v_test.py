@@ -2,6 +2,7 @@ from functools import partial
 
 import jax
 import jax.numpy as jnp
+import numpy as onp
 import haiku as hk
 
 from .._base.test_case import TestCase
@@ -43,6 +44,12 @@ class TestV(TestCase):
         v = self.v(s)
         self.assertAlmostEqual(v, 0.)
 
+    def test_batch(self):
+        S = onp.array([safe_sample(self.env_discrete.observation_space, seed=i) for i in range(5)])
+        V = self.v.batch(S)
+        self.assertArrayShape(V, (5,))
+        self.assertArrayAlmostEqual(V, onp.stack([self.v(s) for s in S]))
+
     def test_soft_update(self):
         tau = 0.13
         v = self.v
@@ -92,6 +92,71 @@ class BaseValueBasedPolicy(StochasticFuncType2Mixin):
         """
         return super().__call__(s, return_logp=return_logp)
 
+    def batch(self, S, return_logp=False):
+        r"""
+
+        Sample a batch of actions :math:`A_i\sim\pi_q(.|S_i)` in a single call, e.g. one for each
+        environment in a :class:`gymnasium.vector.VectorEnv`.
+
+        Parameters
+        ----------
+        S : state observations
+
+            A batch of state observations, stacked along a leading batch axis.
+
+        return_logp : bool, optional
+
+            Whether to return the log-propensities :math:`\log\pi_q(A_i|S_i)`.
+
+        Returns
+        -------
+        A : ndarray
+
+            A batch of actions.
+
+        logP : ndarray, optional
+
+            The log-propensities :math:`\log\pi_q(A_i|S_i)`. This is only returned if we set
+            ``return_logp=True``.
+
+        """
+        return super().batch(S, return_logp=return_logp)
+
+    def act(self, s, return_logp=False):
+        r"""
+
+        Sample an action :math:`a\sim\pi_q(.|s)` in a single compiled call.
+
+        This is the fast path for acting in an environment loop. Unlike :attr:`__call__`, the
+        observation preprocessor, the sampling, the log-propensity and the postprocessing of the
+        action are fused into one JIT-compiled function (see :attr:`act_func`), which is driven by
+        a single random key. If the observation preprocessor isn't jittable, this falls back to
+        :attr:`__call__`.
+
+        Parameters
+        ----------
+        s : state observation
+
+            A single state observation :math:`s`.
+
+        return_logp : bool, optional
+
+            Whether to return the log-propensity :math:`\log\pi(a|s)`.
+
+        Returns
+        -------
+        a : action
+
+            A single action :math:`a`.
+
+        logp : float, optional
+
+            The log-propensity :math:`\log\pi_q(a|s)`. This is only returned if we set
+            ``return_logp=True``.
+
+        """
+        return super().act(s, return_logp=return_logp)
+
     def mean(self, s):
         r"""
 
@@ -43,6 +43,26 @@ class TestEpsilonGreedy(TestCase):
             if done:
                 break
 
+    def test_batch(self):
+        pi = EpsilonGreedy(self.q, epsilon=0.1)
+        S = onp.arange(self.env.observation_space.n)
+        A, logP = pi.batch(S, return_logp=True)
+        self.assertArrayShape(A, (self.env.observation_space.n,))
+        self.assertArrayShape(logP, (self.env.observation_space.n,))
+        self.assertTrue(all(self.env.action_space.contains(int(a)) for a in A))
+        self.assertTrue(onp.all(logP <= 0))
+
+    def test_act(self):
+        pi = EpsilonGreedy(self.q, epsilon=0.1)
+        s, info = self.env.reset()
+        for t in range(self.env.spec.max_episode_steps):
+            a, logp = pi.act(s, return_logp=True)
+            self.assertTrue(self.env.action_space.contains(a))
+            self.assertLessEqual(logp, 0)
+            s, r, done, truncated, info = self.env.step(a)
+            if done:
+                break
+
     def test_greedy(self):
         pi = EpsilonGreedy(self.q, epsilon=0.1)
         s, info = self.env.reset()
@@ -81,6 +101,26 @@ class TestBoltzmannPolicy(TestCase):
             if done:
                 break
 
+    def test_batch(self):
+        pi = BoltzmannPolicy(self.q, temperature=1.0)
+        S = onp.arange(self.env.observation_space.n)
+        A, logP = pi.batch(S, return_logp=True)
+        self.assertArrayShape(A, (self.env.observation_space.n,))
+        self.assertArrayShape(logP, (self.env.observation_space.n,))
+        self.assertTrue(all(self.env.action_space.contains(int(a)) for a in A))
+        self.assertTrue(onp.all(logP <= 0))
+
+    def test_act(self):
+        pi = BoltzmannPolicy(self.q, temperature=1.0)
+        s, info = self.env.reset()
+        for t in range(self.env.spec.max_episode_steps):
+            a, logp = pi.act(s, return_logp=True)
+            self.assertTrue(self.env.action_space.contains(a))
+            self.assertLessEqual(logp, 0)
+            s, r, done, truncated, info = self.env.step(a)
+            if done:
+                break
+
     def test_greedy(self):
         pi = BoltzmannPolicy(self.q, temperature=1.0)
         s, info = self.env.reset()
@@ -10,6 +10,9 @@ from ..typing import Policy
 from ..wrappers import TrainMonitor
 from ..reward_tracing._base import BaseRewardTracer
 from ..experience_replay._base import BaseReplayBuffer
+from ..experience_replay._prefetch import Prefetcher
+from ..experience_replay._rate_limiter import RateLimiter
+from ..experience_replay._shared_memory import SharedMemoryReplayBuffer
 
 
 __all__ = (
@@ -50,12 +53,32 @@ class Worker(ABC):
     buffer : ReplayBuffer, optional
 
         The experience-replay buffer that is populated by rollout workers and sampled from by
-        learners.
+        learners. This is typically only provided to the parameter-store worker. The exception is
+        a :class:`SharedMemoryReplayBuffer <coax.experience_replay.SharedMemoryReplayBuffer>`,
+        which is meant to be passed to all workers on the same machine, such that they can access
+        it directly rather than through the parameter store.
 
     buffer_warmup : int, optional
 
         The warmup period for the experience replay buffer, i.e. the minimal number of transitions
-        that need to be stored in the replay buffer before we start sampling from it.
+        that need to be stored in the replay buffer before we start sampling from it. This is
+        ignored if a :code:`rate_limiter` is provided, see :attr:`RateLimiter.min_size_to_sample
+        <coax.experience_replay.RateLimiter.min_size_to_sample>`.
+
+    rate_limiter : RateLimiter, optional
+
+        A :class:`RateLimiter <coax.experience_replay.RateLimiter>` that keeps the number of sampled
+        transitions per inserted transition close to a target value, by blocking
+        :func:`buffer_add` or :func:`buffer_sample` on whichever side runs ahead. Like the
+        :code:`buffer`, this is owned by the parameter-store worker. Since blocked calls are
+        served by the parameter store, a remote parameter store must be able to handle concurrent
+        calls, e.g. :code:`@ray.remote(max_concurrency=...)`. The parameter store reports the
+        achieved ratio as the :code:`buffer/samples_per_insert` metric. Rollout workers register
+        themselves with the rate limiter for the duration of :func:`rollout_loop`, such that it's
+        closed once the last of them is done. If the rollout workers don't all start at the same
+        time, pass :code:`num_actors` to the rate limiter. A rate limiter can't be combined with a
+        :class:`SharedMemoryReplayBuffer <coax.experience_replay.SharedMemoryReplayBuffer>`,
+        because workers access the latter directly rather than through the parameter store.
 
     name : str, optional
 
@@ -66,6 +89,7 @@ class Worker(ABC):
     tracer: Optional[BaseRewardTracer] = None
     buffer: Optional[BaseReplayBuffer] = None
     buffer_warmup: Optional[int] = None
+    rate_limiter: Optional[RateLimiter] = None
 
     def __init__(
             self, env,
@@ -74,6 +98,7 @@ class Worker(ABC):
             tracer=None,
             buffer=None,
             buffer_warmup=None,
+            rate_limiter=None,
             name=None):
 
         # import inline to avoid hard dependency on ray
@@ -87,9 +112,22 @@ class Worker(ABC):
         self.tracer = tracer
         self.buffer = buffer
         self.buffer_warmup = buffer_warmup
+        self.rate_limiter = rate_limiter
         self.name = name
         self.env.logger.info(f"JAX platform name: '{get_backend().platform}'")
 
+        # check only once whether the param_store has a rate limiter, to avoid round-trips later
+        if self.param_store is None:
+            self._rate_limited = self.rate_limiter is not None
+        else:
+            self._rate_limited = \
+                self.pull_getattr('rate_limiter.samples_per_insert', None) is not None
+        if (self._rate_limited or self.rate_limiter is not None) \
+                and isinstance(self.buffer, SharedMemoryReplayBuffer):
+            raise ValueError(
+                "a rate_limiter can't be combined with a SharedMemoryReplayBuffer, because the "
+                "latter is accessed directly rather than through the param_store")
+
     @abstractmethod
     def get_state(self):
         r"""
@@ -177,29 +215,80 @@ class Worker(ABC):
 
     def rollout_loop(self, max_total_steps, reward_threshold=None):
         reward_threshold = _check_reward_threshold(reward_threshold, self.env)
-        T_global = self.pull_getattr('env.T')
-        while T_global < max_total_steps and self.env.avg_G < reward_threshold:
-            self.pull_state()
-            self.rollout()
-            metrics = self.pull_metrics()
-            metrics['throughput/rollout_loop'] = 1000 / self.env.dt_ms
-            metrics['episode/T_global'] = T_global = self.pull_getattr('env.T') + self.env.t
-            self.push_setattr('env.T', T_global)  # not exactly thread-safe, but that's okay
-            self.env.record_metrics(metrics)
+        self.rate_limiter_register_actor()
+        try:
+            T_global = self.pull_getattr('env.T')
+            while T_global < max_total_steps and self.env.avg_G < reward_threshold:
+                self.pull_state()
+                self.rollout()
+                metrics = self.pull_metrics()
+                metrics['throughput/rollout_loop'] = 1000 / self.env.dt_ms
+                metrics['episode/T_global'] = T_global = self.pull_getattr('env.T') + self.env.t
+                self.push_setattr('env.T', T_global)  # not exactly thread-safe, but that's okay
+                self.env.record_metrics(metrics)
+        finally:
+            # the last actor to finish closes the rate limiter, see RateLimiter.unregister_actor
+            self.rate_limiter_unregister_actor()
+
+    def learn_loop(self, max_total_steps, batch_size=32, prefetch=0):
+        r"""
+
+        Run the learner loop.
+
+        Parameters
+        ----------
+        max_total_steps : positive int
+
+            The total number of environment steps (summed over all rollout workers) after which to
+            stop learning.
+
+        batch_size : positive int, optional
+
+            The batch size of the transition batches that are passed to :func:`learn`.
+
+        prefetch : int, optional
+
+            The number of transition batches to sample ahead of time in a background thread, see
+            :class:`coax.experience_replay.Prefetcher`. Set to zero to disable prefetching.
+
+        """
+        sampler = None
+        if prefetch:
+            if self.param_store is None:
+                # wrap the local buffer for the duration of the loop, such that buffer_add and
+                # buffer_update go through the same lock as the prefetching threads
+                if not isinstance(self.buffer, Prefetcher):
+                    self.buffer = sampler = Prefetcher(
+                        self.buffer, batch_size=batch_size, num_batches=prefetch,
+                        warmup=self.buffer_warmup)
+            else:
+                sampler = Prefetcher(
+                    _ParamStoreBuffer(self), batch_size=batch_size, num_batches=prefetch)
 
-    def learn_loop(self, max_total_steps, batch_size=32):
         throughput = 0.
-        while self.pull_getattr('env.T') < max_total_steps:
-            t_start = time.time()
-            self.pull_state()
-            metrics = self.learn(self.buffer_sample(batch_size=batch_size))
-            metrics['throughput/learn_loop'] = throughput
-            self.push_state()
-            self.push_metrics(metrics)
-            throughput = batch_size / (time.time() - t_start)
+        try:
+            while self.pull_getattr('env.T') < max_total_steps:
+                t_start = time.time()
+                self.pull_state()
+                if sampler is None or sampler is self.buffer:
+                    transition_batch = self.buffer_sample(batch_size=batch_size)
+                else:
+                    transition_batch = sampler.sample()
+                metrics = self.learn(transition_batch)
+                metrics['throughput/learn_loop'] = throughput
+                self.push_state()
+                self.push_metrics(metrics)
+                throughput = batch_size / (time.time() - t_start)
+        finally:
+            if sampler is not None:
+                sampler.close()
+            if sampler is not None and sampler is self.buffer:
+                self.buffer = sampler.buffer  # unwrap the local buffer again
+            if self._rate_limited:
+                self.push_setattr('rate_limiter.closed', True)  # don't leave actors waiting
 
     def buffer_len(self):
-        if self.param_store is None:
+        if self._has_local_buffer:
             assert self.buffer is not None
             len_ = len(self.buffer)
         elif isinstance(self.param_store, self.__ray.actor.ActorHandle):
@@ -209,8 +298,10 @@ class Worker(ABC):
         return len_
 
     def buffer_add(self, transition_batch, Adv=None):
-        if self.param_store is None:
+        if self._has_local_buffer:
             assert self.buffer is not None
+            if self.rate_limiter is not None:
+                self.rate_limiter.await_insert(transition_batch.batch_size)
             if 'Adv' in inspect.signature(self.buffer.add).parameters:  # duck typing
                 self.buffer.add(transition_batch, Adv=Adv)
             else:
@@ -221,7 +312,7 @@ class Worker(ABC):
             self.param_store.buffer_add(transition_batch, Adv)
 
     def buffer_update(self, transition_batch_idx, Adv):
-        if self.param_store is None:
+        if self._has_local_buffer:
             assert self.buffer is not None
             self.buffer.update(transition_batch_idx, Adv=Adv)
         elif isinstance(self.param_store, self.__ray.actor.ActorHandle):
@@ -230,19 +321,23 @@ class Worker(ABC):
             self.param_store.buffer_update(transition_batch_idx, Adv)
 
     def buffer_sample(self, batch_size=32):
-        buffer_warmup = max(self.buffer_warmup or 0, batch_size)
-        wait_secs = 1 / 1024.
-        buffer_len = self.buffer_len()
-        while buffer_len < buffer_warmup:
-            self.env.logger.debug(
-                f"buffer insufficiently populated: {buffer_len}/{buffer_warmup}; "
-                f"waiting for {wait_secs}s")
-            time.sleep(wait_secs)
-            wait_secs = min(30, wait_secs * 2)  # wait at most 30s between tries
+        if not self._rate_limited:
+            # without a rate limiter, we poll the buffer until it's sufficiently populated
+            buffer_warmup = max(self.buffer_warmup or 0, batch_size)
+            wait_secs = 1 / 1024.
             buffer_len = self.buffer_len()
-
-        if self.param_store is None:
+            while buffer_len < buffer_warmup:
+                self.env.logger.debug(
+                    f"buffer insufficiently populated: {buffer_len}/{buffer_warmup}; "
+                    f"waiting for {wait_secs}s")
+                time.sleep(wait_secs)
+                wait_secs = min(30, wait_secs * 2)  # wait at most 30s between tries
+                buffer_len = self.buffer_len()
+
+        if self._has_local_buffer:
             assert self.buffer is not None
+            if self.rate_limiter is not None:
+                self.rate_limiter.await_sample(batch_size)  # also waits for warmup
             transition_batch = self.buffer.sample(batch_size=batch_size)
         elif isinstance(self.param_store, self.__ray.actor.ActorHandle):
             transition_batch = self.__ray.get(
@@ -252,6 +347,30 @@ class Worker(ABC):
         assert transition_batch is not None
         return transition_batch
 
+    @property
+    def _has_local_buffer(self):
+        return self.param_store is None or isinstance(self.buffer, SharedMemoryReplayBuffer)
+
+    def rate_limiter_register_actor(self):
+        if not self._rate_limited:
+            pass
+        elif self.param_store is None:
+            self.rate_limiter.register_actor()
+        elif isinstance(self.param_store, self.__ray.actor.ActorHandle):
+            self.__ray.get(self.param_store.rate_limiter_register_actor.remote())
+        else:
+            self.param_store.rate_limiter_register_actor()
+
+    def rate_limiter_unregister_actor(self):
+        if not self._rate_limited:
+            pass
+        elif self.param_store is None:
+            self.rate_limiter.unregister_actor()
+        elif isinstance(self.param_store, self.__ray.actor.ActorHandle):
+            self.__ray.get(self.param_store.rate_limiter_unregister_actor.remote())
+        else:
+            self.param_store.rate_limiter_unregister_actor()
+
     def pull_state(self):
         assert self.param_store is not None, "cannot call pull_state on param_store itself"
         if isinstance(self.param_store, self.__ray.actor.ActorHandle):
@@ -277,6 +396,9 @@ class Worker(ABC):
 
     def push_metrics(self, metrics):
         if self.param_store is None:
+            if self.rate_limiter is not None:
+                metrics = {
+                    **metrics, 'buffer/samples_per_insert': self.rate_limiter.achieved_ratio}
             self.env.record_metrics(metrics)
         elif isinstance(self.param_store, self.__ray.actor.ActorHandle):
             self.__ray.get(self.param_store.push_metrics.remote(metrics))
@@ -334,6 +456,18 @@ def _check_reward_threshold(reward_threshold, env):
     return reward_threshold
 
 
+class _ParamStoreBuffer:
+    """ minimal buffer interface that defers to the param_store's buffer """
+    def __init__(self, worker):
+        self.worker = worker
+
+    def sample(self, batch_size=32):
+        return self.worker.buffer_sample(batch_size=batch_size)  # waits for buffer warmup
+
+    def __len__(self):
+        return self.worker.buffer_len()
+
+
 def _getattr_recursive(obj, name, default=...):
     if '.' not in name:
         return getattr(obj, name) if default is Ellipsis else getattr(obj, name, default)
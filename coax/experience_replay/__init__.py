@@ -7,6 +7,13 @@ Experience Replay
 
     coax.experience_replay.SimpleReplayBuffer
     coax.experience_replay.PrioritizedReplayBuffer
+    coax.experience_replay.ShardedPrioritizedReplayBuffer
+    coax.experience_replay.RankBasedPrioritizedReplayBuffer
+    coax.experience_replay.TrajectoryReplayBuffer
+    coax.experience_replay.JaxPrioritizedReplayBuffer
+    coax.experience_replay.SharedMemoryReplayBuffer
+    coax.experience_replay.Prefetcher
+    coax.experience_replay.RateLimiter
 
 ----
 
@@ -24,15 +31,36 @@ Object Reference
 
 .. autoclass:: coax.experience_replay.SimpleReplayBuffer
 .. autoclass:: coax.experience_replay.PrioritizedReplayBuffer
+.. autoclass:: coax.experience_replay.ShardedPrioritizedReplayBuffer
+.. autoclass:: coax.experience_replay.RankBasedPrioritizedReplayBuffer
+.. autoclass:: coax.experience_replay.TrajectoryReplayBuffer
+.. autoclass:: coax.experience_replay.JaxPrioritizedReplayBuffer
+.. autoclass:: coax.experience_replay.SharedMemoryReplayBuffer
+.. autoclass:: coax.experience_replay.Prefetcher
+.. autoclass:: coax.experience_replay.RateLimiter
 
 
 """
 
 from ._simple import SimpleReplayBuffer
 from ._prioritized import PrioritizedReplayBuffer
+from ._sharded import ShardedPrioritizedReplayBuffer
+from ._rank_based import RankBasedPrioritizedReplayBuffer
+from ._trajectory import TrajectoryReplayBuffer
+from ._jax_prioritized import JaxPrioritizedReplayBuffer
+from ._shared_memory import SharedMemoryReplayBuffer
+from ._prefetch import Prefetcher
+from ._rate_limiter import RateLimiter
 
 
 __all__ = (
     'SimpleReplayBuffer',
     'PrioritizedReplayBuffer',
+    'ShardedPrioritizedReplayBuffer',
+    'RankBasedPrioritizedReplayBuffer',
+    'TrajectoryReplayBuffer',
+    'JaxPrioritizedReplayBuffer',
+    'SharedMemoryReplayBuffer',
+    'Prefetcher',
+    'RateLimiter',
 )
@@ -1,5 +1,8 @@
+import inspect
 from abc import ABC, abstractmethod
 
+import numpy as onp
+
 
 __all__ = (
     'BaseReplayBuffer',
@@ -36,3 +39,27 @@ class BaseReplayBuffer(ABC):
     @abstractmethod
     def __iter__(self):
         pass
+
+
+def _check_capacity(capacity, capacity_bytes, dirpath=None):
+    """ validate the mutually exclusive capacity and capacity_bytes arguments """
+    if (capacity is None) == (capacity_bytes is None):
+        raise ValueError("must provide exactly one of capacity and capacity_bytes")
+    if capacity is not None and not (isinstance(capacity, int) and capacity > 0):
+        raise TypeError(f"capacity must be a positive int, got: {capacity}")
+    if capacity_bytes is not None:
+        if not (isinstance(capacity_bytes, int) and capacity_bytes > 0):
+            raise TypeError(f"capacity_bytes must be a positive int, got: {capacity_bytes}")
+        if dirpath is not None:
+            raise ValueError("capacity_bytes can't be combined with dirpath")
+
+
+def _capacity_from_bytes(cls, capacity_bytes, transition_batch, **kwargs):
+    """ the number of transitions that fit in capacity_bytes, measured by storing a probe batch """
+    n = transition_batch.batch_size
+    probe = cls(capacity=n, **kwargs)
+    if 'Adv' in inspect.signature(probe.add).parameters:
+        probe.add(transition_batch.copy(), Adv=onp.zeros(n))
+    else:
+        probe.add(transition_batch.copy())
+    return max(1, capacity_bytes * n // sum(probe.memory_usage().values()))
@@ -0,0 +1,320 @@
+from typing import NamedTuple
+
+import jax
+import jax.numpy as jnp
+import numpy as onp
+
+from ..reward_tracing import TransitionBatch
+from ..utils import jit
+
+
+__all__ = (
+    'JaxPrioritizedReplayBuffer',
+)
+
+
+class JaxPrioritizedReplayState(NamedTuple):
+    storage: TransitionBatch  # leaves have shape: (capacity, ...)
+    ids: jnp.ndarray          # transition ids, shape: (capacity,)
+    tree: jnp.ndarray         # sum-tree, same layout as coax.utils.SumTree
+    index: jnp.ndarray        # id of the next transition to be added, shape: ()
+    size: jnp.ndarray         # number of transitions stored, shape: ()
+
+
+class JaxPrioritizedReplayBuffer:
+    r"""
+
+    A prioritized experience-replay buffer whose storage lives on the accelerator.
+
+    This is a pure-functional counterpart of :class:`PrioritizedReplayBuffer
+    <coax.experience_replay.PrioritizedReplayBuffer>`. The buffer object itself only holds the
+    (static) hyperparameters, while the transitions and priorities are kept in a separate state
+    pytree of :mod:`jax.numpy` arrays. The JIT-compiled functions :attr:`add`, :attr:`sample` and
+    :attr:`update` take this state as input and return an updated state, which means that they
+    can also be called from within a user-defined jitted train step. For instance, the following
+    step samples a batch, computes the :class:`QLearning <coax.td_learning.QLearning>` gradients,
+    applies them and updates the priorities, all in a single dispatch:
+
+    .. code::
+
+        buffer = coax.experience_replay.JaxPrioritizedReplayBuffer(capacity=100000, alpha=0.6)
+        buffer_state = buffer.init(example_transition_batch)
+
+        qlearning = coax.td_learning.QLearning(q, q_targ=q_targ, optimizer=optax.adam(1e-3))
+        grads_and_metrics = qlearning._grads_and_metrics_func  # params and state are arguments
+
+        @jax.jit
+        def train_step(buffer_state, params, target_params, state, target_state, opt_state, rng):
+            rng_sample, rng_grads = jax.random.split(rng)
+            transition_batch = buffer.sample(buffer_state, rng_sample, 32, 0.4)
+            grads, state, metrics, td_error = grads_and_metrics(
+                params, target_params, state, target_state, rng_grads, transition_batch)
+            updates, opt_state = qlearning.optimizer.update(grads, opt_state, params)
+            params = optax.apply_updates(params, updates)
+            buffer_state = buffer.update(buffer_state, transition_batch.idx, td_error)
+            return buffer_state, params, state, opt_state, metrics
+
+        buffer_state, q.params, q.function_state, qlearning.optimizer_state, metrics = train_step(
+            buffer_state, q.params, qlearning.target_params, q.function_state,
+            qlearning.target_function_state, qlearning.optimizer_state, q.rng)
+
+    The target parameters are passed as arguments rather than read inside the step, such that
+    the compiled step doesn't hold on to stale copies of them.
+
+    The priorities are kept in a sum-tree with the same layout as :class:`coax.utils.SumTree`, and
+    the sampling procedure and importance weights are the same as in :class:`PrioritizedReplayBuffer
+    <coax.experience_replay.PrioritizedReplayBuffer>`.
+
+    The transition ids are int32, such that the buffer works without :code:`jax_enable_x64`. They
+    wrap around after (roughly) :math:`2^{31}` added transitions, at a multiple of the capacity.
+    This means that an id only becomes ambiguous if it's passed to :attr:`update` after that many
+    other transitions have been added.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The capacity of the experience replay buffer.
+
+    alpha : positive float, optional
+
+        The sampling temperature :math:`\alpha>0`.
+
+    epsilon : positive float, optional
+
+        The small regulator :math:`\epsilon>0`.
+
+    """
+    def __init__(self, capacity, alpha=1.0, epsilon=1e-4):
+        if not (isinstance(capacity, int) and capacity > 0):
+            raise TypeError(f"capacity must be a positive int, got: {capacity}")
+        if capacity > 2 ** 30:
+            raise ValueError(f"capacity may not exceed 2^30, got: {capacity}")
+        if not (isinstance(alpha, (float, int)) and alpha > 0):
+            raise TypeError(f"alpha must be a positive float, got: {alpha}")
+        if not (isinstance(epsilon, (float, int)) and epsilon > 0):
+            raise TypeError(f"epsilon must be a positive float, got: {epsilon}")
+
+        self._capacity = int(capacity)
+        self._alpha = float(alpha)
+        self._epsilon = float(epsilon)
+        self._height = int(onp.ceil(onp.log2(capacity))) + 1  # same as coax.utils.SumTree
+        # ids wrap around at a multiple of the capacity, such that index + batch_size fits in int32
+        self._id_period = (onp.iinfo('int32').max - capacity) // capacity * capacity
+
+        def priorities(Adv):
+            return jnp.power(jnp.abs(Adv) + self.epsilon, self.alpha)
+
+        def add(state, transition_batch, Adv):
+            if transition_batch.batch_size > self.capacity:
+                raise ValueError(
+                    f"transition_batch.batch_size ({transition_batch.batch_size}) may not exceed "
+                    f"the capacity ({self.capacity})")
+            ids = state.index + jnp.arange(transition_batch.batch_size, dtype=state.ids.dtype)
+            ids %= self._id_period
+            idx = ids % self.capacity  # wrap around
+            transition_batch = jax.tree_map(lambda x: x, transition_batch)  # shallow copy
+            transition_batch.idx = ids
+            storage = jax.tree_map(
+                lambda col, x: col.at[idx].set(x.astype(col.dtype)), state.storage,
+                transition_batch)
+            return JaxPrioritizedReplayState(
+                storage=storage,
+                ids=state.ids.at[idx].set(ids),
+                tree=_sumtree_set_values(state.tree, idx, priorities(Adv), self._height),
+                index=(state.index + transition_batch.batch_size) % self._id_period,
+                size=jnp.minimum(state.size + transition_batch.batch_size, self.capacity))
+
+        def sample(state, rng, batch_size, beta):
+            idx = _sumtree_inverse_cdf(
+                state.tree, jax.random.uniform(rng, (batch_size,)), self._height)
+            P = _sumtree_values(state.tree, self._height)[idx] / state.tree[0]
+            W = jnp.power(P * state.size, -beta)
+            W /= W.max()  # for stability, ensure only down-weighting (see arxiv:1511.05952)
+            transition_batch = jax.tree_map(lambda col: col[idx], state.storage)
+            transition_batch.W = transition_batch.W * W
+            return transition_batch
+
+        def update(state, idx, Adv):
+            idx_lookup = idx % self.capacity  # wrap around
+            new_values = jnp.where(
+                state.ids[idx_lookup] == idx,  # only update if ids match
+                priorities(Adv),
+                _sumtree_values(state.tree, self._height)[idx_lookup])
+            tree = _sumtree_set_values(state.tree, idx_lookup, new_values, self._height)
+            return state._replace(tree=tree)
+
+        self._add_func = jit(add, donate_argnums=(0,))
+        self._sample_func = jit(sample, static_argnums=(2,))
+        self._update_func = jit(update, donate_argnums=(0,))
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @property
+    def epsilon(self):
+        return self._epsilon
+
+    def init(self, transition_batch):
+        r"""
+
+        Create an empty buffer state.
+
+        Parameters
+        ----------
+        transition_batch : TransitionBatch
+
+            An example :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>`, which is used
+            to infer the shapes and dtypes of the storage arrays.
+
+        Returns
+        -------
+        state : JaxPrioritizedReplayState
+
+            The initial (empty) buffer state.
+
+        """
+        if not isinstance(transition_batch, TransitionBatch):
+            raise TypeError(
+                f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+        storage = jax.tree_map(
+            lambda x: jnp.zeros((self.capacity,) + jnp.shape(x)[1:], dtype=jnp.asarray(x).dtype),
+            transition_batch)
+        return JaxPrioritizedReplayState(
+            storage=storage,
+            ids=jnp.full(self.capacity, -1, dtype='int32'),
+            tree=jnp.zeros(2 ** self._height - 1, dtype='float32'),
+            index=jnp.zeros((), dtype='int32'),
+            size=jnp.zeros((), dtype='int32'))
+
+    @property
+    def add(self):
+        r"""
+
+        JIT-compiled function that adds a batch of transitions to the buffer.
+
+        Parameters
+        ----------
+        state : JaxPrioritizedReplayState
+
+            The current buffer state. This state is donated, i.e. it may no longer be used after
+            calling this function.
+
+        transition_batch : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        Adv : ndarray
+
+            A batch of advantages, used to construct the priorities :math:`p_i`.
+
+        Returns
+        -------
+        state : JaxPrioritizedReplayState
+
+            The updated buffer state.
+
+        """
+        return self._add_func
+
+    @property
+    def sample(self):
+        r"""
+
+        JIT-compiled function that samples a batch of transitions with prioritized sampling.
+
+        Parameters
+        ----------
+        state : JaxPrioritizedReplayState
+
+            The current buffer state.
+
+        rng : PRNGKey
+
+            A key for seeding the pseudo-random number generator.
+
+        batch_size : positive int
+
+            The desired batch size of the sample. This is a static argument.
+
+        beta : positive float
+
+            The importance-weight exponent :math:`\beta>0`.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object, whose
+            :attr:`W` attribute contains the importance weights.
+
+        """
+        return self._sample_func
+
+    @property
+    def update(self):
+        r"""
+
+        JIT-compiled function that updates the priorities of transitions previously added to the
+        buffer. Transitions that have since been overwritten are left untouched.
+
+        Parameters
+        ----------
+        state : JaxPrioritizedReplayState
+
+            The current buffer state. This state is donated, i.e. it may no longer be used after
+            calling this function.
+
+        idx : 1d array of ints
+
+            The identifiers of the transitions to be updated.
+
+        Adv : ndarray
+
+            The corresponding updated advantages.
+
+        Returns
+        -------
+        state : JaxPrioritizedReplayState
+
+            The updated buffer state.
+
+        """
+        return self._update_func
+
+
+def _sumtree_values(tree, height):
+    return tree[(2 ** (height - 1) - 1):]
+
+
+def _sumtree_set_values(tree, idx, values, height):
+    """ same as coax.utils.SumTree.set_values, but for a jax.numpy array """
+    level_offset = 2 ** (height - 1) - 1
+    tree = tree.at[level_offset + idx].set(values.astype(tree.dtype))
+    for level in range(height - 2, -1, -1):
+        idx = idx // 2
+        left_child = level_offset + 2 * idx
+        level_offset = 2 ** level - 1
+        tree = tree.at[level_offset + idx].set(tree[left_child] + tree[left_child + 1])
+    return tree
+
+
+def _sumtree_inverse_cdf(tree, u, height):
+    """ same as coax.utils.SumTree.inverse_cdf, but for a jax.numpy array """
+    values = u * tree[0]
+    idx = jnp.zeros(u.shape, dtype='int32')
+    level_offset_parent = 0
+    for level in range(1, height):
+        level_offset = 2 ** level - 1
+        left_child_idx = (idx - level_offset_parent) * 2 + level_offset
+        left_child_values = tree[left_child_idx]
+        pick_left_child = left_child_values > values
+        idx = jnp.where(pick_left_child, left_child_idx, left_child_idx + 1)
+        values = jnp.where(pick_left_child, values, values - left_child_values)
+        level_offset_parent = level_offset
+    return idx - level_offset_parent
@@ -0,0 +1,133 @@
+import gymnasium
+import haiku as hk
+import jax
+import jax.numpy as jnp
+import numpy as onp
+import optax
+import pytest
+
+from .. import Q
+from ..td_learning import QLearning
+from ..utils import get_transition_batch
+from ._prioritized import PrioritizedReplayBuffer
+from ._jax_prioritized import JaxPrioritizedReplayBuffer
+
+
+def fill(n):
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer1 = PrioritizedReplayBuffer(capacity=100, alpha=0.8)
+    buffer2 = JaxPrioritizedReplayBuffer(capacity=100, alpha=0.8)
+    state = buffer2.init(get_transition_batch(env, batch_size=1))
+
+    for i in range(n):
+        transition_batch = get_transition_batch(env, batch_size=32, random_seed=i)
+        transition_batch.W = onp.ones_like(transition_batch.W)  # start with uniform weights
+        buffer1.add(transition_batch.copy(), Adv=transition_batch.Rn)
+        state = buffer2.add(state, transition_batch, transition_batch.Rn)
+
+    return buffer1, buffer2, state
+
+
+def test_consistency():
+    buffer1, buffer2, state = fill(4)  # 4 * batch_size > capacity
+    assert int(state.index) == buffer1._index
+    onp.testing.assert_array_equal(state.ids, buffer1._idx)
+    onp.testing.assert_allclose(state.tree, buffer1._sumtree._arr, rtol=1e-5)
+    onp.testing.assert_array_equal(state.storage.S, buffer1._storage.get(onp.arange(100)).S)
+
+
+def test_update():
+    buffer1, buffer2, state = fill(4)
+    idx = onp.array([0, 50, 100, 127])  # id=0 is stale and must be ignored
+    Adv = onp.array([7., 8., 9., 10.])
+    buffer1.update(idx, Adv)
+    state = buffer2.update(state, idx, Adv)
+    onp.testing.assert_allclose(state.tree, buffer1._sumtree._arr, rtol=1e-5)
+
+
+def test_sample():
+    buffer1, buffer2, state = fill(2)
+    rng = jax.random.PRNGKey(13)
+    transition_batch = buffer2.sample(state, rng, 1000, 0.5)
+    assert transition_batch.batch_size == 1000
+    assert onp.all(transition_batch.idx < 64)
+    assert onp.all(transition_batch.W <= 1) and not onp.allclose(transition_batch.W, 1)
+
+    # compare to the numpy implementation, given the same uniform variates
+    u = onp.asarray(jax.random.uniform(rng, (1000,)))
+    idx = buffer1._sumtree.inverse_cdf(u)
+    onp.testing.assert_array_equal(transition_batch.idx, buffer1._idx[idx])
+    onp.testing.assert_array_equal(transition_batch.S, buffer1._storage.get(idx).S)
+
+
+def test_jit_train_step():
+    buffer1, buffer2, state = fill(2)
+
+    @jax.jit
+    def train_step(state, rng):
+        transition_batch = buffer2.sample(state, rng, 8, 0.4)
+        td_error = transition_batch.Rn + 1.
+        return buffer2.update(state, transition_batch.idx, td_error)
+
+    state = train_step(state, jax.random.PRNGKey(7))
+    assert onp.isclose(state.tree[0], state.tree[-128:].sum(), rtol=1e-5)
+
+
+def test_fused_qlearning_step():
+    # the example in the docstring of JaxPrioritizedReplayBuffer
+    buffer1, buffer, buffer_state = fill(2)
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+
+    def func(S, is_training):
+        return hk.Linear(env.action_space.n, w_init=jnp.zeros)(S)
+
+    q = Q(func, env)
+    q_targ = q.copy()
+    qlearning = QLearning(q, q_targ=q_targ, optimizer=optax.adam(1e-3))
+    grads_and_metrics = qlearning._grads_and_metrics_func  # params and state are arguments
+
+    @jax.jit
+    def train_step(buffer_state, params, target_params, state, target_state, opt_state, rng):
+        rng_sample, rng_grads = jax.random.split(rng)
+        transition_batch = buffer.sample(buffer_state, rng_sample, 32, 0.4)
+        grads, state, metrics, td_error = grads_and_metrics(
+            params, target_params, state, target_state, rng_grads, transition_batch)
+        updates, opt_state = qlearning.optimizer.update(grads, opt_state, params)
+        params = optax.apply_updates(params, updates)
+        buffer_state = buffer.update(buffer_state, transition_batch.idx, td_error)
+        return buffer_state, params, state, opt_state, metrics
+
+    tree_before = buffer_state.tree
+    buffer_state, q.params, q.function_state, qlearning.optimizer_state, metrics = train_step(
+        buffer_state, q.params, qlearning.target_params, q.function_state,
+        qlearning.target_function_state, qlearning.optimizer_state, q.rng)
+
+    assert 'QLearning/loss' in metrics
+    assert not onp.allclose(buffer_state.tree, tree_before)  # priorities were updated
+    assert onp.isclose(buffer_state.tree[0], buffer_state.tree[-128:].sum(), rtol=1e-5)
+    assert not onp.allclose(q.params['linear']['w'], 0)
+
+
+def test_ids_wrap_around():
+    buffer1, buffer2, state = fill(4)
+    period = buffer2._id_period
+    state = state._replace(index=jax.numpy.asarray(period - 16, dtype='int32'))
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    transition_batch = get_transition_batch(env, batch_size=32, random_seed=7)
+    state = buffer2.add(state, transition_batch, transition_batch.Rn)
+    assert int(state.index) == 16 and int(state.size) == 100
+    ids = onp.asarray(state.ids)
+    assert ids.min() >= 0 and ids.max() < period
+
+    # ids that were added after the wrap-around can still be updated
+    state = buffer2.update(state, onp.array([3]), onp.array([50.]))
+    assert onp.isclose(state.tree[-128:][3], (50. + buffer2.epsilon) ** buffer2.alpha)
+
+
+def test_batch_exceeds_capacity():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = JaxPrioritizedReplayBuffer(capacity=10)
+    state = buffer.init(get_transition_batch(env))
+    transition_batch = get_transition_batch(env, batch_size=11)
+    with pytest.raises(ValueError):
+        buffer.add(state, transition_batch, transition_batch.Rn)
@@ -0,0 +1,290 @@
+import inspect
+import queue
+import threading
+
+import jax
+
+from ._base import BaseReplayBuffer
+
+
+__all__ = (
+    'Prefetcher',
+)
+
+
+class Prefetcher(BaseReplayBuffer):
+    r"""
+
+    A wrapper around an experience-replay buffer that prepares sampled batches in the background.
+
+    A number of worker threads keep a bounded queue of ready-made :class:`TransitionBatch
+    <coax.reward_tracing.TransitionBatch>` objects filled, such that gathering the next batch (and
+    optionally transferring it to the accelerator) overlaps with the current update step. All
+    calls to the wrapped buffer are serialized by a lock, so it's safe to keep adding transitions
+    and updating priorities through the prefetcher while the worker threads are sampling.
+
+    Example
+    -------
+
+    .. code::
+
+        buffer = coax.experience_replay.PrioritizedReplayBuffer(capacity=100000)
+        buffer = coax.experience_replay.Prefetcher(buffer, batch_size=32, warmup=5000)
+
+        for ...:
+            buffer.add(transition_batch, Adv=td_error)
+            ...
+            if len(buffer) >= 5000:
+                transition_batch = buffer.sample()  # ready-made batch, taken from the queue
+                metrics, td_error = qlearning.update(transition_batch, return_td_error=True)
+                buffer.update(transition_batch.idx, td_error)
+
+    Note that prefetched batches are sampled before they're consumed, which means that they don't
+    reflect the transitions and priorities that were added or updated in the meantime. For
+    instance, the importance weights of a batch sampled from a :class:`PrioritizedReplayBuffer
+    <coax.experience_replay.PrioritizedReplayBuffer>` are based on the priorities at sampling time.
+    The staleness is bounded by the number of queued batches. It can be monitored by comparing
+    :attr:`sample_version` to :attr:`version` and it can be capped with :code:`max_staleness`.
+    Priority updates of transitions that have been overwritten in the meantime are ignored by the
+    wrapped buffer, as usual.
+
+    Parameters
+    ----------
+    buffer : ReplayBuffer
+
+        The experience-replay buffer to wrap.
+
+    batch_size : positive int, optional
+
+        The batch size of the prefetched samples.
+
+    num_batches : positive int, optional
+
+        The maximal number of batches to keep in the queue.
+
+    num_threads : positive int, optional
+
+        The number of worker threads that fill the queue.
+
+    warmup : int, optional
+
+        The minimal number of transitions that need to be stored in the replay buffer before the
+        worker threads start sampling from it.
+
+    device_put : bool, optional
+
+        Whether to transfer the prefetched batches to the default device, see
+        :func:`jax.device_put`.
+
+    max_staleness : int, optional
+
+        If provided, prefetched batches that were sampled more than this number of :attr:`add` or
+        :attr:`update` calls ago are discarded and replaced by a freshly sampled batch.
+
+    """
+    def __init__(
+            self, buffer, batch_size=32, num_batches=2, num_threads=1, warmup=None,
+            device_put=False, max_staleness=None):
+        if not (hasattr(buffer, 'sample') and hasattr(buffer, '__len__')):
+            raise TypeError(f"buffer must be a replay buffer, got: {type(buffer)}")
+        if not (isinstance(batch_size, int) and batch_size > 0):
+            raise TypeError(f"batch_size must be a positive int, got: {batch_size}")
+        if not (isinstance(num_batches, int) and num_batches > 0):
+            raise TypeError(f"num_batches must be a positive int, got: {num_batches}")
+        if not (isinstance(num_threads, int) and num_threads > 0):
+            raise TypeError(f"num_threads must be a positive int, got: {num_threads}")
+        if not (max_staleness is None or (isinstance(max_staleness, int) and max_staleness >= 0)):
+            raise TypeError(f"max_staleness must be a non-negative int, got: {max_staleness}")
+
+        self._buffer = buffer
+        self._batch_size = batch_size
+        self._num_threads = num_threads
+        self._warmup = max(warmup or 0, batch_size)
+        self._device_put = bool(device_put)
+        self._max_staleness = max_staleness
+        self._lock = threading.RLock()
+        self._queue = queue.Queue(maxsize=num_batches)
+        self._stop = threading.Event()
+        self._threads = []
+        self._version = 0
+        self._sample_version = 0
+        self._clear_version = 0
+
+    @property
+    def buffer(self):
+        r""" The wrapped experience-replay buffer. """
+        return self._buffer
+
+    @property
+    def capacity(self):
+        return self._buffer.capacity
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def version(self):
+        r""" The number of :attr:`add`, :attr:`update` and :attr:`clear` calls so far. """
+        return self._version
+
+    @property
+    def sample_version(self):
+        r""" The :attr:`version` at which the most recent output of :attr:`sample` was sampled. """
+        return self._sample_version
+
+    @property
+    def staleness(self):
+        r"""
+
+        The number of :attr:`add`, :attr:`update` and :attr:`clear` calls that happened between
+        sampling and now, for the most recent output of :attr:`sample`.
+
+        """
+        return self._version - self._sample_version
+
+    def add(self, transition_batch, Adv=None):
+        r"""
+
+        Add a transition to the wrapped experience replay buffer.
+
+        Parameters
+        ----------
+        transition_batch : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        Adv : ndarray, optional
+
+            A batch of advantages, which is only passed on if the wrapped buffer accepts it.
+
+        """
+        with self._lock:
+            if 'Adv' in inspect.signature(self._buffer.add).parameters:  # duck typing
+                self._buffer.add(transition_batch, Adv=Adv)
+            else:
+                self._buffer.add(transition_batch)
+            self._version += 1
+
+    def update(self, idx, Adv):
+        r"""
+
+        Update the priority weights of transitions previously added to the wrapped buffer.
+
+        Parameters
+        ----------
+        idx : 1d array of ints
+
+            The identifiers of the transitions to be updated.
+
+        Adv : ndarray
+
+            The corresponding updated advantages.
+
+        """
+        with self._lock:
+            self._buffer.update(idx, Adv=Adv)
+            self._version += 1
+
+    def sample(self, batch_size=None):
+        r"""
+
+        Get a batch of transitions to be used for bootstrapped updates.
+
+        This takes a prefetched batch from the queue, blocking until one is available. The worker
+        threads are started upon the first call.
+
+        Parameters
+        ----------
+        batch_size : positive int, optional
+
+            The desired batch size of the sample. If this differs from the :attr:`batch_size`
+            passed to the constructor, the batch is sampled synchronously instead.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        if batch_size is not None and batch_size != self.batch_size:
+            self._sample_version, transition_batch = self._sample(batch_size)
+            return transition_batch
+
+        self._start()
+        version, transition_batch = self._queue.get()
+        while version < self._clear_version:  # sampled before the buffer was cleared
+            version, transition_batch = self._queue.get()
+        if self._max_staleness is not None and self._version - version > self._max_staleness:
+            version, transition_batch = self._sample(self.batch_size)
+        self._sample_version = version
+        return transition_batch
+
+    def clear(self):
+        r""" Clear the wrapped experience replay buffer and discard all prefetched batches. """
+        with self._lock:
+            self._buffer.clear()
+            self._version += 1
+            self._clear_version = self._version
+            self._drain()
+
+    def close(self):
+        r""" Stop the worker threads and discard all prefetched batches. """
+        self._stop.set()
+        self._drain()  # unblock threads that are waiting for a free slot
+        for thread in self._threads:
+            thread.join()
+        self._drain()
+        self._threads = []
+        self._stop.clear()
+
+    def _start(self):
+        if self._threads:
+            return
+        for i in range(self._num_threads):
+            thread = threading.Thread(target=self._run, name=f'Prefetcher-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        wait_secs = 1 / 1024.
+        while not self._stop.is_set():
+            if len(self) < self._warmup:
+                # back off, because len() may be expensive, e.g. a remote call to a param store
+                self._stop.wait(wait_secs)
+                wait_secs = min(1., wait_secs * 2)
+                continue
+            item = self._sample(self.batch_size)
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def _sample(self, batch_size):
+        with self._lock:
+            version = self._version
+            transition_batch = self._buffer.sample(batch_size=batch_size)
+        if self._device_put:
+            transition_batch = jax.device_put(transition_batch)
+        return version, transition_batch
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def __bool__(self):
+        return bool(len(self))
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._buffer))
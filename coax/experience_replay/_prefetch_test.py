@@ -0,0 +1,71 @@
+import time
+
+import gymnasium
+import jax
+import numpy as onp
+
+from ..utils import get_transition_batch
+from ._simple import SimpleReplayBuffer
+from ._prioritized import PrioritizedReplayBuffer
+from ._prefetch import Prefetcher
+
+
+def test_sample():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = Prefetcher(SimpleReplayBuffer(capacity=100, random_seed=13), batch_size=8)
+    buffer.add(get_transition_batch(env, batch_size=32, random_seed=0))
+    assert len(buffer) == 32
+
+    transition_batch = buffer.sample()
+    assert transition_batch.batch_size == 8
+    assert buffer.sample_version == 1
+    assert buffer.sample(batch_size=3).batch_size == 3  # sampled synchronously
+    buffer.close()
+
+
+def test_prioritized_staleness():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = Prefetcher(
+        PrioritizedReplayBuffer(capacity=100, random_seed=13), batch_size=8, num_batches=4,
+        device_put=True, max_staleness=2)
+    transition_batch = get_transition_batch(env, batch_size=32, random_seed=0)
+    buffer.add(transition_batch, Adv=transition_batch.Rn)
+
+    for i in range(10):
+        transition_batch = buffer.sample()
+        assert isinstance(transition_batch.S, jax.Array)
+        assert buffer.staleness <= 2
+        buffer.update(transition_batch.idx, onp.ones(8))
+        assert buffer.version == i + 2
+    buffer.close()
+
+
+def test_clear():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = Prefetcher(SimpleReplayBuffer(capacity=100), batch_size=8)
+    buffer.add(get_transition_batch(env, batch_size=32, random_seed=0))
+    buffer.sample()
+    buffer.clear()
+    assert not buffer
+
+    # batches from before the clear are never returned
+    buffer.add(get_transition_batch(env, batch_size=16, random_seed=1))
+    buffer.sample()
+    assert buffer.sample_version >= buffer.version - 1
+    buffer.close()
+
+
+def test_warmup_backoff():
+    class CountingBuffer(SimpleReplayBuffer):
+        num_len_calls = 0
+
+        def __len__(self):
+            self.num_len_calls += 1
+            return super().__len__()
+
+    buffer = CountingBuffer(capacity=100, random_seed=13)
+    prefetcher = Prefetcher(buffer, batch_size=8)
+    prefetcher._start()
+    time.sleep(0.3)
+    prefetcher.close()
+    assert 0 < buffer.num_len_calls < 20  # polling every 1ms would be ~300 calls
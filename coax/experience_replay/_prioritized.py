@@ -1,10 +1,10 @@
-import jax
 import numpy as onp
 import chex
 
 from ..reward_tracing import TransitionBatch
 from ..utils import SumTree
-from ._base import BaseReplayBuffer
+from ._base import BaseReplayBuffer, _check_capacity, _capacity_from_bytes
+from ._storage import checkpoint_capacity, create_storage
 
 
 __all__ = (
@@ -42,11 +42,16 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
 
     See section 3.4 of https://arxiv.org/abs/1511.05952 for more details.
 
+    Transitions are kept in preallocated struct-of-arrays storage, alongside a parallel column of
+    transition ids. This means that :attr:`sample` amounts to a single gather per leaf and that
+    :attr:`update` checks all ids in one vectorized comparison.
+
     Parameters
     ----------
-    capacity : positive int
+    capacity : positive int, optional
 
-        The capacity of the experience replay buffer.
+        The capacity of the experience replay buffer. Either this or :code:`capacity_bytes` must be
+        provided.
 
     alpha : positive float, optional
 
@@ -64,10 +69,56 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
 
         To get reproducible results.
 
+    dedup_frames : bool, optional
+
+        Whether to store each unique observation frame only once. This is only meant for
+        observations produced by :class:`coax.wrappers.FrameStacking` (tuples of frames), for which
+        it reduces the memory footprint by roughly a factor ``2 * num_frames``.
+
+    dirpath : str, optional
+
+        If provided, the buffer is backed by memory-mapped files in this directory, see
+        :class:`numpy.memmap`. This allows for buffers that don't fit in RAM. If the directory
+        already holds the files of a previous buffer (with the same capacity), the buffer resumes
+        where that one left off, including the ring position and the priorities.
+
+    compress_observations : bool, optional
+
+        Whether to store the observations (the ``S`` and ``S_next`` fields) LZ4-compressed. Each
+        observation is compressed separately and only the sampled ones are decompressed, using a
+        pool of threads. This is meant for pixel observations, which typically compress by a
+        factor 5-10. This can't be combined with :code:`dedup_frames` or :code:`dirpath`.
+
+    dtype_policy : str or dict, optional
+
+        The dtypes in which to store the transitions, e.g. ``'compact'`` for float32 scalars, uint8
+        pixel observations and int32 discrete actions. The policy is applied once, when a
+        transition batch is added. See :class:`ColumnarStorage
+        <coax.experience_replay._storage.ColumnarStorage>` for the available policies.
+
+    capacity_bytes : positive int, optional
+
+        The memory budget of the buffer, as an alternative to specifying :code:`capacity`. The
+        capacity is then derived from the memory footprint of the first transition batch that is
+        added, see :attr:`memory_usage`. This can't be combined with :code:`dirpath`.
+
+    defer_updates : positive int, optional
+
+        If provided, calls to :attr:`update` are queued rather than applied right away. The queued
+        updates are applied in bulk before the next call to :attr:`sample`, or as soon as this
+        many calls to :attr:`update` are queued. If the same transition is updated more than once
+        in the meantime, only the last update counts. This means that :attr:`sample` always
+        reflects all updates that were made before it. Only direct reads of the priorities, e.g.
+        through :code:`buffer._sumtree`, may lag behind. See also :attr:`flush_updates`.
+
     """
-    def __init__(self, capacity, alpha=1.0, beta=1.0, epsilon=1e-4, random_seed=None):
-        if not (isinstance(capacity, int) and capacity > 0):
-            raise TypeError(f"capacity must be a positive int, got: {capacity}")
+    def __init__(
+            self, capacity=None, alpha=1.0, beta=1.0, epsilon=1e-4, random_seed=None,
+            dedup_frames=False, dirpath=None, compress_observations=False, dtype_policy=None,
+            capacity_bytes=None, defer_updates=None):
+        _check_capacity(capacity, capacity_bytes, dirpath)
+        if not (defer_updates is None or (isinstance(defer_updates, int) and defer_updates > 0)):
+            raise TypeError(f"defer_updates must be a positive int, got: {defer_updates}")
         if not (isinstance(alpha, (float, int)) and alpha > 0):
             raise TypeError(f"alpha must be a positive float, got: {alpha}")
         if not (isinstance(beta, (float, int)) and beta > 0):
@@ -75,18 +126,49 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
         if not (isinstance(epsilon, (float, int)) and epsilon > 0):
             raise TypeError(f"epsilon must be a positive float, got: {epsilon}")
 
-        self._capacity = int(capacity)
         self._alpha = float(alpha)
         self._beta = float(beta)
         self._epsilon = float(epsilon)
         self._random_seed = random_seed
         self._rnd = onp.random.RandomState(random_seed)
-        self.clear()  # sets: self._deque, self._index
+        self._options = {
+            'dedup_frames': dedup_frames, 'compress_observations': compress_observations,
+            'dtype_policy': dtype_policy}
+        self._dirpath = dirpath
+        self._capacity_bytes = capacity_bytes
+        self._defer_updates = defer_updates
+        self._pending_idx = onp.zeros(0, dtype='int64')  # array-backed log of queued updates
+        self._pending_adv = onp.zeros(0, dtype='float32')
+        self._num_pending = self._num_pending_calls = 0
+        self._capacity = self._storage = self._sumtree = None
+        if capacity is not None:
+            self._setup(capacity)
 
     @property
     def capacity(self):
         return self._capacity
 
+    def memory_usage(self):
+        r"""
+
+        Report the memory footprint of the experience replay buffer.
+
+        Returns
+        -------
+        usage : dict
+
+            A dict of field name → number of bytes, see :attr:`ColumnarStorage.memory_usage
+            <coax.experience_replay._storage.ColumnarStorage.memory_usage>`. The :class:`SumTree
+            <coax.utils.SumTree>` is reported under the key ``'_sumtree'``. This is empty if the
+            capacity hasn't been determined yet.
+
+        """
+        if self._storage is None:
+            return {}
+        usage = self._storage.memory_usage()
+        usage['_sumtree'] = self._sumtree._arr.nbytes
+        return usage
+
     @property
     def alpha(self):
         return self._alpha
@@ -95,12 +177,16 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
     def alpha(self, new_alpha):
         if not (isinstance(new_alpha, (float, int)) and new_alpha > 0):
             raise TypeError(f"alpha must be a positive float, got: {new_alpha}")
+        if self._sumtree is None:
+            self._alpha = float(new_alpha)  # no priorities yet
+            return
         if onp.isclose(new_alpha, self._alpha, rtol=0.01):
             return  # noop if new value is too close to old value (not worth the computation cost)
+        self.flush_updates()  # queued updates use the old alpha
         new_values = onp.where(
             self._sumtree.values <= 0, 0.,  # only change exponents for positive values
             onp.exp(onp.log(onp.maximum(self._sumtree.values, 1e-15)) * (new_alpha / self._alpha)))
-        self._sumtree.set_values(..., new_values)
+        self._set_priorities(..., new_values)
         self._alpha = float(new_alpha)
 
     @property
@@ -121,6 +207,7 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
     def epsilon(self, new_epsilon):
         if not (isinstance(new_epsilon, (float, int)) and new_epsilon > 0):
             raise TypeError(f"epsilon must be a positive float, got: {new_epsilon}")
+        self.flush_updates()  # queued updates use the old epsilon
         self._epsilon = float(new_epsilon)
 
     def add(self, transition_batch, Adv):
@@ -142,12 +229,16 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
         if not isinstance(transition_batch, TransitionBatch):
             raise TypeError(
                 f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+        if self._storage is None:
+            self._setup(_capacity_from_bytes(
+                type(self), self._capacity_bytes, transition_batch, **self._options))
 
         transition_batch.idx = self._index + onp.arange(transition_batch.batch_size)
         idx = transition_batch.idx % self.capacity  # wrap around
         chex.assert_equal_shape([idx, Adv])
-        self._storage[idx] = list(transition_batch.to_singles())
-        self._sumtree.set_values(idx, onp.power(onp.abs(Adv) + self.epsilon, self.alpha))
+        self._storage.set(idx, transition_batch)
+        self._idx[idx] = transition_batch.idx
+        self._set_priorities(idx, onp.power(onp.abs(Adv) + self.epsilon, self.alpha))
         self._index += transition_batch.batch_size
 
     def sample(self, batch_size=32):
@@ -168,11 +259,12 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
             A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
 
         """
+        self.flush_updates()
         idx = self._sumtree.sample(n=batch_size)
         P = self._sumtree.values[idx] / self._sumtree.root_value  # prioritized, biased propensities
         W = onp.power(P * len(self), -self.beta)                  # inverse propensity weights (β≈1)
         W /= W.max()  # for stability, ensure only down-weighting (see sec. 3.4 of arxiv:1511.05952)
-        transition_batch = _concatenate_leaves(self._storage[idx])
+        transition_batch = self._storage.get(idx)
         chex.assert_equal_shape([transition_batch.W, W])
         transition_batch.W *= W
         return transition_batch
@@ -193,38 +285,148 @@ class PrioritizedReplayBuffer(BaseReplayBuffer):
             The corresponding updated advantages.
 
         """
-        idx = onp.asarray(idx, dtype='int32')
+        idx = onp.asarray(idx, dtype='int64')
         Adv = onp.asarray(Adv, dtype='float32')
         chex.assert_equal_shape([idx, Adv])
         chex.assert_rank([idx, Adv], 1)
 
+        if self._defer_updates is None:
+            self._apply_updates(idx, Adv)
+            return
+
+        n = self._num_pending + len(idx)
+        if n > len(self._pending_idx):  # grow the log
+            self._pending_idx = onp.resize(self._pending_idx, max(n, 2 * len(self._pending_idx)))
+            self._pending_adv = onp.resize(self._pending_adv, max(n, 2 * len(self._pending_adv)))
+        self._pending_idx[self._num_pending:n] = idx
+        self._pending_adv[self._num_pending:n] = Adv
+        self._num_pending = n
+        self._num_pending_calls += 1
+        if self._num_pending_calls >= self._defer_updates:
+            self.flush_updates()
+
+    def flush_updates(self):
+        r"""
+
+        Apply all queued priority updates, see the :code:`defer_updates` option. This is called
+        automatically by :attr:`sample` and :attr:`save`.
+
+        """
+        if not self._num_pending:
+            return
+        idx = self._pending_idx[:self._num_pending]
+        Adv = self._pending_adv[:self._num_pending]
+        # resolve duplicates: last write wins
+        _, last = onp.unique(idx[::-1], return_index=True)
+        last = len(idx) - 1 - last
+        self._num_pending = self._num_pending_calls = 0
+        self._apply_updates(idx[last], Adv[last])
+
+    def _apply_updates(self, idx, Adv):
         idx_lookup = idx % self.capacity  # wrap around
         new_values = onp.where(
-            _get_transition_batch_idx(self._storage[idx_lookup]) == idx,  # only update if ids match
+            self._idx[idx_lookup] == idx,  # only update if ids match
             onp.power(onp.abs(Adv) + self.epsilon, self.alpha),
             self._sumtree.values[idx_lookup])
-        self._sumtree.set_values(idx_lookup, new_values)
+        self._set_priorities(idx_lookup, new_values)
+
+    def save(self, dirpath, incremental=True):
+        r"""
+
+        Save a checkpoint of the experience replay buffer.
+
+        The transitions are written as raw arrays, one file per chunk of rows. Subsequent saves to
+        the same directory only write the chunks that have changed since the previous save. The
+        priorities are stored alongside the transitions.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which to store the checkpoint.
+
+        incremental : bool, optional
+
+            Whether to only write the chunks that have changed since the last checkpoint that was
+            saved to (or loaded from) the same directory. Set this to False to force writing all
+            chunks.
+
+        """
+        if self._storage is None:
+            raise RuntimeError("cannot save a buffer whose capacity hasn't been determined yet")
+        self.flush_updates()
+        self._storage.save(
+            dirpath, incremental=incremental,
+            arrays={'priorities': self._sumtree.values},
+            metadata={
+                'alpha': self.alpha, 'beta': self.beta, 'epsilon': self.epsilon,
+                'sumtree_random_state': self._sumtree._rnd.get_state()})
+
+    def load(self, dirpath):
+        r"""
+
+        Restore the experience replay buffer from a checkpoint that was created with :attr:`save`.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which the checkpoint is stored.
+
+        """
+        if self._storage is None:
+            self._setup(checkpoint_capacity(dirpath))
+        arrays, metadata = self._storage.load(dirpath)
+        self._alpha = metadata['alpha']
+        self._beta = metadata['beta']
+        self._epsilon = metadata['epsilon']
+        self._sumtree = SumTree(capacity=self.capacity, random_seed=self._random_seed)
+        self._sumtree._rnd.set_state(metadata['sumtree_random_state'])
+        self._set_priorities(..., arrays['priorities'])
 
     def clear(self):
         r""" Clear the experience replay buffer. """
-        self._storage = onp.full(shape=(self.capacity,), fill_value=None, dtype='object')
+        self._num_pending = self._num_pending_calls = 0
+        if self._storage is None:
+            return
+        self._storage.clear()  # also resets: self._counter, self._idx, self._priorities
         self._sumtree = SumTree(capacity=self.capacity, random_seed=self._random_seed)
-        self._index = 0
 
-    def __len__(self):
-        return min(self.capacity, self._index)
+    def _setup(self, capacity):
+        self._capacity = int(capacity)
+        self._storage = create_storage(
+            self.capacity, dedup_frames=self._options['dedup_frames'], dirpath=self._dirpath,
+            compress=self._options['compress_observations'],
+            dtype_policy=self._options['dtype_policy'])
+        self._counter = self._storage.state('index', shape=(), dtype='int64', fill_value=0)
+        self._idx = self._storage.state('idx', shape=(self.capacity,), dtype='int64', fill_value=-1)
+        self._sumtree = SumTree(capacity=self.capacity, random_seed=self._random_seed)
+        self._priorities = None
+        if self._dirpath is not None:
+            # keep a persistent copy of the sumtree values, so that we can resume after a restart
+            self._priorities = self._storage.state(
+                'priorities', shape=(self.capacity,), dtype='float64', fill_value=0.)
+            self._sumtree.set_values(..., self._priorities)
 
-    def __bool__(self):
-        return bool(len(self))
+    @property
+    def _index(self):
+        return 0 if self._storage is None else int(self._counter)
 
-    def __iter__(self):
-        return iter(self._storage[:len(self)])
+    @_index.setter
+    def _index(self, new_index):
+        self._counter[...] = new_index
 
+    def _set_priorities(self, idx, values):
+        self._sumtree.set_values(idx, values)
+        if self._priorities is not None:
+            self._priorities[idx] = values
 
-def _concatenate_leaves(pytrees):
-    return jax.tree_map(lambda *leaves: onp.concatenate(leaves, axis=0), *pytrees)
+    def __len__(self):
+        return 0 if self._storage is None else min(self.capacity, self._index)
 
+    def __bool__(self):
+        return bool(len(self))
 
-@onp.vectorize
-def _get_transition_batch_idx(transition):
-    return transition.idx
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._storage[i]
@@ -27,7 +27,7 @@ def test_consistency(n):
     # test consistency between two buffers
     assert len(buffer1) == len(buffer2)
     for i in range(len(buffer1)):
-        t1 = buffer1._storage[i]
+        t1 = buffer1._storage[(i + buffer1._index) % len(buffer1)]
         t2 = buffer2._storage[(i + buffer2._index) % len(buffer2)]
         assert t1 == t2
 
@@ -121,3 +121,50 @@ def test_update():
     print(old_values[n])
     assert onp.sum(n) > 0
     assert onp.allclose(new_values[n], old_values[n])
+
+
+def test_update_unknown_ids():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = PrioritizedReplayBuffer(capacity=100, random_seed=13)
+    transition_batch = get_transition_batch(env, batch_size=32, random_seed=0)
+    buffer.add(transition_batch, Adv=transition_batch.Rn)
+    old_values = deepcopy(buffer._sumtree.values)
+
+    # ids that were never added to the buffer must be ignored
+    buffer.update(onp.arange(32, 64), onp.full(32, 13.))
+    assert onp.allclose(buffer._sumtree.values, old_values)
+
+    # known ids are updated in one go
+    buffer.update(onp.arange(32), onp.full(32, 13.))
+    assert onp.allclose(buffer._sumtree.values[:32], 13. + buffer.epsilon)
+
+
+def test_defer_updates():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer1 = PrioritizedReplayBuffer(capacity=100, random_seed=13)
+    buffer2 = PrioritizedReplayBuffer(capacity=100, random_seed=13, defer_updates=3)
+    for i in range(4):
+        transition_batch = get_transition_batch(env, batch_size=32, random_seed=i)
+        buffer1.add(transition_batch.copy(), Adv=transition_batch.Rn)
+        buffer2.add(transition_batch.copy(), Adv=transition_batch.Rn)
+    old_values = deepcopy(buffer2._sumtree.values)
+
+    # duplicate ids: last write wins
+    rnd = onp.random.RandomState(7)
+    updates = [(rnd.randint(28, 128, size=16), rnd.rand(16)) for _ in range(2)]
+    for idx, Adv in updates:
+        buffer1.update(idx, Adv)
+        buffer2.update(idx, Adv)
+    assert onp.allclose(buffer2._sumtree.values, old_values)  # still queued
+    assert buffer1.sample(batch_size=16) == buffer2.sample(batch_size=16)  # flushed
+    onp.testing.assert_allclose(buffer2._sumtree.values, buffer1._sumtree.values)
+
+    # flush every 3 updates
+    for i, (idx, Adv) in enumerate(updates * 2):
+        buffer1.update(idx, Adv + i)
+        buffer2.update(idx, Adv + i)
+        if i == 2:
+            onp.testing.assert_allclose(buffer2._sumtree.values, buffer1._sumtree.values)
+    assert buffer2._num_pending == 16
+    buffer2.flush_updates()
+    onp.testing.assert_allclose(buffer2._sumtree.values, buffer1._sumtree.values)
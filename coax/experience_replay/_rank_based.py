@@ -0,0 +1,414 @@
+import chex
+import numpy as onp
+
+from ..reward_tracing import TransitionBatch
+from ._base import BaseReplayBuffer, _check_capacity, _capacity_from_bytes
+from ._storage import checkpoint_capacity, create_storage
+
+
+__all__ = (
+    'RankBasedPrioritizedReplayBuffer',
+)
+
+
+class RankBasedPrioritizedReplayBuffer(BaseReplayBuffer):
+    r"""
+
+    A simple ring buffer for experience replay, with rank-based prioritized sampling.
+
+    This class uses *rank-based* sampling, which means that the transitions are sampled with
+    relative probability :math:`p_i` defined as:
+
+    .. math::
+
+        p_i\ =\ \frac
+            {\text{rank}(i)^{-\alpha}}
+            {\sum_{j=1}^N j^{-\alpha}}
+
+    Here, :math:`\text{rank}(i)` is the rank of transition :math:`i` when the transitions are
+    sorted by :math:`|\mathcal{A}_i|` in descending order, where :math:`\mathcal{A}_i` are
+    advantages provided at insertion time and :math:`N` is the number of transitions in the buffer.
+    The :math:`\mathcal{A}_i` are typically just TD errors collected from a value-function updater,
+    e.g. :func:`QLearning.td_error <coax.td_learning.QLearning.td_error>`. Compared to proportional
+    sampling (see :class:`PrioritizedReplayBuffer
+    <coax.experience_replay.PrioritizedReplayBuffer>`), rank-based sampling is insensitive to
+    outliers and to the overall scale of the advantages.
+
+    The importance weights (stored in the :class:`TransitionBatch.W
+    <coax.reward_tracing.TransitionBatch>` attribute) are constructed in the same way as for
+    proportional sampling:
+
+    .. math::
+
+        w_i\ =\ \frac{\left(Np_i\right)^{-\beta}}{\max_{j=1}^n \left(Np_j\right)^{-\beta}}
+
+    See section 3.3 of https://arxiv.org/abs/1511.05952 for more details.
+
+    The transitions are kept in a binary max-heap, such that each priority update takes
+    :math:`O(\log N)` time. As in the paper, a transition's position in the heap array is used as
+    an approximation of its rank. The heap array is sorted every :code:`sort_interval` priority
+    changes, which makes the approximation exact again. Samples are drawn by stratified sampling,
+    i.e. the rank distribution is split up into :code:`batch_size` segments of equal probability
+    mass and one transition is sampled from each segment.
+
+    Parameters
+    ----------
+    capacity : positive int, optional
+
+        The capacity of the experience replay buffer. Either this or :code:`capacity_bytes` must be
+        provided.
+
+    alpha : positive float, optional
+
+        The sampling temperature :math:`\alpha>0`.
+
+    beta : positive float, optional
+
+        The importance-weight exponent :math:`\beta>0`.
+
+    sort_interval : positive int, optional
+
+        The number of priority changes (added transitions plus updated priorities) after which the
+        heap array is sorted. Defaults to the capacity of the buffer.
+
+    random_seed : int, optional
+
+        To get reproducible results.
+
+    dedup_frames : bool, optional
+
+        Whether to store each unique observation frame only once. This is only meant for
+        observations produced by :class:`coax.wrappers.FrameStacking` (tuples of frames), for which
+        it reduces the memory footprint by roughly a factor ``2 * num_frames``.
+
+    dirpath : str, optional
+
+        If provided, the buffer is backed by memory-mapped files in this directory, see
+        :class:`numpy.memmap`. This allows for buffers that don't fit in RAM. If the directory
+        already holds the files of a previous buffer (with the same capacity), the buffer resumes
+        where that one left off, including the ring position and the priorities.
+
+    compress_observations : bool, optional
+
+        Whether to store the observations (the ``S`` and ``S_next`` fields) LZ4-compressed. Each
+        observation is compressed separately and only the sampled ones are decompressed, using a
+        pool of threads. This is meant for pixel observations, which typically compress by a
+        factor 5-10. This can't be combined with :code:`dedup_frames` or :code:`dirpath`.
+
+    dtype_policy : str or dict, optional
+
+        The dtypes in which to store the transitions, e.g. ``'compact'`` for float32 scalars, uint8
+        pixel observations and int32 discrete actions. The policy is applied once, when a
+        transition batch is added. See :class:`ColumnarStorage
+        <coax.experience_replay._storage.ColumnarStorage>` for the available policies.
+
+    capacity_bytes : positive int, optional
+
+        The memory budget of the buffer, as an alternative to specifying :code:`capacity`. The
+        capacity is then derived from the memory footprint of the first transition batch that is
+        added, see :attr:`memory_usage`. This can't be combined with :code:`dirpath`.
+
+    """
+    def __init__(
+            self, capacity=None, alpha=1.0, beta=1.0, sort_interval=None, random_seed=None,
+            dedup_frames=False, dirpath=None, compress_observations=False, dtype_policy=None,
+            capacity_bytes=None):
+        _check_capacity(capacity, capacity_bytes, dirpath)
+        if not (isinstance(beta, (float, int)) and beta > 0):
+            raise TypeError(f"beta must be a positive float, got: {beta}")
+        if not (sort_interval is None or (isinstance(sort_interval, int) and sort_interval > 0)):
+            raise TypeError(f"sort_interval must be a positive int, got: {sort_interval}")
+
+        self._capacity = self._storage = None
+        self.alpha = alpha  # also sets self._rank_cdf, once the capacity is known
+        self._beta = float(beta)
+        self._sort_interval = sort_interval
+        self._num_unsorted = 0
+        self._rnd = onp.random.RandomState(random_seed)
+        self._options = {
+            'sort_interval': sort_interval, 'dedup_frames': dedup_frames,
+            'compress_observations': compress_observations, 'dtype_policy': dtype_policy}
+        self._dirpath = dirpath
+        self._capacity_bytes = capacity_bytes
+        if capacity is not None:
+            self._setup(capacity)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def memory_usage(self):
+        r"""
+
+        Report the memory footprint of the experience replay buffer.
+
+        Returns
+        -------
+        usage : dict
+
+            A dict of field name → number of bytes, see :attr:`ColumnarStorage.memory_usage
+            <coax.experience_replay._storage.ColumnarStorage.memory_usage>`. The priorities and the
+            heap are included in ``'_state'``, the cached rank distribution is reported under the
+            key ``'_rank_cdf'``. This is empty if the capacity hasn't been determined yet.
+
+        """
+        if self._storage is None:
+            return {}
+        usage = self._storage.memory_usage()
+        usage['_rank_cdf'] = self._rank_cdf.nbytes
+        return usage
+
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, new_alpha):
+        if not (isinstance(new_alpha, (float, int)) and new_alpha > 0):
+            raise TypeError(f"alpha must be a positive float, got: {new_alpha}")
+        self._alpha = float(new_alpha)
+        # the (unnormalized) rank distribution doesn't depend on N, so we can cache its cdf
+        self._rank_cdf = None if self.capacity is None else onp.cumsum(
+            onp.power(onp.arange(1, self.capacity + 1.), -self.alpha))
+
+    @property
+    def beta(self):
+        return self._beta
+
+    @beta.setter
+    def beta(self, new_beta):
+        if not (isinstance(new_beta, (float, int)) and new_beta > 0):
+            raise TypeError(f"beta must be a positive float, got: {new_beta}")
+        self._beta = float(new_beta)
+
+    @property
+    def sort_interval(self):
+        return self._sort_interval
+
+    def add(self, transition_batch, Adv):
+        r"""
+
+        Add a transition to the experience replay buffer.
+
+        Parameters
+        ----------
+        transition_batch : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        Adv : ndarray
+
+            A batch of advantages, used to determine the ranks of the transitions.
+
+        """
+        if not isinstance(transition_batch, TransitionBatch):
+            raise TypeError(
+                f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+        if self._storage is None:
+            self._setup(_capacity_from_bytes(
+                type(self), self._capacity_bytes, transition_batch, **self._options))
+
+        transition_batch.idx = self._index + onp.arange(transition_batch.batch_size)
+        idx = transition_batch.idx % self.capacity  # wrap around
+        chex.assert_equal_shape([idx, Adv])
+        self._storage.set(idx, transition_batch)
+        self._idx[idx] = transition_batch.idx
+        self._set_priorities(idx, onp.abs(Adv))
+        self._index += transition_batch.batch_size
+
+    def sample(self, batch_size=32):
+        r"""
+
+        Get a batch of transitions to be used for bootstrapped updates.
+
+        Parameters
+        ----------
+        batch_size : positive int, optional
+
+            The desired batch size of the sample.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        n = len(self)
+        cdf = self._rank_cdf[:n]
+        u = (onp.arange(batch_size) + self._rnd.rand(batch_size)) / batch_size  # stratified
+        pos = onp.minimum(onp.searchsorted(cdf, u * cdf[-1], side='right'), n - 1)
+        P = onp.power(pos + 1., -self.alpha) / cdf[-1]  # prioritized, biased propensities
+        W = onp.power(P * n, -self.beta)               # inverse propensity weights (β≈1)
+        W /= W.max()  # for stability, ensure only down-weighting (see sec. 3.4 of arxiv:1511.05952)
+        transition_batch = self._storage.get(self._heap[pos])
+        chex.assert_equal_shape([transition_batch.W, W])
+        transition_batch.W *= W
+        return transition_batch
+
+    def update(self, idx, Adv):
+        r"""
+
+        Update the priority weights of transitions previously added to the buffer.
+
+        Parameters
+        ----------
+        idx : 1d array of ints
+
+            The identifiers of the transitions to be updated.
+
+        Adv : ndarray
+
+            The corresponding updated advantages.
+
+        """
+        idx = onp.asarray(idx, dtype='int64')
+        Adv = onp.asarray(Adv, dtype='float32')
+        chex.assert_equal_shape([idx, Adv])
+        chex.assert_rank([idx, Adv], 1)
+
+        idx_lookup = idx % self.capacity  # wrap around
+        mask = self._idx[idx_lookup] == idx  # only update if ids match
+        self._set_priorities(idx_lookup[mask], onp.abs(Adv[mask]))
+
+    def save(self, dirpath, incremental=True):
+        r"""
+
+        Save a checkpoint of the experience replay buffer.
+
+        The transitions are written as raw arrays, one file per chunk of rows. Subsequent saves to
+        the same directory only write the chunks that have changed since the previous save. The
+        priorities and the heap are stored alongside the transitions.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which to store the checkpoint.
+
+        incremental : bool, optional
+
+            Whether to only write the chunks that have changed since the last checkpoint that was
+            saved to (or loaded from) the same directory. Set this to False to force writing all
+            chunks.
+
+        """
+        if self._storage is None:
+            raise RuntimeError("cannot save a buffer whose capacity hasn't been determined yet")
+        self._storage.save(
+            dirpath, incremental=incremental,
+            metadata={
+                'alpha': self.alpha, 'beta': self.beta, 'random_state': self._rnd.get_state()})
+
+    def load(self, dirpath):
+        r"""
+
+        Restore the experience replay buffer from a checkpoint that was created with :attr:`save`.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which the checkpoint is stored.
+
+        """
+        if self._storage is None:
+            self._setup(checkpoint_capacity(dirpath))
+        _, metadata = self._storage.load(dirpath)
+        self.alpha = metadata['alpha']
+        self._beta = metadata['beta']
+        self._rnd.set_state(metadata['random_state'])
+
+    def clear(self):
+        r""" Clear the experience replay buffer. """
+        if self._storage is None:
+            return
+        self._storage.clear()  # also resets: self._counter, self._idx, self._priorities, self._heap
+        self._num_unsorted = 0
+
+    def _setup(self, capacity):
+        self._capacity = int(capacity)
+        self.alpha = self.alpha  # recompute self._rank_cdf
+        if self._sort_interval is None:
+            self._sort_interval = self.capacity
+        self._storage = create_storage(
+            self.capacity, dedup_frames=self._options['dedup_frames'], dirpath=self._dirpath,
+            compress=self._options['compress_observations'],
+            dtype_policy=self._options['dtype_policy'])
+        self._counter = self._storage.state('index', shape=(), dtype='int64', fill_value=0)
+        self._idx = self._storage.state('idx', shape=(self.capacity,), dtype='int64', fill_value=-1)
+        self._priorities = self._storage.state(
+            'priorities', shape=(self.capacity,), dtype='float64', fill_value=0.)
+        self._heap = self._storage.state(  # heap position -> storage row
+            'heap', shape=(self.capacity,), dtype='int64', fill_value=-1)
+        self._heap_pos = self._storage.state(  # storage row -> heap position
+            'heap_pos', shape=(self.capacity,), dtype='int64', fill_value=-1)
+
+    @property
+    def _index(self):
+        return 0 if self._storage is None else int(self._counter)
+
+    @_index.setter
+    def _index(self, new_index):
+        self._counter[...] = new_index
+
+    def _set_priorities(self, idx, values):
+        size = len(self)
+        for i, value in zip(idx.tolist(), values.tolist()):
+            self._priorities[i] = value
+            pos = int(self._heap_pos[i])
+            if pos < 0:  # new entry, append to heap
+                pos = size
+                self._heap[pos], self._heap_pos[i] = i, pos
+                size += 1
+            self._sift_down(self._sift_up(pos), size)
+
+        self._num_unsorted += len(idx)
+        if self._num_unsorted >= self.sort_interval:
+            self._sort(size)
+
+    def _sort(self, size):
+        """ sort the heap array, such that heap positions are exact ranks """
+        rows = self._heap[:size]
+        rows = rows[onp.argsort(-self._priorities[rows], kind='stable')]
+        self._heap[:size] = rows
+        self._heap_pos[rows] = onp.arange(size)
+        self._num_unsorted = 0
+
+    def _swap(self, pos1, pos2):
+        i1, i2 = int(self._heap[pos1]), int(self._heap[pos2])
+        self._heap[pos1], self._heap[pos2] = i2, i1
+        self._heap_pos[i1], self._heap_pos[i2] = pos2, pos1
+
+    def _sift_up(self, pos):
+        while pos > 0:
+            parent = (pos - 1) // 2
+            if self._priorities[self._heap[parent]] >= self._priorities[self._heap[pos]]:
+                break
+            self._swap(pos, parent)
+            pos = parent
+        return pos
+
+    def _sift_down(self, pos, size):
+        while True:
+            largest, left, right = pos, 2 * pos + 1, 2 * pos + 2
+            if left < size and (
+                    self._priorities[self._heap[left]] > self._priorities[self._heap[largest]]):
+                largest = left
+            if right < size and (
+                    self._priorities[self._heap[right]] > self._priorities[self._heap[largest]]):
+                largest = right
+            if largest == pos:
+                return pos
+            self._swap(pos, largest)
+            pos = largest
+
+    def __len__(self):
+        return 0 if self._storage is None else min(self.capacity, self._index)
+
+    def __bool__(self):
+        return bool(len(self))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._storage[i]
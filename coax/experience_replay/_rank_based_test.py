@@ -0,0 +1,77 @@
+import gymnasium
+import numpy as onp
+
+from ..utils import get_transition_batch
+from ._simple import SimpleReplayBuffer
+from ._rank_based import RankBasedPrioritizedReplayBuffer
+
+
+def check_heap(buffer):
+    n = len(buffer)
+    p = buffer._priorities[buffer._heap[:n]]
+    children = onp.arange(1, n)
+    assert onp.all(p[(children - 1) // 2] >= p[children])
+    onp.testing.assert_array_equal(buffer._heap_pos[buffer._heap[:n]], onp.arange(n))
+
+
+def test_consistency():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer1 = SimpleReplayBuffer(capacity=100)
+    buffer2 = RankBasedPrioritizedReplayBuffer(capacity=100)
+
+    for i in range(4):
+        transition_batch = get_transition_batch(env, batch_size=32, random_seed=i)
+        buffer1.add(transition_batch.copy())
+        buffer2.add(transition_batch.copy(), Adv=transition_batch.Rn)
+        check_heap(buffer2)
+
+    assert len(buffer1) == len(buffer2)
+    for i in range(len(buffer1)):
+        assert buffer1._storage[i] == buffer2._storage[i]
+
+
+def test_update():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = RankBasedPrioritizedReplayBuffer(capacity=100, sort_interval=1000, random_seed=13)
+    for i in range(4):
+        transition_batch = get_transition_batch(env, batch_size=32, random_seed=i)
+        buffer.add(transition_batch, Adv=transition_batch.Rn)
+
+    buffer.update([0, 50, 127], [1e3, 1e4, 1e5])  # id=0 is stale and must be ignored
+    check_heap(buffer)
+    assert buffer._idx[buffer._heap[0]] == 127
+    assert 50 in buffer._idx[buffer._heap[1:3]]
+    assert 0 not in buffer._idx
+
+
+def test_sort():
+    rnd = onp.random.RandomState(7)
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = RankBasedPrioritizedReplayBuffer(capacity=100, sort_interval=50)
+    for i in range(2):
+        transition_batch = get_transition_batch(env, batch_size=32, random_seed=i)
+        buffer.add(transition_batch, Adv=rnd.randn(32))
+
+    # 2 * 32 >= 50, so heap positions should now be exact ranks
+    assert buffer._num_unsorted == 0
+    p = buffer._priorities[buffer._heap[:64]]
+    assert onp.all(p[:-1] >= p[1:])
+
+    buffer.update(transition_batch.idx[:18], rnd.randn(18))
+    assert buffer._num_unsorted == 18
+    check_heap(buffer)
+
+
+def test_sample():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = RankBasedPrioritizedReplayBuffer(capacity=100, sort_interval=1, random_seed=13)
+    transition_batch = get_transition_batch(env, batch_size=100, random_seed=0)
+    transition_batch.W = onp.ones_like(transition_batch.W)
+    buffer.add(transition_batch, Adv=onp.arange(100.))
+
+    counts = onp.zeros(100)
+    for _ in range(100):
+        transition_batch = buffer.sample(batch_size=10)
+        assert onp.all(transition_batch.W <= 1)
+        counts += onp.bincount(transition_batch.idx, minlength=100)
+    assert counts[99] > counts[50] > counts[0]
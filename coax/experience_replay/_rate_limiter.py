@@ -0,0 +1,273 @@
+import threading
+
+
+__all__ = (
+    'RateLimiter',
+)
+
+
+class RateLimiter:
+    r"""
+
+    Keep the replay ratio close to a target number of samples per insert.
+
+    The replay ratio is the number of sampled transitions per transition added to the replay
+    buffer. If rollouts and updates run independently, this ratio drifts with the relative speed of
+    the actors and the learner. The rate limiter counts inserted and sampled transitions and blocks
+    the faster side until the slower side has caught up. Waiting is done on a condition variable,
+    so a blocked caller wakes up as soon as the other side makes progress.
+
+    The first :code:`min_size_to_sample` inserted transitions serve as warmup. Sampling is blocked
+    until they've been inserted and they don't count towards the replay ratio. After that, let
+
+    .. math::
+
+        \Delta\ =\ \rho\,(n_\text{insert} - n_\text{min}) - n_\text{sample}
+
+    where :math:`\rho` is the target number of samples per insert. An insert is allowed as long as
+    :math:`\Delta\leq\epsilon` and a sample is allowed as long as :math:`\Delta\geq-\epsilon`,
+    where :math:`\epsilon` is the :code:`error_buffer`. A single call may overshoot the band by its
+    own batch size, which means that one side can always proceed and the limiter never deadlocks.
+
+    Example
+    -------
+
+    .. code::
+
+        rate_limiter = coax.experience_replay.RateLimiter(
+            samples_per_insert=8, min_size_to_sample=5000, error_buffer=1000)
+
+        # rollout thread
+        rate_limiter.await_insert(transition_batch.batch_size)
+        buffer.add(transition_batch)
+
+        # learner thread
+        rate_limiter.await_sample(batch_size=32)
+        transition_batch = buffer.sample(batch_size=32)
+
+    Parameters
+    ----------
+    samples_per_insert : positive float
+
+        The target number of sampled transitions per inserted transition.
+
+    min_size_to_sample : positive int, optional
+
+        The number of transitions that need to be inserted before sampling is allowed.
+
+    error_buffer : positive float, optional
+
+        The tolerance band :math:`\epsilon`, expressed in sampled transitions. Defaults to
+        :code:`max(samples_per_insert, 0.1 * samples_per_insert * min_size_to_sample)`.
+
+    num_actors : positive int, optional
+
+        The number of actors that are expected to register, see :func:`register_actor`. The rate
+        limiter isn't closed by :func:`unregister_actor` until this many actors have registered.
+        This matters if actors start at different times, in which case an early actor could
+        otherwise finish before the others have registered.
+
+    """
+    def __init__(
+            self, samples_per_insert, min_size_to_sample=1, error_buffer=None, num_actors=None):
+        if not (isinstance(samples_per_insert, (float, int)) and samples_per_insert > 0):
+            raise TypeError(
+                f"samples_per_insert must be a positive float, got: {samples_per_insert}")
+        if not (isinstance(min_size_to_sample, int) and min_size_to_sample > 0):
+            raise TypeError(
+                f"min_size_to_sample must be a positive int, got: {min_size_to_sample}")
+        if error_buffer is None:
+            error_buffer = max(samples_per_insert, 0.1 * samples_per_insert * min_size_to_sample)
+        if not (isinstance(error_buffer, (float, int)) and error_buffer > 0):
+            raise TypeError(f"error_buffer must be a positive float, got: {error_buffer}")
+        if not (num_actors is None or (isinstance(num_actors, int) and num_actors > 0)):
+            raise TypeError(f"num_actors must be a positive int, got: {num_actors}")
+
+        self._samples_per_insert = float(samples_per_insert)
+        self._min_size_to_sample = int(min_size_to_sample)
+        self._error_buffer = float(error_buffer)
+        self._cv = threading.Condition()
+        self._num_inserts = 0
+        self._num_samples = 0
+        self._num_actors = num_actors
+        self._num_active_actors = 0
+        self._num_registrations = 0
+        self._closed = False
+        self._closed_by_actors = False
+
+    @property
+    def samples_per_insert(self):
+        return self._samples_per_insert
+
+    @property
+    def min_size_to_sample(self):
+        return self._min_size_to_sample
+
+    @property
+    def error_buffer(self):
+        return self._error_buffer
+
+    @property
+    def num_inserts(self):
+        r""" The number of transitions that have been inserted. """
+        return self._num_inserts
+
+    @property
+    def num_samples(self):
+        r""" The number of transitions that have been sampled. """
+        return self._num_samples
+
+    @property
+    def num_actors(self):
+        r""" The number of actors that are expected to register, see :func:`register_actor`. """
+        return self._num_actors
+
+    @property
+    def num_active_actors(self):
+        r""" The number of actors that are currently registered, see :func:`register_actor`. """
+        return self._num_active_actors
+
+    @property
+    def achieved_ratio(self):
+        r""" The number of sampled transitions per inserted transition, excluding the warmup. """
+        with self._cv:
+            return self._num_samples / max(1, self._num_inserts - self._min_size_to_sample)
+
+    @property
+    def closed(self):
+        r"""
+
+        Whether the rate limiter is closed. A closed rate limiter no longer blocks. Setting this to
+        True wakes up all callers that are currently waiting.
+
+        """
+        return self._closed
+
+    @closed.setter
+    def closed(self, new_closed):
+        with self._cv:
+            self._closed = bool(new_closed)
+            self._closed_by_actors = False
+            self._cv.notify_all()
+
+    def register_actor(self):
+        r"""
+
+        Register an actor that inserts transitions. Each call must be matched by a call to
+        :func:`unregister_actor` once the actor is done.
+
+        If the rate limiter was closed by :func:`unregister_actor`, it's reopened, e.g. when an
+        actor is restarted. A rate limiter that was closed explicitly, by setting :attr:`closed`,
+        stays closed.
+
+        """
+        with self._cv:
+            self._num_active_actors += 1
+            self._num_registrations += 1
+            if self._closed_by_actors:
+                self._closed = self._closed_by_actors = False
+                self._cv.notify_all()
+
+    def unregister_actor(self):
+        r"""
+
+        Unregister an actor that was registered with :func:`register_actor`. When the last actor
+        unregisters, the rate limiter is closed, such that learners aren't left waiting for
+        transitions that will never be inserted. If :attr:`num_actors` was specified, this only
+        happens once at least that many actors have registered.
+
+        """
+        with self._cv:
+            if self._num_active_actors <= 0:
+                raise RuntimeError("unregister_actor called without matching register_actor")
+            self._num_active_actors -= 1
+            if (self._num_active_actors == 0 and not self._closed
+                    and self._num_registrations >= (self._num_actors or 1)):
+                self._closed = self._closed_by_actors = True
+                self._cv.notify_all()
+
+    def can_insert(self):
+        r""" Whether inserting is allowed right now. """
+        with self._cv:
+            return self._closed or self._can_insert()
+
+    def can_sample(self):
+        r""" Whether sampling is allowed right now. """
+        with self._cv:
+            return self._closed or self._can_sample()
+
+    def await_insert(self, num_items=1, timeout=None):
+        r"""
+
+        Block until inserting is allowed and then record the insertion.
+
+        Parameters
+        ----------
+        num_items : positive int, optional
+
+            The number of transitions that are about to be inserted.
+
+        timeout : positive float, optional
+
+            The maximal number of seconds to wait.
+
+        Returns
+        -------
+        granted : bool
+
+            Whether the insertion was recorded, i.e. False if the call timed out.
+
+        """
+        with self._cv:
+            if not self._cv.wait_for(lambda: self._closed or self._can_insert(), timeout):
+                return False
+            self._num_inserts += int(num_items)
+            self._cv.notify_all()
+            return True
+
+    def await_sample(self, num_items=1, timeout=None):
+        r"""
+
+        Block until sampling is allowed and then record the sample.
+
+        Parameters
+        ----------
+        num_items : positive int, optional
+
+            The number of transitions that are about to be sampled, i.e. the batch size.
+
+        timeout : positive float, optional
+
+            The maximal number of seconds to wait.
+
+        Returns
+        -------
+        granted : bool
+
+            Whether the sample was recorded, i.e. False if the call timed out.
+
+        """
+        with self._cv:
+            if not self._cv.wait_for(lambda: self._closed or self._can_sample(), timeout):
+                return False
+            self._num_samples += int(num_items)
+            self._cv.notify_all()
+            return True
+
+    def _diff(self):
+        num_inserts = self._num_inserts - self._min_size_to_sample
+        return self._samples_per_insert * num_inserts - self._num_samples
+
+    def _can_insert(self):
+        return self._num_inserts < self._min_size_to_sample or self._diff() <= self._error_buffer
+
+    def _can_sample(self):
+        return (
+            self._num_inserts >= self._min_size_to_sample
+            and self._diff() >= -self._error_buffer)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(samples_per_insert={self.samples_per_insert}, "
+            f"min_size_to_sample={self.min_size_to_sample}, error_buffer={self.error_buffer}, "
+            f"num_inserts={self.num_inserts}, num_samples={self.num_samples})")
@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from ._rate_limiter import RateLimiter
+
+
+def test_warmup():
+    rate_limiter = RateLimiter(samples_per_insert=2, min_size_to_sample=10, error_buffer=4)
+    assert not rate_limiter.can_sample()
+    assert not rate_limiter.await_sample(4, timeout=0.01)
+    for _ in range(10):
+        assert rate_limiter.await_insert(1, timeout=0.01)
+    assert rate_limiter.can_sample()
+    assert rate_limiter.num_inserts == 10 and rate_limiter.num_samples == 0
+
+
+def test_tolerance_band():
+    rate_limiter = RateLimiter(samples_per_insert=2, min_size_to_sample=1, error_buffer=4)
+    assert rate_limiter.await_insert(1, timeout=0.01)  # warmup
+
+    # actor runs ahead: Δ = 2 * num_inserts - num_samples may not exceed the error buffer
+    assert rate_limiter.await_insert(1, timeout=0.01)   # Δ: 0 -> 2
+    assert rate_limiter.await_insert(1, timeout=0.01)   # Δ: 2 -> 4
+    assert rate_limiter.await_insert(1, timeout=0.01)   # Δ: 4 -> 6 (overshoot by one batch)
+    assert not rate_limiter.await_insert(1, timeout=0.01)
+
+    # learner catches up and then runs ahead
+    assert rate_limiter.await_sample(8, timeout=0.01)   # Δ: 6 -> -2
+    assert rate_limiter.can_insert()
+    assert rate_limiter.await_sample(4, timeout=0.01)   # Δ: -2 -> -6
+    assert not rate_limiter.await_sample(1, timeout=0.01)
+    assert rate_limiter.achieved_ratio == 12 / 3
+
+    # a closed rate limiter doesn't block
+    rate_limiter.closed = True
+    assert rate_limiter.await_sample(100, timeout=0.01)
+
+
+def test_threads():
+    rate_limiter = RateLimiter(samples_per_insert=4, min_size_to_sample=8, error_buffer=16)
+    ratios = []
+
+    def actor():
+        for _ in range(200):
+            rate_limiter.await_insert(2)
+
+    def learner():
+        while rate_limiter.await_sample(8, timeout=1.):
+            ratios.append(rate_limiter.achieved_ratio)
+            if rate_limiter.num_inserts >= 400 and rate_limiter.num_samples >= 4 * (400 - 8) - 16:
+                break
+
+    threads = [threading.Thread(target=actor), threading.Thread(target=learner)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert not any(t.is_alive() for t in threads)
+
+    # the learner is kept within the tolerance band, even though it's much faster than the actor
+    assert rate_limiter.num_inserts == 400
+    assert abs(4 * (400 - 8) - rate_limiter.num_samples) <= 16 + 8
+    assert ratios[-1] == pytest.approx(4, rel=0.05)
+
+
+def test_closed_wakes_up_waiters():
+    rate_limiter = RateLimiter(samples_per_insert=1, min_size_to_sample=10)
+    result = []
+    t = threading.Thread(target=lambda: result.append(rate_limiter.await_sample(1)))
+    t.start()
+    rate_limiter.closed = True
+    t.join(timeout=10)
+    assert result == [True]
+
+
+def test_last_actor_closes():
+    rate_limiter = RateLimiter(samples_per_insert=1, min_size_to_sample=10)
+    rate_limiter.register_actor()
+    rate_limiter.register_actor()
+    assert rate_limiter.num_active_actors == 2
+
+    # the first actor to finish doesn't release the learner
+    rate_limiter.unregister_actor()
+    assert not rate_limiter.closed
+    assert not rate_limiter.await_sample(1, timeout=0.01)
+
+    # the last one does
+    rate_limiter.unregister_actor()
+    assert rate_limiter.closed
+    assert rate_limiter.await_sample(1, timeout=0.01)
+    with pytest.raises(RuntimeError):
+        rate_limiter.unregister_actor()
+
+
+def test_staggered_actors():
+    rate_limiter = RateLimiter(samples_per_insert=1, min_size_to_sample=10, num_actors=2)
+
+    # the first actor is done before the second one has started
+    rate_limiter.register_actor()
+    rate_limiter.unregister_actor()
+    assert not rate_limiter.closed
+
+    rate_limiter.register_actor()
+    rate_limiter.unregister_actor()
+    assert rate_limiter.closed
+
+
+def test_restarted_actor():
+    rate_limiter = RateLimiter(samples_per_insert=1, min_size_to_sample=10)
+    rate_limiter.register_actor()
+    rate_limiter.unregister_actor()
+    assert rate_limiter.closed
+
+    # a late or restarted actor reopens the rate limiter
+    rate_limiter.register_actor()
+    assert not rate_limiter.closed
+    assert not rate_limiter.await_sample(1, timeout=0.01)
+    rate_limiter.unregister_actor()
+    assert rate_limiter.closed
+
+    # but not if it was closed explicitly
+    rate_limiter.closed = True
+    rate_limiter.register_actor()
+    assert rate_limiter.closed
+
+
+def test_bad_args():
+    with pytest.raises(TypeError):
+        RateLimiter(samples_per_insert=0)
+    with pytest.raises(TypeError):
+        RateLimiter(samples_per_insert=1, min_size_to_sample=0)
+    with pytest.raises(TypeError):
+        RateLimiter(samples_per_insert=1, error_buffer=-1)
+    with pytest.raises(TypeError):
+        RateLimiter(samples_per_insert=1, num_actors=0)
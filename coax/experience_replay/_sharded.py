@@ -0,0 +1,290 @@
+import itertools
+import threading
+
+import chex
+import numpy as onp
+
+from ..reward_tracing import TransitionBatch
+from ..utils import SumTree
+from ._base import BaseReplayBuffer
+from ._storage import create_storage
+
+
+__all__ = (
+    'ShardedPrioritizedReplayBuffer',
+)
+
+
+class ShardedPrioritizedReplayBuffer(BaseReplayBuffer):
+    r"""
+
+    A thread-safe variant of :class:`PrioritizedReplayBuffer
+    <coax.experience_replay.PrioritizedReplayBuffer>` that is split up into a number of independent
+    shards.
+
+    Each shard has its own storage, its own :class:`SumTree <coax.utils.SumTree>` and its own lock.
+    A call to :attr:`add` writes the entire transition batch to a single shard, picking one that
+    isn't locked by another thread if possible. This means that rollout threads that add
+    transitions concurrently don't contend with each other, nor with a learner thread that
+    samples or updates priorities.
+
+    Sampling is done in two stages. First, a shard is picked with probability proportional to its
+    total priority. Second, the entire batch is sampled from within that shard, such that only a
+    single lock is held while sampling. The marginal sampling probabilities and the importance
+    weights are the same as for :class:`PrioritizedReplayBuffer
+    <coax.experience_replay.PrioritizedReplayBuffer>`. Since consecutive calls to :attr:`add` are
+    spread over the shards, each shard holds a representative subset of the stored transitions.
+
+    The transition ids stored in :attr:`TransitionBatch.idx <coax.reward_tracing.TransitionBatch>`
+    encode the shard, such that :attr:`update` only needs to lock the shards that are affected.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The capacity of the experience replay buffer. This is divided evenly over the shards.
+
+    num_shards : positive int, optional
+
+        The number of shards.
+
+    alpha : positive float, optional
+
+        The sampling temperature :math:`\alpha>0`.
+
+    beta : positive float, optional
+
+        The importance-weight exponent :math:`\beta>0`.
+
+    epsilon : positive float, optional
+
+        The small regulator :math:`\epsilon>0`.
+
+    random_seed : int, optional
+
+        To get reproducible results.
+
+    """
+    def __init__(
+            self, capacity, num_shards=8, alpha=1.0, beta=1.0, epsilon=1e-4, random_seed=None):
+        if not (isinstance(capacity, int) and capacity > 0):
+            raise TypeError(f"capacity must be a positive int, got: {capacity}")
+        if not (isinstance(num_shards, int) and 0 < num_shards <= capacity):
+            raise TypeError(
+                f"num_shards must be a positive int no larger than capacity, got: {num_shards}")
+        if not (isinstance(alpha, (float, int)) and alpha > 0):
+            raise TypeError(f"alpha must be a positive float, got: {alpha}")
+        if not (isinstance(beta, (float, int)) and beta > 0):
+            raise TypeError(f"beta must be a positive float, got: {beta}")
+        if not (isinstance(epsilon, (float, int)) and epsilon > 0):
+            raise TypeError(f"epsilon must be a positive float, got: {epsilon}")
+
+        self._alpha = float(alpha)
+        self._beta = float(beta)
+        self._epsilon = float(epsilon)
+        self._random_seed = random_seed
+        self._rnd = onp.random.RandomState(random_seed)
+        self._rnd_lock = threading.Lock()
+        self._shards = tuple(
+            _Shard(
+                capacity=capacity // num_shards + (k < capacity % num_shards),
+                random_seed=None if random_seed is None else random_seed + k)
+            for k in range(num_shards))
+        self._capacity = int(capacity)
+        self._num_shards = int(num_shards)
+        self._round_robin = itertools.count()
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def num_shards(self):
+        return self._num_shards
+
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @property
+    def beta(self):
+        return self._beta
+
+    @beta.setter
+    def beta(self, new_beta):
+        if not (isinstance(new_beta, (float, int)) and new_beta > 0):
+            raise TypeError(f"beta must be a positive float, got: {new_beta}")
+        self._beta = float(new_beta)
+
+    @property
+    def epsilon(self):
+        return self._epsilon
+
+    def add(self, transition_batch, Adv):
+        r"""
+
+        Add a transition to the experience replay buffer.
+
+        Parameters
+        ----------
+        transition_batch : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        Adv : ndarray
+
+            A batch of advantages, used to construct the priorities :math:`p_i`.
+
+        """
+        if not isinstance(transition_batch, TransitionBatch):
+            raise TypeError(
+                f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+        chex.assert_equal_shape([transition_batch.Rn, Adv])
+        priorities = onp.power(onp.abs(Adv) + self.epsilon, self.alpha)
+
+        # pick the first shard that isn't locked by another thread, starting from a round-robin one
+        start = next(self._round_robin)
+        for i in range(self.num_shards):
+            k = (start + i) % self.num_shards
+            if self._shards[k].lock.acquire(blocking=False):
+                break
+        else:
+            k = start % self.num_shards
+            self._shards[k].lock.acquire()
+
+        try:
+            shard = self._shards[k]
+            local_idx = shard.index + onp.arange(transition_batch.batch_size)
+            transition_batch.idx = local_idx * self.num_shards + k  # encode shard in global id
+            shard.add(local_idx % shard.capacity, transition_batch, priorities)
+        finally:
+            shard.lock.release()
+
+    def sample(self, batch_size=32):
+        r"""
+
+        Get a batch of transitions to be used for bootstrapped updates.
+
+        Parameters
+        ----------
+        batch_size : positive int, optional
+
+            The desired batch size of the sample.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        roots = onp.array([shard.sumtree.root_value for shard in self._shards])
+        with self._rnd_lock:
+            k = self._rnd.choice(self.num_shards, p=roots / roots.sum())
+
+        with self._shards[k].lock:
+            idx = self._shards[k].sumtree.sample(n=batch_size)
+            values = self._shards[k].sumtree.values[idx]
+            transition_batch = self._shards[k].storage.get(idx)
+
+        P = values / roots.sum()                   # prioritized, biased propensities
+        W = onp.power(P * len(self), -self.beta)   # inverse propensity weights (β≈1)
+        W /= W.max()  # for stability, ensure only down-weighting (see sec. 3.4 of arxiv:1511.05952)
+        chex.assert_equal_shape([transition_batch.W, W])
+        transition_batch.W *= W
+        return transition_batch
+
+    def update(self, idx, Adv):
+        r"""
+
+        Update the priority weights of transitions previously added to the buffer.
+
+        Parameters
+        ----------
+        idx : 1d array of ints
+
+            The identifiers of the transitions to be updated.
+
+        Adv : ndarray
+
+            The corresponding updated advantages.
+
+        """
+        idx = onp.asarray(idx, dtype='int64')
+        Adv = onp.asarray(Adv, dtype='float32')
+        chex.assert_equal_shape([idx, Adv])
+        chex.assert_rank([idx, Adv], 1)
+
+        priorities = onp.power(onp.abs(Adv) + self.epsilon, self.alpha)
+        k, local_idx = idx % self.num_shards, idx // self.num_shards
+        for shard_k, shard in self._locked_shards(onp.unique(k)):
+            mask = k == shard_k
+            shard.update(local_idx[mask], priorities[mask])
+
+    def clear(self):
+        r""" Clear the experience replay buffer. """
+        for shard in self._shards:
+            with shard.lock:
+                shard.clear()
+
+    def _locked_shards(self, shard_ids):
+        """ iterate over (k, shard) pairs with the shard's lock held, uncontended shards first """
+        pending = list(shard_ids)
+        while pending:
+            for k in pending:
+                if self._shards[k].lock.acquire(blocking=False):
+                    break
+            else:
+                k = pending[0]
+                self._shards[k].lock.acquire()
+            pending.remove(k)
+            try:
+                yield k, self._shards[k]
+            finally:
+                self._shards[k].lock.release()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def __bool__(self):
+        return bool(len(self))
+
+    def __iter__(self):
+        for shard in self._shards:
+            with shard.lock:
+                transitions = [shard.storage[i] for i in range(len(shard))]
+            yield from transitions
+
+
+class _Shard:
+    """ a single shard: storage, transition ids and priorities, guarded by a lock """
+    def __init__(self, capacity, random_seed):
+        self.capacity = capacity
+        self.random_seed = random_seed
+        self.lock = threading.Lock()
+        self.storage = create_storage(capacity)
+        self.ids = self.storage.state('idx', shape=(capacity,), dtype='int64', fill_value=-1)
+        self.sumtree = SumTree(capacity=capacity, random_seed=random_seed)
+        self.index = 0
+
+    def add(self, idx, transition_batch, priorities):
+        self.storage.set(idx, transition_batch)
+        self.ids[idx] = self.index + onp.arange(transition_batch.batch_size)
+        self.sumtree.set_values(idx, priorities)
+        self.index += transition_batch.batch_size
+
+    def update(self, local_idx, priorities):
+        idx = local_idx % self.capacity  # wrap around
+        new_values = onp.where(
+            self.ids[idx] == local_idx,  # only update if ids match
+            priorities,
+            self.sumtree.values[idx])
+        self.sumtree.set_values(idx, new_values)
+
+    def clear(self):
+        self.storage.clear()  # also resets: self.ids
+        self.sumtree = SumTree(capacity=self.capacity, random_seed=self.random_seed)
+        self.index = 0
+
+    def __len__(self):
+        return min(self.capacity, self.index)
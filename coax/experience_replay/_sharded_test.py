@@ -0,0 +1,54 @@
+import threading
+
+import gymnasium
+import numpy as onp
+
+from ..utils import get_transition_batch
+from ._prioritized import PrioritizedReplayBuffer
+from ._sharded import ShardedPrioritizedReplayBuffer
+
+
+def test_consistency_single_shard():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer1 = PrioritizedReplayBuffer(capacity=100, alpha=0.8, random_seed=13)
+    buffer2 = ShardedPrioritizedReplayBuffer(
+        capacity=100, num_shards=1, alpha=0.8, random_seed=13)
+
+    for i in range(4):
+        transition_batch = get_transition_batch(env, batch_size=32, random_seed=i)
+        buffer1.add(transition_batch.copy(), Adv=transition_batch.Rn)
+        buffer2.add(transition_batch.copy(), Adv=transition_batch.Rn)
+
+    assert len(buffer1) == len(buffer2) == 100
+    buffer1.update([0, 50, 100, 127], [7., 8., 9., 10.])
+    buffer2.update([0, 50, 100, 127], [7., 8., 9., 10.])
+    onp.testing.assert_allclose(buffer1._sumtree.values, buffer2._shards[0].sumtree.values)
+    assert buffer1.sample(batch_size=10) == buffer2.sample(batch_size=10)
+
+
+def test_concurrent_add():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = ShardedPrioritizedReplayBuffer(capacity=1000, num_shards=4, random_seed=13)
+
+    def add(thread_id):
+        for i in range(10):
+            transition_batch = get_transition_batch(env, batch_size=8, random_seed=thread_id)
+            buffer.add(transition_batch, Adv=transition_batch.Rn)
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(buffer) == 320
+    assert sum(len(shard) for shard in buffer._shards) == 320
+
+    transition_batch = buffer.sample(batch_size=64)
+    assert transition_batch.batch_size == 64
+
+    # ids encode the shard, so that priority updates end up in the right place
+    buffer.update(transition_batch.idx, onp.full(64, 1e3))
+    for k, shard in enumerate(buffer._shards):
+        local_idx = transition_batch.idx[transition_batch.idx % 4 == k] // 4
+        assert onp.all(shard.sumtree.values[local_idx % shard.capacity] > 100)
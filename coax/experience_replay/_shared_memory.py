@@ -0,0 +1,377 @@
+import os
+import tempfile
+import threading
+
+import chex
+import numpy as onp
+
+from ..reward_tracing import TransitionBatch
+from ..utils import SumTree
+from ._base import BaseReplayBuffer
+from ._storage import SharedMemoryStorage
+
+
+__all__ = (
+    'SharedMemoryReplayBuffer',
+)
+
+
+# the number of times sample() redraws a batch if some of its rows got overwritten while reading
+_MAX_SAMPLE_ATTEMPTS = 16
+
+
+class SharedMemoryReplayBuffer(BaseReplayBuffer):
+    r"""
+
+    A prioritized replay buffer that lives in shared memory, such that multiple processes on the
+    same machine can add transitions to it directly.
+
+    The transitions are stored in columnar form in :class:`multiprocessing.shared_memory` blocks.
+    Pickling the buffer, e.g. by passing it to a :class:`multiprocessing.Process` or to a ray
+    actor, only pickles the names of these blocks. This means that all copies of the buffer refer
+    to the same transitions and that a call to :attr:`add` doesn't send any data to another
+    process.
+
+    Writers reserve a range of ring slots by incrementing a shared counter, which is the only step
+    that takes an inter-process lock. They then write the transitions and their initial priorities
+    into the reserved slots. Finally they commit each slot by writing its transition id.
+
+    Sampling is proportional, as in :class:`PrioritizedReplayBuffer
+    <coax.experience_replay.PrioritizedReplayBuffer>`. The :class:`SumTree <coax.utils.SumTree>`
+    is owned by a single process, namely the first one that calls :attr:`sample` or
+    :attr:`update`, which is typically the learner. The owner picks up newly committed slots before
+    each sample. Slots that are being overwritten are excluded from sampling until they're
+    committed again.
+
+    Example
+    -------
+
+    .. code::
+
+        buffer = coax.experience_replay.SharedMemoryReplayBuffer(
+            capacity=1000000, transition_batch=tracer.pop(), alpha=0.6)
+
+        # rollout workers (other processes) write straight into shared memory
+        actors = [ApexWorker.remote(f'actor_{i}', param_store, buffer=buffer) for i in range(8)]
+
+        # the learner owns the sum tree
+        learner = ApexWorker.remote('learner', param_store, buffer=buffer)
+
+    When passed to a :class:`coax.Worker`, the ``buffer_*`` methods use the buffer directly, even
+    if the worker has a :code:`param_store`. For this reason, it can't be combined with a
+    :class:`RateLimiter <coax.experience_replay.RateLimiter>`.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The capacity of the experience replay buffer.
+
+    transition_batch : TransitionBatch
+
+        An example transition batch, which determines the shapes and dtypes of the shared columns.
+
+    alpha : positive float, optional
+
+        The sampling temperature :math:`\alpha>0`.
+
+    beta : positive float, optional
+
+        The importance-weight exponent :math:`\beta>0`. It's kept in shared memory, such that
+        annealing it in any process, e.g. in the parameter store, affects the learner's samples.
+
+    epsilon : positive float, optional
+
+        The small regulator :math:`\epsilon>0`.
+
+    random_seed : int, optional
+
+        To get reproducible results.
+
+    dtype_policy : str or dict, optional
+
+        The dtypes in which to store the transitions, see :class:`SimpleReplayBuffer
+        <coax.experience_replay.SimpleReplayBuffer>`.
+
+    """
+    def __init__(
+            self, capacity, transition_batch, alpha=1.0, beta=1.0, epsilon=1e-4,
+            random_seed=None, dtype_policy=None):
+        if not (isinstance(capacity, int) and capacity > 0):
+            raise TypeError(f"capacity must be a positive int, got: {capacity}")
+        if not (isinstance(alpha, (float, int)) and alpha > 0):
+            raise TypeError(f"alpha must be a positive float, got: {alpha}")
+        if not (isinstance(beta, (float, int)) and beta > 0):
+            raise TypeError(f"beta must be a positive float, got: {beta}")
+        if not (isinstance(epsilon, (float, int)) and epsilon > 0):
+            raise TypeError(f"epsilon must be a positive float, got: {epsilon}")
+
+        self._capacity = int(capacity)
+        self._epsilon = float(epsilon)
+        self._random_seed = random_seed
+        self._storage = SharedMemoryStorage(
+            self.capacity, transition_batch, dtype_policy=dtype_policy)
+        self._storage.state('index', shape=(), dtype='int64', fill_value=0)
+        self._storage.state('owner', shape=(), dtype='int64', fill_value=0)
+        self._storage.state('idx', shape=(self.capacity,), dtype='int64', fill_value=-1)
+        self._storage.state('priorities', shape=(self.capacity,), dtype='float64', fill_value=0.)
+        self._storage.state('alpha', shape=(), dtype='float64', fill_value=float(alpha))
+        self._storage.state('beta', shape=(), dtype='float64', fill_value=float(beta))
+        self._lock = _InterProcessLock(
+            os.path.join(tempfile.gettempdir(), f'{self._storage.name}.lock'))
+        self._init_state_arrays()
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def alpha(self):
+        return float(self._alpha)
+
+    @property
+    def beta(self):
+        r""" The importance-weight exponent, which is shared by all processes. """
+        return float(self._beta)
+
+    @beta.setter
+    def beta(self, new_beta):
+        if not (isinstance(new_beta, (float, int)) and new_beta > 0):
+            raise TypeError(f"beta must be a positive float, got: {new_beta}")
+        self._beta[...] = new_beta
+
+    @property
+    def epsilon(self):
+        return self._epsilon
+
+    def add(self, transition_batch, Adv):
+        r"""
+
+        Add a transition to the experience replay buffer. This may be called from any process.
+
+        Parameters
+        ----------
+        transition_batch : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        Adv : ndarray
+
+            A batch of advantages, used to construct the priorities :math:`p_i`.
+
+        """
+        if not isinstance(transition_batch, TransitionBatch):
+            raise TypeError(
+                f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+        chex.assert_equal_shape([transition_batch.Rn, Adv])
+
+        with self._lock:  # reserve ring slots
+            start = int(self._counter)
+            self._counter[...] = start + transition_batch.batch_size
+
+        transition_batch.idx = start + onp.arange(transition_batch.batch_size)
+        idx = transition_batch.idx % self.capacity  # wrap around
+        self._idx[idx] = -1  # mark as being written
+        self._storage.set(idx, transition_batch)
+        self._priorities[idx] = onp.power(onp.abs(Adv) + self.epsilon, self.alpha)
+        self._idx[idx] = transition_batch.idx  # commit
+
+    def sample(self, batch_size=32):
+        r"""
+
+        Get a batch of transitions to be used for bootstrapped updates. This may only be called
+        from the process that owns the sum tree.
+
+        Parameters
+        ----------
+        batch_size : positive int, optional
+
+            The desired batch size of the sample.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        for _ in range(_MAX_SAMPLE_ATTEMPTS):
+            self._sync()
+            if not self._sumtree.root_value > 0:
+                raise RuntimeError("there are no committed transitions to sample from")
+            idx = self._sumtree.sample(n=batch_size)
+            ids = self._idx[idx]
+            transition_batch = self._storage.get(idx)
+            # make sure that no writer has touched the rows while we were reading them
+            torn = (ids < 0) | (self._idx[idx] != ids)
+            if not torn.any():
+                break
+            self._sumtree.set_values(idx[torn], 0.)  # picked up again by _sync once committed
+        else:
+            raise RuntimeError(
+                f"failed to sample a batch without rows that are being written after "
+                f"{_MAX_SAMPLE_ATTEMPTS} attempts")
+
+        P = self._sumtree.values[idx] / self._sumtree.root_value  # prioritized, biased propensities
+        W = onp.power(P * len(self), -self.beta)                  # inverse propensity weights (β≈1)
+        W /= W.max()  # for stability, ensure only down-weighting (see sec. 3.4 of arxiv:1511.05952)
+        chex.assert_equal_shape([transition_batch.W, W])
+        transition_batch.W *= W
+        return transition_batch
+
+    def update(self, idx, Adv):
+        r"""
+
+        Update the priority weights of transitions previously added to the buffer. This may only be
+        called from the process that owns the sum tree.
+
+        Parameters
+        ----------
+        idx : 1d array of ints
+
+            The identifiers of the transitions to be updated.
+
+        Adv : ndarray
+
+            The corresponding updated advantages.
+
+        """
+        idx = onp.asarray(idx, dtype='int64')
+        Adv = onp.asarray(Adv, dtype='float32')
+        chex.assert_equal_shape([idx, Adv])
+        chex.assert_rank([idx, Adv], 1)
+
+        self._sync()
+        idx_lookup = idx % self.capacity  # wrap around
+        mask = self._idx[idx_lookup] == idx  # only update if ids match
+        priorities = onp.power(onp.abs(Adv[mask]) + self.epsilon, self.alpha)
+        self._priorities[idx_lookup[mask]] = priorities
+        self._sumtree.set_values(idx_lookup[mask], priorities)
+
+    def clear(self):
+        r"""
+
+        Clear the experience replay buffer. This should only be called while no other process is
+        using the buffer.
+
+        """
+        with self._lock:
+            beta = self.beta
+            self._storage.clear()  # resets the counter, the ids, the priorities and the owner
+            self._beta[...] = beta  # but keeps the (possibly annealed) beta
+        self._sumtree = None
+
+    def close(self):
+        r"""
+
+        Detach this copy of the buffer from shared memory. The process that created the buffer also
+        releases the shared memory, which means that this should be called last.
+
+        """
+        if self._is_creator:
+            self._storage.unlink()
+            self._lock.unlink()
+        else:
+            self._storage.close()
+        self._lock.close()
+
+    @property
+    def _is_creator(self):
+        return self._creator_pid == os.getpid()
+
+    def _init_state_arrays(self):
+        self._counter = self._storage.state('index', shape=(), dtype='int64', fill_value=0)
+        self._owner = self._storage.state('owner', shape=(), dtype='int64', fill_value=0)
+        self._idx = self._storage.state(
+            'idx', shape=(self.capacity,), dtype='int64', fill_value=-1)
+        self._priorities = self._storage.state(
+            'priorities', shape=(self.capacity,), dtype='float64', fill_value=0.)
+        # the fill values of alpha and beta are set in __init__, they're not used here
+        self._alpha = self._storage.state('alpha', shape=(), dtype='float64', fill_value=None)
+        self._beta = self._storage.state('beta', shape=(), dtype='float64', fill_value=None)
+        self._creator_pid = getattr(self, '_creator_pid', os.getpid())
+        self._sumtree = None  # created lazily, by the process that samples
+
+    def _sync(self):
+        """ copy the priorities of newly committed rows into the sum tree """
+        if self._sumtree is None or self._sumtree_pid != os.getpid():
+            with self._lock:
+                owner = int(self._owner)
+                if owner not in (0, os.getpid()):
+                    raise RuntimeError(
+                        f"the sum tree is owned by process {owner}; only one process may call "
+                        "sample() or update()")
+                self._owner[...] = os.getpid()
+            self._sumtree = SumTree(capacity=self.capacity, random_seed=self._random_seed)
+            self._sumtree_pid = os.getpid()
+            self._sync_index = 0
+            self._pending = onp.zeros(0, dtype='int64')
+
+        index = int(self._counter)
+        new = onp.arange(max(self._sync_index, index - self.capacity), index)
+        self._sync_index = index
+        pending = onp.concatenate((self._pending, new))
+        rows = pending % self.capacity
+        ids = self._idx[rows]
+        committed = ids == pending
+        self._sumtree.set_values(rows[~committed], 0.)  # don't sample rows that are being written
+        self._sumtree.set_values(rows[committed], self._priorities[rows[committed]])
+        self._pending = pending[~committed & (ids < pending)]  # drop rows that got overwritten
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for k in ('_counter', '_owner', '_idx', '_priorities', '_alpha', '_beta', '_sumtree',
+                  '_sumtree_pid', '_sync_index', '_pending'):
+            state.pop(k, None)  # views into shared memory or owned by this process
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state_arrays()
+
+    def __len__(self):
+        return min(self.capacity, int(self._counter))
+
+    def __bool__(self):
+        return bool(len(self))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            if self._idx[i] >= 0:  # skip rows that are being written
+                yield self._storage[i]
+
+
+class _InterProcessLock:
+    """ a lock that works across processes on the same machine, based on fcntl.flock """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def __enter__(self):
+        import fcntl  # import inline, because fcntl is only available on posix systems
+        self._thread_lock.acquire()
+        if self._fd is None or self._pid != os.getpid():
+            # flock is tied to the open file, so each process needs to open the file itself
+            self._fd, self._pid = os.open(self.filepath, os.O_RDWR | os.O_CREAT, 0o600), os.getpid()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        import fcntl
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def close(self):
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+        self._fd = None
+
+    def unlink(self):
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def __getstate__(self):
+        return self.filepath
+
+    def __setstate__(self, filepath):
+        self.__init__(filepath)
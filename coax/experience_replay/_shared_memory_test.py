@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import pickle
+from multiprocessing import shared_memory
+
+import gymnasium
+import numpy as onp
+import pytest
+
+from ..utils import get_transition_batch
+from ._prioritized import PrioritizedReplayBuffer
+from ._shared_memory import SharedMemoryReplayBuffer
+
+
+@pytest.fixture
+def env():
+    return gymnasium.make('FrozenLakeNonSlippery-v0')
+
+
+@pytest.fixture
+def buffer(env):
+    buffer = SharedMemoryReplayBuffer(
+        capacity=100, transition_batch=get_transition_batch(env), alpha=0.8, random_seed=13)
+    yield buffer
+    buffer.close()
+
+
+def test_consistency(env, buffer):
+    reference = PrioritizedReplayBuffer(capacity=100, alpha=0.8, random_seed=13)
+    for i in range(4):
+        transition_batch = get_transition_batch(env, batch_size=32, random_seed=i)
+        reference.add(transition_batch.copy(), Adv=transition_batch.Rn)
+        buffer.add(transition_batch.copy(), Adv=transition_batch.Rn)
+
+    assert len(buffer) == len(reference) == 100
+    for t1, t2 in zip(reference, buffer):
+        assert t1 == t2
+
+    reference.update([0, 50, 100, 127], [7., 8., 9., 10.])
+    buffer.update([0, 50, 100, 127], [7., 8., 9., 10.])
+    onp.testing.assert_allclose(buffer._sumtree.values, reference._sumtree.values)
+    assert buffer.sample(batch_size=10) == reference.sample(batch_size=10)
+
+
+def test_skip_rows_being_written(env, buffer):
+    transition_batch = get_transition_batch(env, batch_size=100)
+    buffer.add(transition_batch, Adv=onp.ones(100))
+    buffer._idx[:50] = -1  # pretend that a writer is overwriting these rows
+    buffer._sumtree = None  # resync from scratch
+    idx = buffer.sample(batch_size=64).idx
+    assert onp.all(idx >= 50)
+
+
+def test_torn_write(env, buffer):
+    buffer.add(get_transition_batch(env, batch_size=100, random_seed=1), Adv=onp.ones(100))
+    get = buffer._storage.get
+
+    def get_during_write(idx):
+        buffer._storage.get = get  # only once
+        transition_batch = get(idx)
+        buffer.add(get_transition_batch(env, batch_size=50, random_seed=2), Adv=onp.ones(50))
+        return transition_batch
+
+    buffer._storage.get = get_during_write
+    transition_batch = buffer.sample(batch_size=64)
+    assert onp.all(buffer._idx[transition_batch.idx % buffer.capacity] == transition_batch.idx)
+    assert transition_batch == buffer._storage.get(transition_batch.idx % buffer.capacity)
+
+
+def test_torn_writes_give_up(env, buffer):
+    buffer.add(get_transition_batch(env, batch_size=100), Adv=onp.ones(100))
+    get = buffer._storage.get
+
+    def get_during_write(idx):
+        buffer._idx[idx] = -1  # a writer keeps overwriting whatever we read
+        return get(idx)
+
+    buffer._storage.get = get_during_write
+    with pytest.raises(RuntimeError):
+        buffer.sample(batch_size=64)
+
+
+def test_iter_skips_rows_being_written(env, buffer):
+    buffer.add(get_transition_batch(env, batch_size=10), Adv=onp.ones(10))
+    buffer._idx[3] = -1
+    assert len(list(buffer)) == 9
+
+
+def _add_from_other_process(buffer, random_seed):
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    for i in range(5):
+        transition_batch = get_transition_batch(env, batch_size=8, random_seed=random_seed + i)
+        buffer.add(transition_batch, Adv=transition_batch.Rn)
+    try:
+        buffer.sample(batch_size=4)
+    except RuntimeError:
+        return  # expected: the sum tree is owned by the parent process
+    finally:
+        buffer.close()
+    os._exit(1)
+
+
+def test_multiprocess(buffer):
+    assert pickle.loads(pickle.dumps(buffer))._storage.name == buffer._storage.name
+    buffer._sync()  # the parent process owns the sum tree
+
+    ctx = multiprocessing.get_context('spawn')
+    processes = [
+        ctx.Process(target=_add_from_other_process, args=(buffer, 100 * i)) for i in range(2)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(timeout=120)
+    assert [p.exitcode for p in processes] == [0, 0]
+
+    # all transitions have arrived, without any duplicate ring slots
+    assert len(buffer) == 80
+    assert sorted(buffer._idx[:80]) == list(range(80))
+    transition_batch = buffer.sample(batch_size=32)
+    assert transition_batch.batch_size == 32
+    assert onp.all(buffer._sumtree.values[:80] > 0)
+
+
+def _set_beta_from_other_process(buffer, beta):
+    buffer.beta = beta
+    buffer.close()
+
+
+def test_shared_beta(env, buffer):
+    transition_batch = get_transition_batch(env, batch_size=32, random_seed=7)
+    buffer.add(transition_batch, Adv=transition_batch.Rn)
+    assert buffer.beta == 1.0
+
+    ctx = multiprocessing.get_context('spawn')
+    p = ctx.Process(target=_set_beta_from_other_process, args=(buffer, 0.4))
+    p.start()
+    p.join(timeout=120)
+    assert p.exitcode == 0
+    assert buffer.beta == 0.4
+
+    # the importance weights of the parent's samples use the new beta
+    transition_batch = buffer.sample(batch_size=16)
+    rows = transition_batch.idx % buffer.capacity
+    P = buffer._sumtree.values[rows] / buffer._sumtree.root_value
+    W = onp.power(P * len(buffer), -0.4)
+    onp.testing.assert_allclose(transition_batch.W, buffer._storage.get(rows).W * W / W.max())
+
+    buffer.clear()
+    assert buffer.beta == 0.4
+
+
+def test_close(env):
+    buffer = SharedMemoryReplayBuffer(capacity=10, transition_batch=get_transition_batch(env))
+    names = [shm.name for shm, _, _ in buffer._storage._segments.values()]
+    assert names
+    buffer.add(get_transition_batch(env), Adv=onp.ones(1))
+    buffer.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
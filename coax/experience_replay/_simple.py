@@ -1,10 +1,10 @@
 import random
 
-import jax
 import numpy as onp
 
 from ..reward_tracing import TransitionBatch
-from ._base import BaseReplayBuffer
+from ._base import BaseReplayBuffer, _check_capacity, _capacity_from_bytes
+from ._storage import checkpoint_capacity, create_storage
 
 
 __all__ = (
@@ -17,27 +17,90 @@ class SimpleReplayBuffer(BaseReplayBuffer):
 
     A simple ring buffer for experience replay.
 
+    The transitions are stored in columnar form, i.e. each leaf of the :class:`TransitionBatch
+    <coax.reward_tracing.TransitionBatch>` fields lives in a single preallocated array, whose shape
+    and dtype are inferred from the first transition batch that is added.
+
     Parameters
     ----------
-    capacity : positive int
+    capacity : positive int, optional
 
-        The capacity of the experience replay buffer.
+        The capacity of the experience replay buffer. Either this or :code:`capacity_bytes` must be
+        provided.
 
     random_seed : int, optional
 
         To get reproducible results.
 
+    dedup_frames : bool, optional
+
+        Whether to store each unique observation frame only once. This is only meant for
+        observations produced by :class:`coax.wrappers.FrameStacking` (tuples of frames), for which
+        it reduces the memory footprint by roughly a factor ``2 * num_frames``.
+
+    dirpath : str, optional
+
+        If provided, the buffer is backed by memory-mapped files in this directory, see
+        :class:`numpy.memmap`. This allows for buffers that don't fit in RAM. If the directory
+        already holds the files of a previous buffer (with the same capacity), the buffer resumes
+        where that one left off.
+
+    compress_observations : bool, optional
+
+        Whether to store the observations (the ``S`` and ``S_next`` fields) LZ4-compressed. Each
+        observation is compressed separately and only the sampled ones are decompressed, using a
+        pool of threads. This is meant for pixel observations, which typically compress by a
+        factor 5-10. This can't be combined with :code:`dedup_frames` or :code:`dirpath`.
+
+    dtype_policy : str or dict, optional
+
+        The dtypes in which to store the transitions, e.g. ``'compact'`` for float32 scalars, uint8
+        pixel observations and int32 discrete actions. The policy is applied once, when a
+        transition batch is added. See :class:`ColumnarStorage
+        <coax.experience_replay._storage.ColumnarStorage>` for the available policies.
+
+    capacity_bytes : positive int, optional
+
+        The memory budget of the buffer, as an alternative to specifying :code:`capacity`. The
+        capacity is then derived from the memory footprint of the first transition batch that is
+        added, see :attr:`memory_usage`. This can't be combined with :code:`dirpath`.
+
     """
-    def __init__(self, capacity, random_seed=None):
-        self._capacity = int(capacity)
+    def __init__(
+            self, capacity=None, random_seed=None, dedup_frames=False, dirpath=None,
+            compress_observations=False, dtype_policy=None, capacity_bytes=None):
+        _check_capacity(capacity, capacity_bytes, dirpath)
         random.seed(random_seed)
         self._random_state = random.getstate()
-        self.clear()  # sets self._storage
+        self._options = {
+            'dedup_frames': dedup_frames, 'compress_observations': compress_observations,
+            'dtype_policy': dtype_policy}
+        self._dirpath = dirpath
+        self._capacity_bytes = capacity_bytes
+        self._capacity = self._storage = None
+        if capacity is not None:
+            self._setup(capacity)
 
     @property
     def capacity(self):
         return self._capacity
 
+    def memory_usage(self):
+        r"""
+
+        Report the memory footprint of the experience replay buffer.
+
+        Returns
+        -------
+        usage : dict
+
+            A dict of field name → number of bytes, see :attr:`ColumnarStorage.memory_usage
+            <coax.experience_replay._storage.ColumnarStorage.memory_usage>`. This is empty if the
+            capacity hasn't been determined yet.
+
+        """
+        return {} if self._storage is None else self._storage.memory_usage()
+
     def add(self, transition_batch):
         r"""
 
@@ -53,12 +116,13 @@ class SimpleReplayBuffer(BaseReplayBuffer):
         if not isinstance(transition_batch, TransitionBatch):
             raise TypeError(
                 f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+        if self._storage is None:
+            self._setup(_capacity_from_bytes(
+                type(self), self._capacity_bytes, transition_batch, **self._options))
 
         transition_batch.idx = onp.arange(self._index, self._index + transition_batch.batch_size)
+        self._storage.set(transition_batch.idx % self.capacity, transition_batch)
         self._index += transition_batch.batch_size
-        self._storage.extend(transition_batch.to_singles())
-        while len(self) > self.capacity:
-            self._storage.pop(0)
 
     def sample(self, batch_size=32):
         r"""
@@ -79,20 +143,84 @@ class SimpleReplayBuffer(BaseReplayBuffer):
         """
         # sandwich sample in between setstate/getstate in case global random state was tampered with
         random.setstate(self._random_state)
-        transitions = random.sample(self._storage, batch_size)
+        idx = random.sample(range(len(self)), batch_size)
         self._random_state = random.getstate()
-        return jax.tree_map(lambda *leaves: onp.concatenate(leaves, axis=0), *transitions)
+        return self._storage.get(self._storage_idx(onp.asarray(idx, dtype='int64')))
+
+    def save(self, dirpath, incremental=True):
+        r"""
+
+        Save a checkpoint of the experience replay buffer.
+
+        The transitions are written as raw arrays, one file per chunk of rows. Subsequent saves to
+        the same directory only write the chunks that have changed since the previous save.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which to store the checkpoint.
+
+        incremental : bool, optional
+
+            Whether to only write the chunks that have changed since the last checkpoint that was
+            saved to (or loaded from) the same directory. Set this to False to force writing all
+            chunks.
+
+        """
+        if self._storage is None:
+            raise RuntimeError("cannot save a buffer whose capacity hasn't been determined yet")
+        self._storage.save(
+            dirpath, incremental=incremental, metadata={'random_state': self._random_state})
+
+    def load(self, dirpath):
+        r"""
+
+        Restore the experience replay buffer from a checkpoint that was created with :attr:`save`.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which the checkpoint is stored.
+
+        """
+        if self._storage is None:
+            self._setup(checkpoint_capacity(dirpath))
+        _, metadata = self._storage.load(dirpath)
+        self._random_state = metadata['random_state']
 
     def clear(self):
         r""" Clear the experience replay buffer. """
-        self._storage = list()
-        self._index = 0
+        if self._storage is not None:
+            self._storage.clear()  # also resets self._counter
+
+    def _setup(self, capacity):
+        self._capacity = int(capacity)
+        self._storage = create_storage(
+            self.capacity, dedup_frames=self._options['dedup_frames'], dirpath=self._dirpath,
+            compress=self._options['compress_observations'],
+            dtype_policy=self._options['dtype_policy'])
+        self._counter = self._storage.state('index', shape=(), dtype='int64', fill_value=0)
+
+    @property
+    def _index(self):
+        return 0 if self._storage is None else int(self._counter)
+
+    @_index.setter
+    def _index(self, new_index):
+        self._counter[...] = new_index
+
+    def _storage_idx(self, idx):
+        """ map positions relative to the oldest transition onto storage rows """
+        return (self._index - len(self) + idx) % self.capacity
 
     def __len__(self):
-        return len(self._storage)
+        return 0 if self._storage is None else min(self.capacity, self._index)
 
     def __bool__(self):
         return bool(len(self))
 
     def __iter__(self):
-        return iter(self._storage)
+        for i in range(len(self)):
+            yield self._storage[int(self._storage_idx(i))]
@@ -0,0 +1,43 @@
+import gymnasium
+import pytest
+import numpy as onp
+
+from ..utils import get_transition_batch
+from ._simple import SimpleReplayBuffer
+
+
+def test_ring_order():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = SimpleReplayBuffer(capacity=100)
+
+    for i in range(4):
+        buffer.add(get_transition_batch(env, batch_size=32, random_seed=i))
+
+    assert len(buffer) == 100
+    assert buffer._index == 128
+    assert onp.all(onp.concatenate([t.idx for t in buffer]) == onp.arange(28, 128))
+
+
+def test_sample():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = SimpleReplayBuffer(capacity=100, random_seed=13)
+
+    for i in range(4):
+        buffer.add(get_transition_batch(env, batch_size=32, random_seed=i))
+
+    transition_batch = buffer.sample(batch_size=10)
+    assert transition_batch.batch_size == 10
+    assert transition_batch.S.shape == (10,)
+    assert onp.all(transition_batch.idx >= 28)
+    assert len(onp.unique(transition_batch.idx)) == 10  # sampled without replacement
+
+
+def test_structure_mismatch():
+    env = gymnasium.make('FrozenLakeNonSlippery-v0')
+    buffer = SimpleReplayBuffer(capacity=100)
+    buffer.add(get_transition_batch(env, batch_size=32, random_seed=0))
+
+    transition_batch = get_transition_batch(env, batch_size=32, random_seed=1)
+    transition_batch.A_next = None
+    with pytest.raises(ValueError):
+        buffer.add(transition_batch)
@@ -0,0 +1,1149 @@
+import concurrent.futures
+import inspect
+import os
+import pickle
+import sys
+import uuid
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+
+import jax
+import jax.numpy as jnp
+import numpy as onp
+import lz4.block
+
+from ..reward_tracing import TransitionBatch
+
+
+__all__ = (
+    'ColumnarStorage',
+    'CompressedStorage',
+    'FrameStackingStorage',
+    'MemmapStorage',
+    'SharedMemoryStorage',
+    'checkpoint_capacity',
+    'create_storage',
+)
+
+
+def create_storage(capacity, dedup_frames=False, dirpath=None, compress=False, dtype_policy=None):
+    r"""
+
+    Create the storage backend for a replay buffer.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The number of transitions (rows) to accommodate.
+
+    dedup_frames : bool, optional
+
+        Whether to create a :class:`FrameStackingStorage`.
+
+    dirpath : str, optional
+
+        If provided, create a :class:`MemmapStorage` in this directory.
+
+    compress : bool, optional
+
+        Whether to create a :class:`CompressedStorage`.
+
+    dtype_policy : str or dict, optional
+
+        The dtype policy that is passed on to the storage, see :class:`ColumnarStorage`.
+
+    Returns
+    -------
+    storage : ColumnarStorage
+
+        The storage backend.
+
+    """
+    if compress and (dedup_frames or dirpath is not None):
+        raise ValueError(
+            "compress_observations=True cannot be combined with dedup_frames=True or dirpath")
+    if dirpath is not None:
+        if dedup_frames:
+            raise ValueError("dedup_frames=True is not supported for on-disk storage (dirpath)")
+        return MemmapStorage(capacity, dirpath, dtype_policy=dtype_policy)
+    if compress:
+        return CompressedStorage(capacity, dtype_policy=dtype_policy)
+    if dedup_frames:
+        return FrameStackingStorage(capacity, dtype_policy=dtype_policy)
+    return ColumnarStorage(capacity, dtype_policy=dtype_policy)
+
+
+def checkpoint_capacity(dirpath):
+    r"""
+
+    Look up the capacity of the storage that was used to create a checkpoint.
+
+    Parameters
+    ----------
+    dirpath : str
+
+        The directory in which the checkpoint is stored.
+
+    Returns
+    -------
+    capacity : int
+
+        The number of transitions (rows) of the checkpointed storage.
+
+    """
+    with open(os.path.join(os.path.expanduser(dirpath), 'checkpoint.pkl'), 'rb') as f:
+        return pickle.load(f)['capacity']
+
+
+class ColumnarStorage:
+    r"""
+
+    A struct-of-arrays storage backend for :class:`TransitionBatch
+    <coax.reward_tracing.TransitionBatch>` objects.
+
+    Each leaf of each :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` field is stored
+    in a single preallocated array of shape :code:`(capacity, *leaf.shape[1:])`. The shapes and
+    dtypes of these arrays are inferred from the first transition batch that is stored.
+
+    The storage can be checkpointed with :attr:`save` and restored with :attr:`load`. A checkpoint
+    stores the columns as separate ``.npy`` files per chunk of :attr:`checkpoint_chunk_size` rows,
+    which means that subsequent saves to the same directory only need to write the chunks that
+    have changed since.
+
+    The dtypes of the columns may be overridden by a *dtype policy*, which is applied once, when
+    the columns are allocated. The available policies are:
+
+    * ``None``: keep the dtypes of the first transition batch that is stored.
+    * ``'compact'``: store floats as float32, integer pixel observations (``S`` and ``S_next``
+      leaves with at least two non-batch axes) as uint8 and other integers (except ``idx``) as
+      int32.
+    * a dict of field name → dtype, e.g. ``{'Rn': 'float32', 'A': 'int8'}``, which applies to all
+      leaves of the given fields.
+
+    Integer values that don't fit the dtype of their column raise a :class:`ValueError` upon
+    insertion.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The number of transitions (rows) to accommodate.
+
+    dtype_policy : str or dict, optional
+
+        The dtype policy, see above.
+
+    """
+    checkpoint_chunk_size = 16384
+
+    def __init__(self, capacity, dtype_policy=None):
+        self._capacity = int(capacity)
+        self._dtype_policy = _check_dtype_policy(dtype_policy)
+        self._state = {}
+        self.clear()  # sets self._columns
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def columns(self):
+        r"""
+
+        A dict of field name → pytree of preallocated arrays, or None if no transitions have been
+        stored yet.
+
+        """
+        return self._columns
+
+    def set(self, idx, transition_batch):
+        r"""
+
+        Write a batch of transitions into the storage.
+
+        Parameters
+        ----------
+        idx : 1d array of ints
+
+            The storage rows to write to, one for each transition in the batch.
+
+        transition_batch : TransitionBatch
+
+            The transitions to store.
+
+        """
+        if not isinstance(transition_batch, TransitionBatch):
+            raise TypeError(
+                f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+
+        idx = onp.asarray(idx)
+        if idx.shape != (transition_batch.batch_size,):
+            raise ValueError(
+                f"idx must be a 1d array of size {transition_batch.batch_size}, got shape: "
+                f"{idx.shape}")
+
+        if len(idx) > self.capacity:
+            # only the last 'capacity' transitions survive anyway
+            transition_batch = transition_batch.slice(-self.capacity)
+            idx = idx[-self.capacity:]
+
+        if self._columns is None:
+            self._columns = {k: self._allocate(k, v) for k, v in transition_batch.items()}
+
+        for k, v in transition_batch.items():
+            self._set_column(k, idx, v)
+
+        self._tracker.mark(idx)
+
+    def get(self, idx):
+        r"""
+
+        Gather a batch of transitions from the storage.
+
+        Parameters
+        ----------
+        idx : 1d array of ints
+
+            The storage rows to look up.
+
+        Returns
+        -------
+        transition_batch : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        if self._columns is None:
+            raise IndexError("cannot look up transitions in an empty storage")
+        return TransitionBatch(**{k: self._get_column(k, idx) for k in self._columns})
+
+    def state(self, name, shape, dtype, fill_value):
+        r"""
+
+        Get an auxiliary array that is owned by the storage, e.g. the ring index or the priorities
+        of a replay buffer. These arrays are reset to their fill values by :attr:`clear`.
+
+        Parameters
+        ----------
+        name : str
+
+            The name of the array.
+
+        shape : tuple of ints
+
+            The shape of the array.
+
+        dtype : str or dtype
+
+            The dtype of the array.
+
+        fill_value : scalar
+
+            The initial value of each entry.
+
+        Returns
+        -------
+        arr : ndarray
+
+            The array, which is meant to be updated in-place.
+
+        """
+        if name not in self._state:
+            self._state[name] = (self._create_state(name, shape, dtype, fill_value), fill_value)
+        return self._state[name][0]
+
+    def memory_usage(self):
+        r"""
+
+        Report the memory footprint of the storage.
+
+        Returns
+        -------
+        usage : dict
+
+            A dict of field name → number of bytes. Auxiliary arrays are reported under keys that
+            start with an underscore, e.g. ``'_state'`` for the arrays created by :attr:`state`.
+
+        """
+        usage = {} if self._columns is None else {
+            name: sum(leaf.nbytes for leaf in jax.tree_util.tree_leaves(column))
+            for name, column in self._columns.items()}
+        usage['_state'] = sum(arr.nbytes for arr, _ in self._state.values())
+        return usage
+
+    def clear(self):
+        r""" Release the underlying arrays and reset the auxiliary state arrays. """
+        self._columns = None
+        for arr, fill_value in self._state.values():
+            arr[...] = fill_value
+        self._tracker = _ChunkTracker(self.capacity, self.checkpoint_chunk_size)
+        self._checkpoint_dirpath = None
+
+    def save(self, dirpath, incremental=True, arrays=None, metadata=None):
+        r"""
+
+        Save a checkpoint of the storage.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which to store the checkpoint.
+
+        incremental : bool, optional
+
+            Whether to only write the chunks that have changed since the last checkpoint. This only
+            applies if the last checkpoint was saved to (or loaded from) the same directory;
+            otherwise all chunks are written.
+
+        arrays : dict of ndarrays, optional
+
+            Additional arrays to store alongside the columns, e.g. the priorities of a replay
+            buffer. These are returned by :attr:`load`.
+
+        metadata : dict, optional
+
+            Additional picklable metadata, e.g. the state of a random number generator. This is
+            returned by :attr:`load`.
+
+        """
+        dirpath = os.path.abspath(os.path.expanduser(dirpath))
+        os.makedirs(dirpath, exist_ok=True)
+        full = not incremental or dirpath != self._checkpoint_dirpath
+
+        chunked = {}
+        for key, (arr, tracker) in self._chunked_arrays().items():
+            for c in tracker.pending(full=full):
+                chunk = arr[(c * tracker.chunk_size):((c + 1) * tracker.chunk_size)]
+                _save_npy(os.path.join(dirpath, f'{key}.{c:05d}.npy'), chunk)
+            chunked[key] = {
+                'shape': arr.shape, 'dtype': arr.dtype.str, 'chunk_size': tracker.chunk_size,
+                'chunks': onp.flatnonzero(tracker.written).tolist()}
+
+        whole = self._whole_arrays()
+        whole.update({f'_arrays.{k}': v for k, v in (arrays or {}).items()})
+        for key, arr in whole.items():
+            _save_npy(os.path.join(dirpath, f'{key}.npy'), onp.asarray(arr))
+
+        # write this last, so that we never end up with a checkpoint file that refers to
+        # partially written chunks
+        checkpoint = {
+            'capacity': self.capacity,
+            'columns': _column_keys(self._columns),
+            'chunked': chunked,
+            'whole': list(whole),
+            'metadata': metadata}
+        with open(os.path.join(dirpath, 'checkpoint.pkl.tmp'), 'wb') as f:
+            pickle.dump(checkpoint, f)
+        os.replace(
+            os.path.join(dirpath, 'checkpoint.pkl.tmp'), os.path.join(dirpath, 'checkpoint.pkl'))
+
+        for _, tracker in self._chunked_arrays().values():
+            tracker.dirty[:] = False
+        self._checkpoint_dirpath = dirpath
+
+    def load(self, dirpath):
+        r"""
+
+        Restore the storage from a checkpoint. The checkpoint files are read through memory maps,
+        so the peak memory usage stays close to the size of the storage itself.
+
+        Parameters
+        ----------
+        dirpath : str
+
+            The directory in which the checkpoint is stored.
+
+        Returns
+        -------
+        arrays : dict of ndarrays
+
+            The additional arrays that were passed to :attr:`save`. These are read-only memory
+            maps.
+
+        metadata : dict
+
+            The additional metadata that was passed to :attr:`save`.
+
+        """
+        dirpath = os.path.abspath(os.path.expanduser(dirpath))
+        with open(os.path.join(dirpath, 'checkpoint.pkl'), 'rb') as f:
+            checkpoint = pickle.load(f)
+        if checkpoint['capacity'] != self.capacity:
+            raise ValueError(
+                f"checkpoint in {dirpath} has capacity {checkpoint['capacity']}, expected capacity "
+                f"{self.capacity}")
+
+        self.clear()
+        chunked = {
+            key: self._load_chunked(dirpath, key, **info)
+            for key, info in checkpoint['chunked'].items()}
+        whole = {
+            key: onp.load(os.path.join(dirpath, f'{key}.npy'), mmap_mode='r')
+            for key in checkpoint['whole']}
+        self._restore(checkpoint['columns'], chunked, whole)
+        self._checkpoint_dirpath = dirpath
+
+        arrays = {k[len('_arrays.'):]: v for k, v in whole.items() if k.startswith('_arrays.')}
+        return arrays, checkpoint['metadata']
+
+    def _chunked_arrays(self):
+        """ the arrays that are checkpointed chunk by chunk: key -> (array, tracker) """
+        if self._columns is None:
+            return {}
+        keys = jax.tree_util.tree_leaves(_column_keys(self._columns))
+        leaves = jax.tree_util.tree_leaves(self._columns)
+        return {key: (leaf, self._tracker) for key, leaf in zip(keys, leaves)}
+
+    def _whole_arrays(self):
+        """ the (small) arrays that are checkpointed in one go: key -> array """
+        return {f'_state.{name}': arr for name, (arr, _) in self._state.items()}
+
+    def _load_chunked(self, dirpath, key, shape, dtype, chunk_size, chunks):
+        arr = self._new_array(key, shape, dtype)
+        tracker = _ChunkTracker(shape[0], chunk_size)
+        for c in chunks:
+            rows = slice(c * chunk_size, (c + 1) * chunk_size)
+            arr[rows] = onp.load(os.path.join(dirpath, f'{key}.{c:05d}.npy'), mmap_mode='r')
+        tracker.written[chunks] = True
+        return arr, tracker
+
+    def _restore(self, column_keys, chunked, whole):
+        if column_keys is not None:
+            self._columns = {
+                name: jax.tree_map(lambda key: chunked[key][0], keys)
+                for name, keys in column_keys.items()}
+            trackers = [chunked[key][1] for key in jax.tree_util.tree_leaves(column_keys)]
+            if trackers:
+                self._tracker = trackers[0]
+        for name, (arr, _) in self._state.items():
+            if f'_state.{name}' in whole:
+                arr[...] = whole[f'_state.{name}']
+
+    def _create_state(self, name, shape, dtype, fill_value):
+        return onp.full(shape, fill_value, dtype=dtype)
+
+    def _new_array(self, key, shape, dtype):
+        return onp.zeros(shape, dtype=dtype)
+
+    def _allocate(self, name, value):
+        leaves, treedef = jax.tree_util.tree_flatten(value)
+        return jax.tree_util.tree_unflatten(treedef, [
+            self._new_array(
+                f'{name}.{i}', (self.capacity,) + onp.shape(leaf)[1:],
+                self._dtype_policy(name, onp.asarray(leaf)))
+            for i, leaf in enumerate(leaves)])
+
+    def _set_column(self, name, idx, value):
+        if jax.tree_util.tree_structure(value) != jax.tree_util.tree_structure(self._columns[name]):
+            raise ValueError(
+                f"the structure of field '{name}' doesn't match the structure of the transitions "
+                "that were previously stored")
+        jax.tree_map(
+            lambda col, leaf: col.__setitem__(idx, _check_fits(name, leaf, col.dtype)),
+            self._columns[name], value)
+
+    def _get_column(self, name, idx):
+        return jax.tree_map(lambda col: col[idx], self._columns[name])
+
+    def __getitem__(self, idx):
+        if isinstance(idx, int):
+            idx = [idx]  # ndim-preserving lookup
+        return self.get(idx)
+
+    def __bool__(self):
+        return self._columns is not None
+
+
+class FrameStackingStorage(ColumnarStorage):
+    r"""
+
+    A columnar storage backend that stores every unique observation frame only once.
+
+    This is meant to be used with observations produced by :class:`coax.wrappers.FrameStacking`,
+    i.e. tuples of frames. The ``S`` and ``S_next`` fields are stored as :code:`(capacity,
+    num_frames)` arrays of indices into a shared frame ring, and the tuples of frames are rebuilt
+    with a single gather at lookup time.
+
+    Frames are deduplicated by content, which means that the repeated frames at the start of an
+    episode, the overlap between consecutive frame stacks and the overlap between ``S`` and
+    ``S_next`` all collapse onto the same entry in the frame ring, no matter in which order (or
+    from how many actors) the transitions are added.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The number of transitions (rows) to accommodate.
+
+    frame_capacity : positive int, optional
+
+        The initial number of unique frames to accommodate. The frame ring is grown automatically
+        if it runs out of free slots. Defaults to ``2 * capacity``. Note that the frame ring is
+        zero-initialized, so the memory pages of unused slots are typically never touched.
+
+    dtype_policy : str or dict, optional
+
+        The dtype policy, see :class:`ColumnarStorage`.
+
+    """
+    frame_fields = ('S', 'S_next')
+
+    def __init__(self, capacity, frame_capacity=None, dtype_policy=None):
+        self._frame_capacity = 2 * int(capacity) if frame_capacity is None else int(frame_capacity)
+        super().__init__(capacity, dtype_policy=dtype_policy)
+
+    @property
+    def frames(self):
+        r""" The frame ring, or None if no transitions have been stored yet. """
+        return self._frames
+
+    @property
+    def num_unique_frames(self):
+        r""" The number of unique frames that are currently referenced. """
+        return int(onp.sum(self._frame_refcount > 0))
+
+    def memory_usage(self):
+        usage = super().memory_usage()
+        usage['_frames'] = self._frame_refcount.nbytes + self._frame_checksum.nbytes
+        if self._frames is not None:
+            usage['_frames'] += self._frames.nbytes
+        return usage
+
+    def clear(self):
+        super().clear()
+        self._frames = None
+        self._frame_refcount = onp.zeros(self._frame_capacity, dtype='int64')
+        self._frame_checksum = onp.zeros(self._frame_capacity, dtype='int64')
+        self._frame_lookup = {}  # checksum -> list of frame slots
+        self._frame_cursor = 0
+        self._frame_tracker = _ChunkTracker(self._frame_capacity, self.checkpoint_chunk_size)
+
+    def _chunked_arrays(self):
+        arrays = super()._chunked_arrays()
+        if self._frames is not None:
+            arrays['_frames'] = (self._frames, self._frame_tracker)
+        return arrays
+
+    def _whole_arrays(self):
+        arrays = super()._whole_arrays()
+        arrays['_frames.refcount'] = self._frame_refcount
+        arrays['_frames.checksum'] = self._frame_checksum
+        arrays['_frames.cursor'] = onp.asarray(self._frame_cursor)
+        return arrays
+
+    def _restore(self, column_keys, chunked, whole):
+        super()._restore(column_keys, chunked, whole)
+        if '_frames' in chunked:
+            self._frames, self._frame_tracker = chunked['_frames']
+        self._frame_refcount = onp.array(whole['_frames.refcount'])
+        self._frame_checksum = onp.array(whole['_frames.checksum'])
+        self._frame_cursor = int(whole['_frames.cursor'])
+        for slot in onp.flatnonzero(self._frame_refcount > 0):
+            self._frame_lookup.setdefault(int(self._frame_checksum[slot]), []).append(int(slot))
+
+    def _allocate(self, name, value):
+        if name not in self.frame_fields or value is None:
+            return super()._allocate(name, value)
+
+        if not (isinstance(value, tuple) and value and all(
+                isinstance(v, (onp.ndarray, jnp.ndarray)) for v in value)):
+            raise TypeError(
+                f"field '{name}' must be a tuple of frames, e.g. as produced by "
+                f"coax.wrappers.FrameStacking; got: {type(value)}")
+
+        frame = onp.asarray(value[0])
+        if not all(onp.shape(v) == frame.shape and v.dtype == frame.dtype for v in value):
+            raise TypeError(f"all frames in field '{name}' must have the same shape and dtype")
+
+        if self._frames is None:
+            self._frames = onp.zeros(
+                (self._frame_capacity,) + frame.shape[1:], dtype=self._dtype_policy(name, frame))
+
+        column = self._new_array(f'{name}.0', (self.capacity, len(value)), 'int64')
+        column[...] = -1
+        return column
+
+    def _set_column(self, name, idx, value):
+        if name not in self.frame_fields or self._columns[name] is None:
+            return super()._set_column(name, idx, value)
+
+        column = self._columns[name]
+        if not (isinstance(value, tuple) and len(value) == column.shape[1]):
+            raise ValueError(
+                f"the structure of field '{name}' doesn't match the structure of the transitions "
+                "that were previously stored")
+
+        # release frames that are referenced by the rows that we're about to overwrite
+        old_slots = column[idx]
+        self._release_frames(old_slots[old_slots >= 0])
+
+        # dedupe within the batch first, so that we only look up each distinct frame once
+        frames = onp.stack([_check_fits(name, v, self._frames.dtype) for v in value], axis=1)
+        frames = onp.ascontiguousarray(frames, dtype=self._frames.dtype)
+        frames = frames.reshape((-1,) + self._frames.shape[1:])  # (batch_size * num_frames, ...)
+        first, inverse, counts = _unique_rows(frames.reshape(len(frames), -1))
+        slots = onp.array(
+            [self._insert_frame(frames[i], int(n)) for i, n in zip(first, counts)], dtype='int64')
+        column[idx] = slots[inverse].reshape(len(idx), len(value))
+
+    def _get_column(self, name, idx):
+        if name not in self.frame_fields or self._columns[name] is None:
+            return super()._get_column(name, idx)
+        frames = self._frames[self._columns[name][idx]]  # shape: (batch_size, num_frames, ...)
+        return tuple(frames[:, j] for j in range(frames.shape[1]))
+
+    def _insert_frame(self, frame, num_refs=1):
+        checksum = zlib.crc32(frame)
+        slots = self._frame_lookup.setdefault(checksum, [])
+        for slot in slots:
+            if onp.array_equal(self._frames[slot], frame):
+                self._frame_refcount[slot] += num_refs
+                return slot
+
+        slot = self._next_free_frame_slot()
+        self._frames[slot] = frame
+        self._frame_tracker.mark(slot)
+        self._frame_refcount[slot] = num_refs
+        self._frame_checksum[slot] = checksum
+        slots.append(slot)
+        return slot
+
+    def _release_frames(self, slots):
+        onp.subtract.at(self._frame_refcount, slots, 1)
+        for slot in onp.unique(slots[self._frame_refcount[slots] == 0]):
+            checksum = int(self._frame_checksum[slot])
+            self._frame_lookup[checksum].remove(slot)
+            if not self._frame_lookup[checksum]:
+                del self._frame_lookup[checksum]
+
+    def _next_free_frame_slot(self):
+        for _ in range(len(self._frame_refcount)):
+            slot = self._frame_cursor
+            self._frame_cursor = (self._frame_cursor + 1) % len(self._frame_refcount)
+            if self._frame_refcount[slot] == 0:
+                return slot
+
+        # frame ring is full, double its size
+        n = len(self._frame_refcount)
+        self._frames = onp.concatenate((self._frames, onp.zeros_like(self._frames)), axis=0)
+        self._frame_refcount = onp.concatenate((self._frame_refcount, onp.zeros(n, 'int64')))
+        self._frame_checksum = onp.concatenate((self._frame_checksum, onp.zeros(n, 'int64')))
+        self._frame_tracker.grow(2 * n)
+        self._frame_cursor = n + 1
+        return n
+
+
+class CompressedStorage(ColumnarStorage):
+    r"""
+
+    A columnar storage backend that keeps the observations LZ4-compressed.
+
+    Each leaf of each row of the ``S`` and ``S_next`` fields is compressed separately, such that
+    only the rows that are looked up need to be decompressed. The (de)compression of a batch is
+    spread over a pool of threads, which allows it to run alongside other work, e.g. a learner
+    that runs in a different thread. This is meant for pixel observations, which typically
+    compress by a factor 5-10.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The number of transitions (rows) to accommodate.
+
+    num_threads : positive int, optional
+
+        The number of threads used for compression and decompression. Defaults to the number of
+        CPUs (at most 8).
+
+    dtype_policy : str or dict, optional
+
+        The dtype policy, see :class:`ColumnarStorage`.
+
+    """
+    compressed_fields = ('S', 'S_next')
+
+    def __init__(self, capacity, num_threads=None, dtype_policy=None):
+        self._num_threads = num_threads or min(8, os.cpu_count() or 1)
+        self._executor = None
+        super().__init__(capacity, dtype_policy=dtype_policy)
+
+    def memory_usage(self):
+        usage = super().memory_usage()
+        for name, nbytes in self._compressed_nbytes.items():
+            usage[name] += nbytes
+        return usage
+
+    def clear(self):
+        super().clear()
+        self._templates = {}  # field name -> (treedef, list of (row_shape, dtype))
+        self._compressed_nbytes = {}  # field name -> total size of the compressed blobs
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'] = None  # thread pools can't be pickled, it's recreated when needed
+        return state
+
+    def __del__(self):
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
+
+    def _allocate(self, name, value):
+        if name not in self.compressed_fields or value is None:
+            return super()._allocate(name, value)
+        leaves, treedef = jax.tree_util.tree_flatten(value)
+        self._templates[name] = (treedef, [
+            (onp.shape(leaf)[1:], self._dtype_policy(name, onp.asarray(leaf))) for leaf in leaves])
+        self._compressed_nbytes[name] = 0
+        return onp.full((self.capacity, len(leaves)), None, dtype=object)
+
+    def _set_column(self, name, idx, value):
+        if name not in self._templates:
+            return super()._set_column(name, idx, value)
+
+        treedef, templates = self._templates[name]
+        if jax.tree_util.tree_structure(value) != treedef:
+            raise ValueError(
+                f"the structure of field '{name}' doesn't match the structure of the transitions "
+                "that were previously stored")
+
+        leaves = [
+            onp.ascontiguousarray(_check_fits(name, leaf, dtype), dtype=dtype)
+            for leaf, (_, dtype) in zip(jax.tree_util.tree_leaves(value), templates)]
+        column = self._columns[name]
+
+        def compress(rows):
+            delta = 0  # change in the total size of the blobs
+            for i in rows:
+                delta -= _blobs_nbytes(column[idx[i]])
+                column[idx[i]] = [lz4.block.compress(leaf[i]) for leaf in leaves]
+                delta += _blobs_nbytes(column[idx[i]])
+            return delta
+
+        self._compressed_nbytes[name] += sum(self._map(compress, len(idx)))
+
+    def _get_column(self, name, idx):
+        if name not in self._templates:
+            return super()._get_column(name, idx)
+
+        treedef, templates = self._templates[name]
+        idx = onp.asarray(idx)
+        blobs = self._columns[name][idx]
+        out = [onp.empty((len(idx),) + shape, dtype=dtype) for shape, dtype in templates]
+
+        def decompress(rows):
+            for i in rows:
+                for j, (leaf, (shape, dtype)) in enumerate(zip(out, templates)):
+                    data = lz4.block.decompress(blobs[i, j])
+                    leaf[i] = onp.frombuffer(data, dtype).reshape(shape)
+
+        self._map(decompress, len(idx))
+        return jax.tree_util.tree_unflatten(treedef, out)
+
+    def _load_chunked(self, dirpath, key, shape, dtype, chunk_size, chunks):
+        if onp.dtype(dtype) != object:
+            return super()._load_chunked(dirpath, key, shape, dtype, chunk_size, chunks)
+        arr = onp.full(shape, None, dtype=object)
+        tracker = _ChunkTracker(shape[0], chunk_size)
+        for c in chunks:
+            rows = slice(c * chunk_size, (c + 1) * chunk_size)
+            arr[rows] = onp.load(os.path.join(dirpath, f'{key}.{c:05d}.npy'), allow_pickle=True)
+        tracker.written[chunks] = True
+        return arr, tracker
+
+    def _whole_arrays(self):
+        arrays = super()._whole_arrays()
+        # store an empty example of each compressed field, so that we can restore the templates
+        examples = {
+            name: jax.tree_util.tree_unflatten(
+                treedef, [onp.zeros((0,) + shape, dtype) for shape, dtype in templates])
+            for name, (treedef, templates) in self._templates.items()}
+        arrays['_compressed.examples'] = onp.frombuffer(pickle.dumps(examples), dtype='uint8')
+        return arrays
+
+    def _restore(self, column_keys, chunked, whole):
+        super()._restore(column_keys, chunked, whole)
+        examples = pickle.loads(onp.asarray(whole['_compressed.examples']).tobytes())
+        for name, example in examples.items():
+            leaves, treedef = jax.tree_util.tree_flatten(example)
+            self._templates[name] = (treedef, [(leaf.shape[1:], leaf.dtype) for leaf in leaves])
+            self._compressed_nbytes[name] = sum(_blobs_nbytes(row) for row in self._columns[name])
+
+    def _map(self, func, n):
+        """ apply func to chunks of range(n), spread over the thread pool; returns the results """
+        if self._num_threads == 1 or n < 2:
+            return [func(range(n))]
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self._num_threads)
+        chunks = [range(i, n, self._num_threads) for i in range(min(n, self._num_threads))]
+        return [f.result() for f in [self._executor.submit(func, chunk) for chunk in chunks]]
+
+
+class MemmapStorage(ColumnarStorage):
+    r"""
+
+    A columnar storage backend whose arrays are :class:`memory-mapped <numpy.memmap>` ``.npy``
+    files.
+
+    This allows for replay buffers that are larger than the available RAM, in which case the OS
+    page cache keeps the frequently accessed pages in memory. If the directory already contains
+    the files of a previous storage, these are reopened, i.e. all stored transitions and auxiliary
+    state arrays (see :attr:`state`) persist across process restarts.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The number of transitions (rows) to accommodate.
+
+    dirpath : str
+
+        The directory in which to keep the memory-mapped files.
+
+    dtype_policy : str or dict, optional
+
+        The dtype policy, see :class:`ColumnarStorage`.
+
+    """
+    def __init__(self, capacity, dirpath, dtype_policy=None):
+        self._capacity = int(capacity)
+        self._dtype_policy = _check_dtype_policy(dtype_policy)
+        self._dirpath = os.path.abspath(os.path.expanduser(dirpath))
+        self._state = {}
+        os.makedirs(self._dirpath, exist_ok=True)
+        self._columns = self._open_columns()
+        self._tracker = _ChunkTracker(
+            self.capacity, self.checkpoint_chunk_size, written=self._columns is not None)
+        self._checkpoint_dirpath = None
+
+    @property
+    def dirpath(self):
+        return self._dirpath
+
+    def flush(self):
+        r""" Flush all changes to disk. """
+        for arr in jax.tree_util.tree_leaves((self._columns, self._state)):
+            if isinstance(arr, onp.memmap):
+                arr.flush()
+
+    def clear(self):
+        if self._columns is not None:
+            for filename in jax.tree_util.tree_leaves(self._load_templates()):
+                os.remove(os.path.join(self.dirpath, filename))
+            os.remove(os.path.join(self.dirpath, 'columns.pkl'))
+        super().clear()
+
+    def save(self, dirpath, incremental=True, arrays=None, metadata=None):
+        if os.path.abspath(os.path.expanduser(dirpath)) == self.dirpath:
+            raise ValueError("cannot save a checkpoint into the directory of the memory maps")
+        super().save(dirpath, incremental=incremental, arrays=arrays, metadata=metadata)
+
+    def set(self, idx, transition_batch):
+        allocate = self._columns is None
+        super().set(idx, transition_batch)
+        if allocate:
+            self._write_templates()
+
+    def _restore(self, column_keys, chunked, whole):
+        super()._restore(column_keys, chunked, whole)
+        if self._columns is not None:
+            self._write_templates()
+
+    def _new_array(self, key, shape, dtype):
+        return onp.lib.format.open_memmap(
+            os.path.join(self.dirpath, f'{key}.npy'), mode='w+', dtype=dtype, shape=tuple(shape))
+
+    def _write_templates(self):
+        templates = jax.tree_map(lambda arr: os.path.basename(arr.filename), self._columns)
+        with open(os.path.join(self.dirpath, 'columns.pkl'), 'wb') as f:
+            pickle.dump(templates, f)
+
+    def _create_state(self, name, shape, dtype, fill_value):
+        filepath = os.path.join(self.dirpath, f'_state.{name}.npy')
+        if os.path.exists(filepath):
+            arr = onp.lib.format.open_memmap(filepath, mode='r+')
+            if arr.shape != tuple(shape) or arr.dtype != onp.dtype(dtype):
+                raise ValueError(
+                    f"existing file {filepath} has shape {arr.shape} and dtype {arr.dtype}, "
+                    f"expected shape {tuple(shape)} and dtype {onp.dtype(dtype)}")
+            return arr
+        arr = onp.lib.format.open_memmap(filepath, mode='w+', dtype=dtype, shape=tuple(shape))
+        arr[...] = fill_value
+        return arr
+
+    def _open_columns(self):
+        templates = self._load_templates()
+        if templates is None:
+            return None
+
+        def open_memmap(filename):
+            arr = onp.lib.format.open_memmap(os.path.join(self.dirpath, filename), mode='r+')
+            if arr.shape[0] != self.capacity:
+                raise ValueError(
+                    f"existing file {filename} in {self.dirpath} has capacity {arr.shape[0]}, "
+                    f"expected capacity {self.capacity}")
+            return arr
+
+        return {k: jax.tree_map(open_memmap, v) for k, v in templates.items()}
+
+    def _load_templates(self):
+        filepath = os.path.join(self.dirpath, 'columns.pkl')
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'rb') as f:
+            return pickle.load(f)
+
+
+class SharedMemoryStorage(ColumnarStorage):
+    r"""
+
+    A columnar storage backend whose arrays live in shared memory, see
+    :mod:`multiprocessing.shared_memory`.
+
+    Other processes on the same machine can read from and write to the storage without copying any
+    data. Pickling the storage, e.g. to pass it on to another process, only pickles the names of
+    the shared-memory blocks. Unpickling it attaches to the same blocks. This also applies to the
+    auxiliary state arrays (see :attr:`state`), which should therefore be created before the
+    storage is passed on.
+
+    Since the other processes need to know the layout of the columns, these are allocated upfront,
+    based on an example transition batch.
+
+    The process that creates the storage owns the shared-memory blocks. The blocks are released
+    when this process calls :attr:`unlink` or when it exits.
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The number of transitions (rows) to accommodate.
+
+    transition_batch : TransitionBatch
+
+        An example transition batch, from which the shapes and dtypes of the columns are inferred.
+
+    dtype_policy : str or dict, optional
+
+        The dtype policy, see :class:`ColumnarStorage`.
+
+    """
+    def __init__(self, capacity, transition_batch, dtype_policy=None):
+        if not isinstance(transition_batch, TransitionBatch):
+            raise TypeError(
+                f"transition_batch must be a TransitionBatch, got: {type(transition_batch)}")
+        self._name = f'coax_{uuid.uuid4().hex[:12]}'  # short, some platforms limit the length
+        self._segments = {}
+        self._columns = None
+        super().__init__(capacity, dtype_policy=dtype_policy)
+        self._columns = {k: self._allocate(k, v) for k, v in transition_batch.items()}
+
+    @property
+    def name(self):
+        r""" The common prefix of the names of the shared-memory blocks. """
+        return self._name
+
+    def clear(self):
+        columns = self._columns
+        super().clear()
+        self._columns = columns  # the columns are shared, so we keep them around
+
+    def close(self):
+        r""" Detach from the shared-memory blocks, without releasing them. """
+        self._columns, self._state = None, {}
+        for shm, _, _ in self._segments.values():
+            shm.close()
+        self._segments = {}
+
+    def unlink(self):
+        r""" Release the shared-memory blocks. This should only be called by the creator. """
+        segments = list(self._segments.values())
+        self.close()
+        for shm, _, _ in segments:
+            if not _SHARED_MEMORY_TRACK_ARG:
+                # an attaching process may have unregistered the block, see _attach_shared_memory
+                resource_tracker.register(shm._name, 'shared_memory')
+            shm.unlink()
+
+    def _new_array(self, key, shape, dtype):
+        shape, dtype = tuple(shape), onp.dtype(dtype)
+        if key in self._segments:
+            # reuse the existing block, e.g. when a checkpoint is loaded
+            _, existing_shape, existing_dtype = self._segments[key]
+            if (existing_shape, onp.dtype(existing_dtype)) != (shape, dtype):
+                raise ValueError(
+                    f"array {key} has shape {existing_shape} and dtype {existing_dtype}, cannot "
+                    f"reuse it for shape {shape} and dtype {dtype}")
+            return self._as_array(key)
+        nbytes = int(onp.prod(shape, dtype='int64')) * dtype.itemsize
+        shm = shared_memory.SharedMemory(
+            name=f'{self._name}_{len(self._segments)}', create=True, size=max(1, nbytes))
+        self._segments[key] = (shm, shape, dtype.str)
+        return self._as_array(key)
+
+    def _create_state(self, name, shape, dtype, fill_value):
+        arr = self._new_array(f'_state.{name}', shape, dtype)
+        arr[...] = fill_value
+        return arr
+
+    def _as_array(self, key):
+        shm, shape, dtype = self._segments[key]
+        return onp.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    def __getstate__(self):
+        return {
+            'capacity': self._capacity,
+            'name': self._name,
+            'segments': {
+                k: (shm.name, shape, dtype) for k, (shm, shape, dtype) in self._segments.items()},
+            'column_keys': _column_keys(self._columns),
+            'state': {name: fill_value for name, (_, fill_value) in self._state.items()}}
+
+    def __setstate__(self, state):
+        self._capacity = state['capacity']
+        self._name = state['name']
+        self._dtype_policy = _check_dtype_policy(None)  # the columns have already been allocated
+        self._segments = {
+            k: (_attach_shared_memory(name), shape, dtype)
+            for k, (name, shape, dtype) in state['segments'].items()}
+        self._columns = {
+            name: jax.tree_map(self._as_array, keys)
+            for name, keys in state['column_keys'].items()}
+        self._state = {
+            name: (self._as_array(f'_state.{name}'), fill_value)
+            for name, fill_value in state['state'].items()}
+        self._tracker = _ChunkTracker(self.capacity, self.checkpoint_chunk_size, written=True)
+        self._checkpoint_dirpath = None
+
+
+class _ChunkTracker:
+    """ keeps track of which chunks of rows were written ever and since the last checkpoint """
+    def __init__(self, num_rows, chunk_size, written=False):
+        self.chunk_size = int(chunk_size)
+        num_chunks = -(-int(num_rows) // self.chunk_size)
+        self.written = onp.full(num_chunks, bool(written))
+        self.dirty = self.written.copy()
+
+    def mark(self, rows):
+        chunks = onp.asarray(rows) // self.chunk_size
+        self.written[chunks] = True
+        self.dirty[chunks] = True
+
+    def grow(self, num_rows):
+        num_new = -(-int(num_rows) // self.chunk_size) - len(self.written)
+        self.written = onp.concatenate((self.written, onp.zeros(num_new, dtype='bool')))
+        self.dirty = onp.concatenate((self.dirty, onp.zeros(num_new, dtype='bool')))
+
+    def pending(self, full=False):
+        return onp.flatnonzero(self.written if full else self.dirty)
+
+
+def _check_dtype_policy(dtype_policy):
+    if dtype_policy is None:
+        return lambda name, leaf: leaf.dtype
+    if isinstance(dtype_policy, dict):
+        dtypes = {k: onp.dtype(v) for k, v in dtype_policy.items()}
+        return lambda name, leaf: dtypes.get(name, leaf.dtype)
+    if not isinstance(dtype_policy, str):
+        raise TypeError(f"dtype_policy must be a str or a dict, got: {type(dtype_policy)}")
+    if dtype_policy != 'compact':
+        raise ValueError(f"unknown dtype_policy: '{dtype_policy}', expected: 'compact'")
+    return _compact_dtype
+
+
+def _compact_dtype(name, leaf):
+    """ the 'compact' dtype policy: leaf is a batched array, i.e. leaf.shape[0] == batch_size """
+    if name == 'idx':
+        return leaf.dtype
+    if leaf.dtype.kind == 'f':
+        return onp.dtype('float32') if leaf.dtype.itemsize > 4 else leaf.dtype
+    if leaf.dtype.kind in 'iu':
+        if name in ('S', 'S_next') and leaf.ndim >= 3:
+            return onp.dtype('uint8')  # pixels, shape: (batch_size, height, width, ...)
+        return onp.dtype('int32') if leaf.dtype.itemsize > 4 else leaf.dtype
+    return leaf.dtype
+
+
+def _blobs_nbytes(blobs):
+    """ the size of a row of compressed leaves, which is a row of Nones if it hasn't been set """
+    return sum(sys.getsizeof(b) for b in blobs if b is not None)
+
+
+def _unique_rows(rows, num_fingerprint_bytes=256):
+    """
+
+    Same as onp.unique(rows, axis=0, return_index=True, return_inverse=True, return_counts=True),
+    but much faster for wide rows (e.g. pixel frames). Rows are grouped by a fingerprint of a few of
+    their bytes first, after which each row is compared to the first row of its group.
+
+    """
+    rows = onp.ascontiguousarray(rows).reshape(len(rows), -1)
+    rows = rows.view('uint8').reshape(len(rows), -1)
+    num_bytes = rows.shape[1]
+    word_size = next(k for k in (8, 4, 2, 1) if num_bytes % k == 0)
+    words = rows.view(f'uint{8 * word_size}')
+
+    cols = onp.linspace(0, num_bytes - 1, min(num_bytes, num_fingerprint_bytes)).astype('int64')
+    fingerprints = _as_void(rows[:, cols])
+    _, first, inverse = onp.unique(fingerprints, return_index=True, return_inverse=True)
+    rep = first[inverse.ravel()]  # the first row of each group serves as its representative
+
+    # rows that differ from their representative only outside of the fingerprint
+    dup = onp.flatnonzero(rep != onp.arange(len(rows)))
+    same = onp.empty(len(dup), dtype='bool')
+    chunk_size = max(1, 2 ** 18 // num_bytes)  # compare in cache-sized chunks
+    for i in range(0, len(dup), chunk_size):
+        d = dup[i:(i + chunk_size)]
+        same[i:(i + chunk_size)] = onp.all(words[d] == words[rep[d]], axis=1)
+    bad = dup[~same]
+    if bad.size:
+        _, first, inverse = onp.unique(_as_void(rows[bad]), return_index=True, return_inverse=True)
+        rep[bad] = bad[first[inverse.ravel()]]
+
+    first, inverse, counts = onp.unique(rep, return_inverse=True, return_counts=True)
+    return first, inverse.ravel(), counts
+
+
+def _as_void(rows):
+    rows = onp.ascontiguousarray(rows)
+    return rows.view(onp.dtype((onp.void, rows.shape[1]))).ravel()
+
+
+def _check_fits(name, leaf, dtype):
+    """ make sure that integer values survive the cast to a (possibly smaller) column dtype """
+    leaf = onp.asarray(leaf)
+    if dtype.kind in 'iu' and leaf.size and not onp.can_cast(leaf.dtype, dtype):
+        info = onp.iinfo(dtype)
+        if leaf.min() < info.min or leaf.max() > info.max:
+            raise ValueError(
+                f"the values of field '{name}' don't fit in dtype {dtype}; please use a different "
+                "dtype_policy")
+    return leaf
+
+
+_SHARED_MEMORY_TRACK_ARG = 'track' in inspect.signature(shared_memory.SharedMemory).parameters
+
+
+def _attach_shared_memory(name):
+    # only the creator should release the block, see https://github.com/python/cpython/issues/82300
+    if _SHARED_MEMORY_TRACK_ARG:
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _column_keys(columns):
+    if columns is None:
+        return None
+    return {
+        name: jax.tree_util.tree_unflatten(
+            jax.tree_util.tree_structure(col),
+            [f'{name}.{i}' for i in range(jax.tree_util.tree_structure(col).num_leaves)])
+        for name, col in columns.items()}
+
+
+def _save_npy(filepath, arr):
+    with open(filepath + '.tmp', 'wb') as f:
+        onp.save(f, arr)
+    os.replace(filepath + '.tmp', filepath)
@@ -0,0 +1,300 @@
+import os
+from collections import deque
+from copy import deepcopy
+
+import numpy as onp
+import pytest
+
+from ..reward_tracing import NStep
+from ..utils import dump, load
+from ._simple import SimpleReplayBuffer
+from ._prioritized import PrioritizedReplayBuffer
+from ._storage import ColumnarStorage
+from . import _storage
+
+
+def fill(buffers, num_episodes, num_frames=3, episode_length=7, random_seed=13):
+    rnd = onp.random.RandomState(random_seed)
+    tracer = NStep(n=2, gamma=0.9)
+    for _ in range(num_episodes):
+        frames = deque([rnd.randint(256, size=(5, 6), dtype='uint8')] * num_frames,
+                       maxlen=num_frames)
+        for t in range(episode_length):
+            s = tuple(frames)
+            frames.append(rnd.randint(256, size=(5, 6), dtype='uint8'))
+            tracer.add(s, rnd.randint(3), rnd.randn(), t == episode_length - 1)
+            while tracer:
+                transition_batch = tracer.pop()
+                for buffer in buffers:
+                    if isinstance(buffer, PrioritizedReplayBuffer):
+                        buffer.add(transition_batch.copy(), Adv=transition_batch.Rn)
+                    else:
+                        buffer.add(transition_batch.copy())
+
+
+def test_dedup_frames_simple():
+    buffer1 = SimpleReplayBuffer(capacity=20, random_seed=7)
+    buffer2 = SimpleReplayBuffer(capacity=20, random_seed=7, dedup_frames=True)
+    fill([buffer1, buffer2], num_episodes=5)  # wraps around the ring a few times
+
+    assert len(buffer1) == len(buffer2) == 20
+    for t1, t2 in zip(buffer1, buffer2):
+        assert t1 == t2
+    assert buffer1.sample(batch_size=8) == buffer2.sample(batch_size=8)
+
+    # each transition introduces one new frame, plus the initial frame of each episode
+    assert buffer2._storage.num_unique_frames <= 20 + 2 * 3
+
+
+def test_dedup_frames_prioritized():
+    buffer1 = PrioritizedReplayBuffer(capacity=20, random_seed=7)
+    buffer2 = PrioritizedReplayBuffer(capacity=20, random_seed=7, dedup_frames=True)
+    fill([buffer1, buffer2], num_episodes=5)
+
+    for t1, t2 in zip(buffer1, buffer2):
+        assert t1 == t2
+    assert buffer1.sample(batch_size=8) == buffer2.sample(batch_size=8)
+
+
+def test_dedup_frames_grow():
+    buffer = SimpleReplayBuffer(capacity=20, dedup_frames=True)
+    buffer._storage._frame_capacity = 4
+    buffer.clear()
+    fill([buffer], num_episodes=2)
+    assert len(buffer._storage.frames) >= buffer._storage.num_unique_frames > 4
+
+    reference = SimpleReplayBuffer(capacity=20)
+    fill([reference], num_episodes=2)
+    for t1, t2 in zip(reference, buffer):
+        assert t1 == t2
+
+
+def test_dedup_frames_within_batch():
+    reference = SimpleReplayBuffer(capacity=20)
+    fill([reference], num_episodes=5)
+    transition_batch = reference._storage.get(onp.arange(20))
+
+    storage = _storage.FrameStackingStorage(capacity=20)
+    storage.set(onp.arange(20), transition_batch)
+    assert storage.get(onp.arange(20)) == transition_batch
+    assert storage.num_unique_frames <= 20 + 2 * 3
+    assert storage._frame_refcount.sum() == 20 * 2 * 3  # one per frame in S and S_next
+
+    # overwriting releases the old references
+    storage.set(onp.arange(10), transition_batch.slice(10, 20))
+    assert storage._frame_refcount.sum() == 20 * 2 * 3
+    assert storage.get(onp.arange(10)) == transition_batch.slice(10, 20)
+
+
+def test_unique_rows_fingerprint_collisions():
+    rnd = onp.random.RandomState(13)
+    rows = rnd.randint(2, size=(4, 1000), dtype='uint8')[rnd.randint(4, size=50)]
+    rows[::7, 501] += 1  # outside of the (tiny) fingerprint
+    first, inverse, counts = _storage._unique_rows(rows, num_fingerprint_bytes=4)
+    onp.testing.assert_array_equal(rows[first][inverse], rows)
+    assert len(first) == len(onp.unique(rows, axis=0))
+    onp.testing.assert_array_equal(counts, onp.bincount(inverse))
+
+
+def test_memmap_resume(tmp_path):
+    buffer1 = PrioritizedReplayBuffer(capacity=20, random_seed=7, dirpath=tmp_path)
+    fill([buffer1], num_episodes=5)
+    transitions = list(buffer1)
+    priorities = buffer1._sumtree.values.copy()
+    index = buffer1._index
+    del buffer1
+
+    # reopen from disk
+    buffer2 = PrioritizedReplayBuffer(capacity=20, random_seed=7, dirpath=tmp_path)
+    assert buffer2._index == index
+    assert onp.allclose(buffer2._sumtree.values, priorities)
+    for t1, t2 in zip(transitions, buffer2):
+        assert t1 == t2
+
+    # keep adding to the reopened buffer
+    fill([buffer2], num_episodes=1, random_seed=11)
+    assert buffer2._index == index + 7
+    assert buffer2.sample(batch_size=8).batch_size == 8
+
+    buffer2.clear()
+    assert len(buffer2) == 0
+    assert not buffer2._storage
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        '_state.idx.npy', '_state.index.npy', '_state.priorities.npy']
+
+
+def test_memmap_simple(tmp_path):
+    buffer1 = SimpleReplayBuffer(capacity=20, random_seed=7)
+    buffer2 = SimpleReplayBuffer(capacity=20, random_seed=7, dirpath=tmp_path)
+    fill([buffer1, buffer2], num_episodes=5)
+    assert buffer1.sample(batch_size=8) == buffer2.sample(batch_size=8)
+
+    buffer3 = SimpleReplayBuffer(capacity=20, dirpath=tmp_path)
+    assert len(buffer3) == 20
+    for t1, t2 in zip(buffer1, buffer3):
+        assert t1 == t2
+
+    with pytest.raises(ValueError):
+        SimpleReplayBuffer(capacity=30, dirpath=tmp_path)
+
+
+def test_compress_observations():
+    buffer1 = PrioritizedReplayBuffer(capacity=20, random_seed=7)
+    buffer2 = PrioritizedReplayBuffer(capacity=20, random_seed=7, compress_observations=True)
+    buffer2._storage._num_threads = 3  # exercise thread pool, even on a single cpu
+    fill([buffer1, buffer2], num_episodes=5)
+
+    assert len(buffer1) == len(buffer2) == 20
+    for t1, t2 in zip(buffer1, buffer2):
+        assert t1 == t2
+    assert buffer1.sample(batch_size=8) == buffer2.sample(batch_size=8)
+    assert isinstance(buffer2._storage.columns['S'][0, 0], bytes)
+
+    with pytest.raises(ValueError):
+        SimpleReplayBuffer(capacity=20, dedup_frames=True, compress_observations=True)
+
+
+def test_compress_observations_copy(tmp_path):
+    buffer = PrioritizedReplayBuffer(capacity=20, random_seed=7, compress_observations=True)
+    buffer._storage._num_threads = 3
+    fill([buffer], num_episodes=5)
+    buffer.sample(batch_size=8)
+    assert buffer._storage._executor is not None
+
+    dump(buffer, str(tmp_path / 'buffer.pkl.lz4'))
+    for buffer_copy in (deepcopy(buffer), load(str(tmp_path / 'buffer.pkl.lz4'))):
+        assert buffer_copy._storage._executor is None
+        for t1, t2 in zip(buffer, buffer_copy):
+            assert t1 == t2
+        buffer_copy.sample(batch_size=8)  # recreates the thread pool
+        assert buffer_copy.memory_usage() == buffer.memory_usage()
+
+
+@pytest.mark.parametrize('options', [{}, {'dedup_frames': True}, {'compress_observations': True}])
+def test_checkpoint(tmp_path, monkeypatch, options):
+    monkeypatch.setattr(ColumnarStorage, 'checkpoint_chunk_size', 4)
+    num_saved = []
+    save_npy = _storage._save_npy
+    monkeypatch.setattr(
+        _storage, '_save_npy', lambda *args: (num_saved.append(args[0]), save_npy(*args)))
+
+    buffer1 = PrioritizedReplayBuffer(capacity=20, random_seed=7, **options)
+    fill([buffer1], num_episodes=5)
+    buffer1.save(tmp_path)
+    num_saved_full = len(num_saved)
+
+    # only the chunks with new transitions are written
+    num_saved.clear()
+    fill([buffer1], num_episodes=1, episode_length=2, random_seed=11)
+    buffer1.save(tmp_path)
+    num_saved_incremental = len(num_saved)
+    assert 0 < num_saved_incremental < num_saved_full
+
+    buffer2 = PrioritizedReplayBuffer(capacity=20, **options)
+    buffer2.load(tmp_path)
+    assert buffer2._index == buffer1._index
+    assert onp.allclose(buffer2._sumtree.values, buffer1._sumtree.values)
+    for t1, t2 in zip(buffer1, buffer2):
+        assert t1 == t2
+    assert buffer1.sample(batch_size=8) == buffer2.sample(batch_size=8)
+
+    # nothing changed since loading
+    num_saved.clear()
+    buffer2.save(tmp_path)
+    assert all('.000' not in os.path.basename(f) for f in num_saved)
+
+    # keep adding to both
+    fill([buffer1, buffer2], num_episodes=2, random_seed=17)
+    for t1, t2 in zip(buffer1, buffer2):
+        assert t1 == t2
+
+
+def test_checkpoint_simple(tmp_path):
+    buffer1 = SimpleReplayBuffer(capacity=20, random_seed=7)
+    fill([buffer1], num_episodes=5)
+    buffer1.save(tmp_path)
+
+    buffer2 = SimpleReplayBuffer(capacity=20, dirpath=tmp_path / 'memmap')
+    buffer2.load(tmp_path)
+    for t1, t2 in zip(buffer1, buffer2):
+        assert t1 == t2
+    assert buffer1.sample(batch_size=8) == buffer2.sample(batch_size=8)
+
+    with pytest.raises(ValueError):
+        SimpleReplayBuffer(capacity=30).load(tmp_path)
+
+
+@pytest.mark.parametrize('options', [{}, {'dedup_frames': True}, {'compress_observations': True}])
+def test_dtype_policy(options):
+    buffer1 = PrioritizedReplayBuffer(capacity=20, random_seed=7, **options)
+    buffer2 = PrioritizedReplayBuffer(
+        capacity=20, random_seed=7, dtype_policy='compact', **options)
+    fill([buffer1, buffer2], num_episodes=5)
+
+    t1, t2 = buffer1.sample(batch_size=8), buffer2.sample(batch_size=8)
+    assert t1.A.dtype == onp.int64 and t2.A.dtype == onp.int32
+    assert t1.Rn.dtype == onp.float64 and t2.Rn.dtype == onp.float32
+    assert t2.S[0].dtype == onp.uint8
+    assert t2.idx.dtype == onp.int64
+    onp.testing.assert_array_equal(t1.A, t2.A)
+    onp.testing.assert_allclose(t1.Rn, t2.Rn, rtol=1e-6)
+    assert sum(buffer2.memory_usage().values()) < sum(buffer1.memory_usage().values())
+
+    # values that don't fit
+    buffer3 = SimpleReplayBuffer(capacity=20, dtype_policy={'A': 'uint8'}, **options)
+    fill([buffer3], num_episodes=1)
+    assert buffer3.sample(batch_size=4).A.dtype == onp.uint8
+    transition_batch = buffer3.sample(batch_size=4)
+    transition_batch.A = transition_batch.A.astype('int64')
+    transition_batch.A[0] = 256
+    with pytest.raises(ValueError):
+        buffer3.add(transition_batch)
+
+    with pytest.raises(ValueError):
+        SimpleReplayBuffer(capacity=20, dtype_policy='tiny')
+
+
+def test_memory_usage():
+    buffer = SimpleReplayBuffer(capacity=20, dedup_frames=True)
+    assert buffer.memory_usage()['_state'] == 8  # just the ring position
+    fill([buffer], num_episodes=1)
+    usage = buffer.memory_usage()
+    assert usage['A'] == 20 * 8
+    assert usage['S'] == 20 * 3 * 8  # pointers into the frame ring
+    assert usage['_frames'] >= 40 * 5 * 6
+
+    buffer = PrioritizedReplayBuffer(capacity=20, compress_observations=True)
+    fill([buffer], num_episodes=1)
+    usage = buffer.memory_usage()
+    assert usage['S'] > 20 * 3 * 8  # pointers plus compressed blobs
+    assert usage['_sumtree'] > 0
+
+    # the running total matches the size of the blobs that are currently stored
+    fill([buffer], num_episodes=3, random_seed=17)
+    blobs = buffer._storage.columns['S']
+    expected = blobs.nbytes + sum(_storage._blobs_nbytes(row) for row in blobs)
+    assert buffer.memory_usage()['S'] == expected
+    buffer.clear()
+    assert 'S' not in buffer.memory_usage()
+
+
+@pytest.mark.parametrize('cls', [SimpleReplayBuffer, PrioritizedReplayBuffer])
+def test_capacity_bytes(cls):
+    reference = cls(capacity=20, dtype_policy='compact')
+    fill([reference], num_episodes=1)
+    budget = sum(reference.memory_usage().values())
+
+    buffer = cls(capacity_bytes=budget, dtype_policy='compact')
+    assert buffer.capacity is None and len(buffer) == 0 and buffer.memory_usage() == {}
+    buffer.clear()
+    fill([buffer], num_episodes=5)
+    assert 18 <= buffer.capacity <= 20
+    assert len(buffer) == buffer.capacity
+    assert sum(buffer.memory_usage().values()) <= budget
+
+    with pytest.raises(ValueError):
+        cls()
+    with pytest.raises(ValueError):
+        cls(capacity=20, capacity_bytes=budget)
+    with pytest.raises(ValueError):
+        cls(capacity_bytes=budget, dirpath='/tmp')
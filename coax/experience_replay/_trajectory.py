@@ -0,0 +1,233 @@
+import random
+
+import jax
+import numpy as onp
+
+from ..reward_tracing import TransitionBatch
+from ._base import BaseReplayBuffer
+
+
+__all__ = (
+    'TrajectoryReplayBuffer',
+)
+
+
+class TrajectoryReplayBuffer(BaseReplayBuffer):
+    r"""
+
+    A ring buffer for experience replay that stores raw trajectories and constructs :math:`n`-step
+    bootstrapped transitions at sample time.
+
+    Unlike the combination of a :class:`NStep <coax.reward_tracing.NStep>` tracer and a
+    :class:`SimpleReplayBuffer <coax.experience_replay.SimpleReplayBuffer>`, this buffer stores each
+    state observation only once. Moreover, since the partial returns :math:`R^{(n)}_t` and the
+    bootstrap factors :math:`I^{(n)}_t` are computed when sampling, the values for :math:`n` and
+    :math:`\gamma` may be changed (e.g. swept over) without having to collect new data.
+
+    The transitions that are produced are identical to the ones that an :class:`NStep
+    <coax.reward_tracing.NStep>` tracer would produce.
+
+    Example
+    -------
+
+    .. code::
+
+        buffer = coax.experience_replay.TrajectoryReplayBuffer(capacity=100000, n=3, gamma=0.99)
+
+        s, info = env.reset()
+        for t in range(num_steps):
+            a, logp = pi(s, return_logp=True)
+            s_next, r, done, truncated, info = env.step(a)
+            buffer.add(s, a, r, done or truncated, logp)
+            s = env.reset()[0] if done or truncated else s_next
+
+            if len(buffer) > 5000:
+                transition_batch = buffer.sample(batch_size=32)           # uses n=3, gamma=0.99
+                transition_batch = buffer.sample(batch_size=32, n=5)      # uses n=5, gamma=0.99
+
+    Parameters
+    ----------
+    capacity : positive int
+
+        The capacity of the experience replay buffer, i.e. the number of time steps to store.
+
+    n : positive int, optional
+
+        The default number of steps over which to bootstrap.
+
+    gamma : float between 0 and 1, optional
+
+        The default amount by which to discount future rewards.
+
+    random_seed : int, optional
+
+        To get reproducible results.
+
+    """
+    def __init__(self, capacity, n=1, gamma=0.9, random_seed=None):
+        if not (isinstance(capacity, int) and capacity > 0):
+            raise TypeError(f"capacity must be a positive int, got: {capacity}")
+        self._capacity = int(capacity)
+        self._n, self._gamma = self._check_n_gamma(n, gamma)
+        random.seed(random_seed)
+        self._random_state = random.getstate()
+        self.clear()  # sets: self._columns, self._index, self._steps_since_done
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def n(self):
+        return self._n
+
+    @property
+    def gamma(self):
+        return self._gamma
+
+    def add(self, s, a, r, done, logp=0.0):
+        r"""
+
+        Add a single time step to the experience replay buffer.
+
+        Parameters
+        ----------
+        s : state observation
+
+            A single state observation.
+
+        a : action
+
+            A single action.
+
+        r : float
+
+            A single observed reward.
+
+        done : bool
+
+            Whether the episode has finished.
+
+        logp : float, optional
+
+            The log-propensity :math:`\log\pi(a|s)`.
+
+        """
+        if not isinstance(done, bool):
+            raise TypeError(f"done must be a bool, got: {done}")
+        if not onp.all(onp.asarray(logp) <= 0):
+            raise TypeError(f"logp must be non-positive float(s), got: {logp}")
+
+        step = {'S': s, 'A': a, 'logP': logp, 'R': r, 'done': done}
+        if self._columns is None:
+            self._columns = jax.tree_map(
+                lambda x: onp.zeros((self.capacity,) + onp.shape(x), dtype=onp.asarray(x).dtype),
+                step)
+
+        i = self._index % self.capacity
+        jax.tree_map(lambda col, x: col.__setitem__(i, x), self._columns, step)
+        self._index += 1
+        self._steps_since_done = 0 if done else self._steps_since_done + 1
+
+    def sample(self, batch_size=32, n=None, gamma=None):
+        r"""
+
+        Get a batch of :math:`n`-step bootstrapped transitions.
+
+        Parameters
+        ----------
+        batch_size : positive int, optional
+
+            The desired batch size of the sample.
+
+        n : positive int, optional
+
+            The number of steps over which to bootstrap. Defaults to the value passed to the
+            constructor.
+
+        gamma : float between 0 and 1, optional
+
+            The amount by which to discount future rewards. Defaults to the value passed to the
+            constructor.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        n, gamma = self._check_n_gamma(
+            self.n if n is None else n, self.gamma if gamma is None else gamma)
+        num_ready = self._num_ready(n)
+        if batch_size > num_ready:
+            raise ValueError(
+                f"cannot sample batch_size={batch_size} transitions, only {num_ready} are ready")
+
+        # sandwich sample in between setstate/getstate in case global random state was tampered with
+        random.setstate(self._random_state)
+        idx = onp.asarray(random.sample(range(num_ready), batch_size), dtype='int64')
+        self._random_state = random.getstate()
+        return self._transitions(self._index - len(self) + idx, n, gamma)
+
+    def clear(self):
+        r""" Clear the experience replay buffer. """
+        self._columns = None
+        self._index = 0
+        self._steps_since_done = 0
+
+    def _transitions(self, t, n, gamma):
+        """ construct n-step transitions, given a 1d array of (global) time steps t """
+        t_lookahead = t[:, None] + onp.arange(n)                   # shape: (batch_size, n)
+        done = self._columns['done'][t_lookahead % self.capacity]   # shape: (batch_size, n)
+
+        # mask out rewards that come after the end of the episode
+        alive = onp.ones_like(done)
+        alive[:, 1:] = onp.cumprod(~done[:, :-1], axis=1)
+        terminated = onp.any(done, axis=1)
+
+        R = self._columns['R'][t_lookahead % self.capacity]
+        Rn = onp.einsum('ij,ij...->i...', alive * onp.power(gamma, onp.arange(n)), R)
+
+        # no bootstrapping after the end of the episode
+        t_next = onp.where(terminated, t, t + n)
+
+        def gather(tt):
+            return jax.tree_map(lambda col: col[tt % self.capacity], self._columns)
+
+        step, step_next = gather(t), gather(t_next)
+        return TransitionBatch.from_arrays(
+            S=step['S'],
+            A=step['A'],
+            logP=step['logP'],
+            Rn=Rn,
+            Done=terminated,
+            gamma=gamma ** n,
+            S_next=step_next['S'],
+            A_next=step_next['A'],
+            logP_next=step_next['logP'],
+            idx=t,
+            validate=False,
+        )
+
+    def _num_ready(self, n):
+        # the last few steps of an unfinished episode don't have enough lookahead yet
+        return max(0, len(self) - min(n, self._steps_since_done))
+
+    def _check_n_gamma(self, n, gamma):
+        if not (isinstance(n, int) and 0 < n < self.capacity):
+            raise TypeError(f"n must be a positive int smaller than the capacity, got: {n}")
+        if not (isinstance(gamma, (float, int)) and 0 <= gamma <= 1):
+            raise TypeError(f"gamma must be a float in the unit interval [0, 1], got: {gamma}")
+        return int(n), float(gamma)
+
+    def __len__(self):
+        return min(self.capacity, self._index)
+
+    def __bool__(self):
+        return bool(len(self))
+
+    def __iter__(self):
+        first = self._index - len(self)
+        for t in range(first, first + self._num_ready(self.n)):
+            yield self._transitions(onp.array([t]), self.n, self.gamma)
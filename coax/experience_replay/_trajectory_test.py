@@ -0,0 +1,74 @@
+import numpy as onp
+import pytest
+
+from ..reward_tracing import NStep
+from ._trajectory import TrajectoryReplayBuffer
+
+
+def run_episodes(buffer, tracer, num_episodes, random_seed=13):
+    rnd = onp.random.RandomState(random_seed)
+    transitions = []
+    for _ in range(num_episodes):
+        episode_length = rnd.randint(1, 9)
+        for t in range(episode_length):
+            s = rnd.randn(3).astype('float32')
+            a = rnd.randint(4)
+            r = float(rnd.randn())
+            logp = float(-rnd.rand())
+            done = (t == episode_length - 1)
+            buffer.add(s, a, r, done, logp)
+            tracer.add(s, a, r, done, logp)
+            while tracer:
+                transitions.append(tracer.pop())
+    return transitions
+
+
+@pytest.mark.parametrize('n', [1, 3, 5])
+def test_consistent_with_nstep(n):
+    buffer = TrajectoryReplayBuffer(capacity=1000, n=n, gamma=0.9)
+    transitions = run_episodes(buffer, NStep(n=n, gamma=0.9), num_episodes=20)
+
+    assert len(list(buffer)) == len(transitions)
+    for t1, t2 in zip(transitions, buffer):
+        t2.idx = t1.idx
+        assert t1 == t2
+
+
+def test_sweep_n():
+    buffer = TrajectoryReplayBuffer(capacity=1000, n=1, gamma=0.9)
+    transitions = run_episodes(buffer, NStep(n=4, gamma=0.7), num_episodes=20)
+
+    # same data, different (n, gamma)
+    t = onp.arange(buffer._num_ready(4))
+    transition_batch = buffer._transitions(t, n=4, gamma=0.7)
+    assert transition_batch.batch_size == len(transitions)
+    for field in ('Rn', 'In', 'S_next', 'A_next', 'logP_next'):
+        expected = onp.concatenate([getattr(t1, field) for t1 in transitions])
+        assert onp.allclose(getattr(transition_batch, field), expected)
+
+    transition_batch = buffer.sample(batch_size=16, n=4, gamma=0.7)
+    assert transition_batch.batch_size == 16
+    assert onp.all(onp.isin(transition_batch.In, (0., 0.7 ** 4)))
+
+
+def test_ring_wraparound():
+    buffer = TrajectoryReplayBuffer(capacity=50, n=3, gamma=0.9)
+    transitions = run_episodes(buffer, NStep(n=3, gamma=0.9), num_episodes=40)
+    assert len(buffer) == 50
+
+    # the buffer holds the transitions that correspond to the 50 most recent time steps
+    for t1, t2 in zip(transitions[-50:], buffer):
+        t2.idx = t1.idx
+        assert t1 == t2
+
+
+def test_unfinished_episode():
+    buffer = TrajectoryReplayBuffer(capacity=50, n=3, gamma=0.9)
+    for t in range(5):
+        buffer.add(onp.zeros(3), 0, 1., False)
+    assert len(buffer) == 5
+    assert len(list(buffer)) == 2  # the last 3 steps don't have enough lookahead yet
+    with pytest.raises(ValueError):
+        buffer.sample(batch_size=3)
+    buffer.add(onp.zeros(3), 0, 1., True)
+    assert len(list(buffer)) == 6
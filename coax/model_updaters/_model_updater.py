@@ -4,7 +4,8 @@ import haiku as hk
 import optax
 
 from ..utils import (
-    get_grads_diagnostics, is_stochastic, is_reward_function, is_transition_model, jit)
+    get_grads_diagnostics, get_transition_batch, is_stochastic, is_reward_function,
+    is_transition_model, jit)
 from ..value_losses import huber
 from ..regularizers import Regularizer
 
@@ -195,6 +196,37 @@ class ModelUpdater:
             self.model.params, self.model.function_state, self.hyperparams, self.model.rng,
             transition_batch)
 
+    def warmup(self, batch_sizes=(32,)):
+        r"""
+
+        Compile the gradient computation and the parameter update ahead of time (AOT).
+
+        Parameters
+        ----------
+        batch_sizes : sequence of positive ints, optional
+
+            The sizes of the transition batches to compile for.
+
+        Returns
+        -------
+        report : dict
+
+            The compile time (in seconds) per function and batch size.
+
+        """
+        rng = jax.random.PRNGKey(0)  # dummy key, so that warmup doesn't advance self.model.rng
+        report = {}
+        for batch_size in batch_sizes:
+            transition_batch = get_transition_batch(
+                self.model, batch_size, random_seed=self.model.random_seed)
+            report[f'grads_and_metrics[batch_size={batch_size}]'] = \
+                self._grads_and_metrics_func.warmup(
+                    self.model.params, self.model.function_state, self.hyperparams, rng,
+                    transition_batch)
+        report['apply_grads'] = self._apply_grads_func.warmup(
+            self.optimizer, self.optimizer_state, self.model.params, self.model.params)
+        return report
+
     @property
     def hyperparams(self):
         return hk.data_structures.to_immutable_dict({
@@ -4,7 +4,7 @@ from optax import sgd
 
 from .._base.test_case import TestCase
 from .._core.stochastic_transition_model import StochasticTransitionModel
-from ..utils import get_transition_batch
+from ..utils import get_transition_batch, enable_jit_profiling, disable_jit_profiling
 from ..regularizers import EntropyRegularizer
 from ._model_updater import ModelUpdater
 
@@ -80,3 +80,23 @@ class TestModelUpdater(TestCase):
         self.assertPytreeNotEqual(params_with_reg, params_without_reg)  # <---- important
         self.assertPytreeNotEqual(function_state_with_reg, function_state_init)
         self.assertPytreeAlmostEqual(function_state_with_reg, function_state_without_reg)  # same!
+
+    def test_warmup(self):
+        env = self.env_discrete
+        p = StochasticTransitionModel(self.func_p_type1, env, random_seed=11)
+        updater = ModelUpdater(p, optimizer=sgd(1.0))
+        report = updater.warmup(batch_sizes=(1,))
+        self.assertEqual(set(report), {'grads_and_metrics[batch_size=1]', 'apply_grads'})
+
+        # warmup doesn't consume any random keys
+        p_fresh = StochasticTransitionModel(self.func_p_type1, env, random_seed=11)
+        self.assertArrayAlmostEqual(p.rng, p_fresh.rng)
+
+        # the first update doesn't need to retrace
+        enable_jit_profiling()
+        try:
+            updater.update(self.transition_discrete)
+        finally:
+            disable_jit_profiling()
+        self.assertEqual(updater._grads_and_metrics_func._num_traces, 0)
+        self.assertEqual(updater._apply_grads_func._num_traces, 0)
@@ -2,11 +2,12 @@ import warnings
 
 import jax
 import jax.numpy as jnp
+import numpy as onp
 import optax
 import haiku as hk
 
 from .._core.policy import Policy
-from ..utils import get_grads_diagnostics, jit
+from ..utils import get_grads_diagnostics, get_transition_batch, jit
 from ..regularizers import Regularizer
 
 
@@ -28,6 +29,7 @@ class PolicyObjective:
 
     """
     REQUIRES_PROPENSITIES = None
+    REQUIRES_ADVANTAGES = True
 
     def __init__(self, pi, optimizer=None, regularizer=None):
         if not isinstance(pi, Policy):
@@ -219,3 +221,35 @@ class PolicyObjective:
         return self._grad_and_metrics_func(
             self._pi.params, self._pi.function_state, self.hyperparams, self._pi.rng,
             transition_batch, Adv)
+
+    def warmup(self, batch_sizes=(32,)):
+        r"""
+
+        Compile the gradient computation and the parameter update ahead of time (AOT).
+
+        Parameters
+        ----------
+        batch_sizes : sequence of positive ints, optional
+
+            The sizes of the transition batches to compile for.
+
+        Returns
+        -------
+        report : dict
+
+            The compile time (in seconds) per function and batch size.
+
+        """
+        rng = jax.random.PRNGKey(0)  # dummy key, so that warmup doesn't advance self._pi.rng
+        report = {}
+        for batch_size in batch_sizes:
+            transition_batch = get_transition_batch(
+                self._pi, batch_size, random_seed=self._pi.random_seed)
+            Adv = onp.zeros(batch_size) if self.REQUIRES_ADVANTAGES else None
+            report[f'grads_and_metrics[batch_size={batch_size}]'] = \
+                self._grad_and_metrics_func.warmup(
+                    self._pi.params, self._pi.function_state, self.hyperparams, rng,
+                    transition_batch, Adv)
+        report['apply_grads'] = self._apply_grads_func.warmup(
+            self.optimizer, self.optimizer_state, self._pi.params, self._pi.params)
+        return report
@@ -58,6 +58,7 @@ class DeterministicPG(PolicyObjective):
 
     """
     REQUIRES_PROPENSITIES = False
+    REQUIRES_ADVANTAGES = False
 
     def __init__(self, pi, q_targ, optimizer=None, regularizer=None):
         if not is_qfunction(q_targ):
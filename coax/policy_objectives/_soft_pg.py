@@ -8,6 +8,7 @@ from ..utils import is_qfunction, is_stochastic
 
 
 class SoftPG(PolicyObjective):
+    REQUIRES_ADVANTAGES = False
 
     def __init__(self, pi, q_targ_list, optimizer=None, regularizer=None):
         super().__init__(pi, optimizer=optimizer, regularizer=regularizer)
@@ -5,7 +5,7 @@ from optax import sgd
 
 from .._base.test_case import TestCase
 from .._core.policy import Policy
-from ..utils import tree_ravel
+from ..utils import tree_ravel, get_transition_batch, enable_jit_profiling, disable_jit_profiling
 from ..regularizers import EntropyRegularizer, KLDivRegularizer
 from ._vanilla_pg import VanillaPG
 
@@ -135,3 +135,23 @@ class TestVanillaPG(TestCase):
 
         self.assertPytreeNotEqual(function_state, pi.function_state)
         self.assertPytreeNotEqual(params, pi.params)
+
+    def test_warmup(self):
+        env = self.env_discrete
+        pi = Policy(self.func_pi_discrete, env, random_seed=11)
+        updater = VanillaPG(pi, optimizer=sgd(1.0))
+        report = updater.warmup(batch_sizes=(11,))
+        self.assertEqual(set(report), {'grads_and_metrics[batch_size=11]', 'apply_grads'})
+
+        # warmup doesn't consume any random keys
+        self.assertArrayAlmostEqual(pi.rng, Policy(self.func_pi_discrete, env, random_seed=11).rng)
+
+        # the first update doesn't need to retrace
+        transitions = get_transition_batch(env, batch_size=11, random_seed=42)
+        enable_jit_profiling()
+        try:
+            updater.update(transitions, Adv=transitions.Rn)
+        finally:
+            disable_jit_profiling()
+        self.assertEqual(updater._grad_and_metrics_func._num_traces, 0)
+        self.assertEqual(updater._apply_grads_func._num_traces, 0)
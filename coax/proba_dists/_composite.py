@@ -4,6 +4,7 @@ import gymnasium
 import numpy as onp
 import haiku as hk
 import jax
+import jax.numpy as jnp
 
 from ..utils import jit
 from ._base import BaseProbaDist
@@ -241,9 +242,12 @@ class ProbaDist(BaseProbaDist):
 
         if isinstance(self.space, (gymnasium.spaces.MultiDiscrete, gymnasium.spaces.MultiBinary)):
             assert self._structure_type == StructureType.LIST
-            return onp.stack([
+            X = [
                 dist.postprocess_variate(next(rngs), X[i], index=index, batch_mode=batch_mode)
-                for i, dist in enumerate(self._structure)], axis=-1)
+                for i, dist in enumerate(self._structure)]
+            # only stack with jax.numpy when tracing, e.g. inside a policy's act_func
+            traced = any(isinstance(x, jax.core.Tracer) for x in X)
+            return (jnp.stack if traced else onp.stack)(X, axis=-1)
 
         if isinstance(self.space, gymnasium.spaces.Tuple):
             assert self._structure_type == StructureType.LIST
@@ -91,16 +91,15 @@ class NStepEntropyRegularizer(EntropyRegularizer):
                                                state, next(rngs),
                                                self.f.observation_preprocessor(
                                                    next(rngs), s_next), True)
-                    n_states = transition_batch.extra_info['states']
-                    dist_params, _ = jax.vmap(f)(jax.tree_util.tree_map(
-                        lambda *t: jnp.stack(t), *n_states))
-                    dist_params = jax.tree_util.tree_map(
-                        lambda t: jnp.take(t, self._n, axis=0), dist_params)
+                    # layout: [batch, n+1, ...] -> [len(n), batch, ...]
+                    n_states = jax.tree_util.tree_map(
+                        lambda t: jnp.swapaxes(jnp.take(t, self._n, axis=1), 0, 1),
+                        transition_batch.extra_info['states'])
+                    dist_params, _ = jax.vmap(f)(n_states)
                 else:
                     raise TypeError(
                         "f must be derived from BaseStochasticFuncType2")
-                dones = jnp.stack(transition_batch.extra_info['dones'])
-                dones = jnp.take(dones, self._n, axis=0)
+                dones = jnp.take(transition_batch.extra_info['dones'], self._n, axis=1).T
 
                 return self.function(dist_params,
                                      dones,
@@ -6,7 +6,9 @@ Reward Tracing
     :nosignatures:
 
     coax.reward_tracing.NStep
+    coax.reward_tracing.VectorNStep
     coax.reward_tracing.MonteCarlo
+    coax.reward_tracing.GAE
     coax.reward_tracing.TransitionBatch
 
 ----
@@ -46,7 +48,9 @@ Object Reference
 ----------------
 
 .. autoclass:: coax.reward_tracing.NStep
+.. autoclass:: coax.reward_tracing.VectorNStep
 .. autoclass:: coax.reward_tracing.MonteCarlo
+.. autoclass:: coax.reward_tracing.GAE
 .. autoclass:: coax.reward_tracing.TransitionBatch
 
 """
@@ -54,9 +58,13 @@ Object Reference
 from ._transition import TransitionBatch
 from ._montecarlo import MonteCarlo
 from ._nstep import NStep
+from ._vector_nstep import VectorNStep
+from ._gae import GAE
 
 __all__ = (
     'TransitionBatch',
     'MonteCarlo',
     'NStep',
+    'VectorNStep',
+    'GAE',
 )
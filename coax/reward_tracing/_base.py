@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 
 import jax
 import numpy as onp
+from scipy.signal import lfilter
 
 from .._base.errors import InsufficientCacheError
 
@@ -91,3 +92,18 @@ class BaseRewardTracer(ABC):
             transitions.append(self.pop())
 
         return jax.tree_map(lambda *leaves: onp.concatenate(leaves, axis=0), *transitions)
+
+
+def _stack(items):
+    """ stack a sequence of pytrees with the same structure into a single pytree of arrays """
+    return jax.tree_map(lambda *leaves: onp.stack(leaves, axis=0), *items)
+
+
+def _discounted_sum(r, gamma, n=None):
+    """ reverse discounted cumulative sum along axis=0, truncated after n terms if n is given """
+    r = onp.asarray(r, dtype='float64')
+    if n is None:
+        b, a = [1.], [1., -gamma]                      # IIR: G[t] = r[t] + gamma * G[t+1]
+    else:
+        b, a = onp.power(gamma, onp.arange(n)), [1.]  # FIR: Rn[t] = sum_k gamma^k r[t+k]
+    return lfilter(b, a, r[::-1], axis=0)[::-1]
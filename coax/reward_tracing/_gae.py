@@ -0,0 +1,167 @@
+from collections import deque
+from itertools import islice
+
+import jax
+import jax.numpy as jnp
+import numpy as onp
+import haiku as hk
+
+from .._base.errors import InsufficientCacheError
+from ..utils import is_vfunction, is_stochastic, jit
+from ._base import BaseRewardTracer, _stack
+from ._transition import TransitionBatch
+
+
+__all__ = (
+    'GAE',
+)
+
+
+class GAE(BaseRewardTracer):
+    r"""
+    A cache for generalized advantage estimation (GAE) and :math:`\lambda`-returns over
+    fixed-length rollout segments.
+
+    The tracer collects a segment of :code:`segment_length` consecutive transitions, which may span
+    multiple episodes. Once the next state is available as well, the state values of the entire
+    segment (including the bootstrap state) are computed in a single batched call to the value
+    function. The advantages are then computed in one backward pass:
+
+    .. math::
+
+        \delta_t\ &=\ R_t + \gamma\,(1 - D_t)\,v(S_{t+1}) - v(S_t) \\
+        \mathcal{A}_t\ &=\ \delta_t + \gamma\lambda\,(1 - D_t)\,\mathcal{A}_{t+1}
+
+    where :math:`D_t` indicates whether the episode ended at time step :math:`t`. The
+    :math:`\lambda`-returns are given by :math:`G^\lambda_t=\mathcal{A}_t + v(S_t)`.
+
+    The resulting :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` holds the
+    advantages in its ``Adv`` field and the :math:`\lambda`-returns in its ``Rn`` field, with
+    bootstrap factors ``In=0``. This means that a value function is updated towards the
+    :math:`\lambda`-returns by :class:`SimpleTD <coax.td_learning.SimpleTD>`, while a policy
+    objective can use the advantages directly:
+
+    .. code::
+
+        tracer = coax.reward_tracing.GAE(v, segment_length=128, gamma=0.99, lambda_=0.95)
+
+        ...
+        tracer.add(s, a, r, done, logp)
+        if tracer:
+            transition_batch = tracer.pop()
+            simple_td.update(transition_batch)
+            ppo_clip.update(transition_batch, transition_batch.Adv)
+
+    Parameters
+    ----------
+    v : V
+
+        The state value function :math:`v(s)` that is used to compute the advantages. The current
+        parameters of :code:`v` are used at the moment the segment is popped.
+
+    segment_length : positive int
+
+        The number of transitions in a rollout segment.
+
+    gamma : float between 0 and 1
+
+        The amount by which to discount future rewards.
+
+    lambda_ : float between 0 and 1, optional
+
+        The trace-decay parameter :math:`\lambda`. Setting :math:`\lambda=0` yields one-step TD
+        errors as advantages, while :math:`\lambda=1` yields Monte Carlo advantages.
+
+    """
+    def __init__(self, v, segment_length, gamma, lambda_=0.95):
+        if not is_vfunction(v) or is_stochastic(v):
+            raise TypeError(f"v must be a (non-stochastic) state value function, got: {type(v)}")
+        if not (isinstance(segment_length, int) and segment_length > 0):
+            raise TypeError(f"segment_length must be a positive int, got: {segment_length}")
+        if not (isinstance(lambda_, (float, int)) and 0 <= lambda_ <= 1):
+            raise TypeError(f"lambda_ must be a float in the unit interval [0, 1], got: {lambda_}")
+
+        self.v = v
+        self.segment_length = segment_length
+        self.gamma = float(gamma)
+        self.lambda_ = float(lambda_)
+        self.reset()
+
+        def advantages_func(params, state, rng, S, R, D):
+            rngs = hk.PRNGSequence(rng)
+            S = self.v.observation_preprocessor(next(rngs), S)
+            V, _ = self.v.function(params, state, next(rngs), S, False)
+            V = self.v.value_transform.inverse_func(V)
+            continuation = self.gamma * (1. - D)
+            deltas = R + continuation * V[1:] - V[:-1]
+
+            def backward_step(Adv_next, x):
+                delta, c = x
+                Adv = delta + self.lambda_ * c * Adv_next
+                return Adv, Adv
+
+            _, Adv = jax.lax.scan(
+                backward_step, jnp.zeros_like(R[0]), (deltas, continuation), reverse=True)
+            return Adv, Adv + V[:-1]
+
+        self._advantages_func = jit(advantages_func)
+
+    def reset(self):
+        self._deque_s = deque([])
+        self._deque_r = deque([])
+        self._deque_d = deque([])
+
+    def add(self, s, a, r, done, logp=0.0, w=1.0):
+        self._deque_s.append((s, a, logp, w))
+        self._deque_r.append(r)
+        self._deque_d.append(bool(done))
+
+    def __len__(self):
+        return len(self._deque_s)
+
+    def __bool__(self):
+        return len(self) > self.segment_length  # we need S_{t+1} to bootstrap the last step
+
+    def pop(self):
+        r"""
+        Pop a full rollout segment from the cache.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object with
+            ``batch_size=segment_length``.
+
+        """
+        if not self:
+            raise InsufficientCacheError(
+                "cache needs to receive more transitions before it can be popped from")
+
+        n = self.segment_length
+        S, A, logP, W = _stack(islice(self._deque_s, n + 1))
+        R = onp.asarray(list(islice(self._deque_r, n)), dtype='float32')
+        D = onp.asarray(list(islice(self._deque_d, n)), dtype='float32')
+        Adv, G = self._advantages_func(
+            self.v.params, self.v.function_state, self.v.rng, S, R, D)
+
+        # keep the bootstrap state, it's the first state of the next segment
+        for _ in range(n):
+            self._deque_s.popleft()
+            self._deque_r.popleft()
+            self._deque_d.popleft()
+
+        S = jax.tree_map(lambda x: x[:n], S)
+        return TransitionBatch.from_arrays(
+            S=S,
+            A=A[:n],
+            logP=logP[:n],
+            Rn=G,
+            Done=True,        # no bootstrapping
+            gamma=self.gamma,
+            S_next=S,         # dummy values for *_next
+            A_next=A[:n],
+            logP_next=logP[:n],
+            W=onp.asarray(W[:n], dtype='float64'),
+            Adv=Adv,
+            validate=False)
@@ -0,0 +1,81 @@
+import gymnasium
+import haiku as hk
+import jax.numpy as jnp
+import numpy as onp
+import pytest
+from numpy.testing import assert_array_almost_equal
+
+from .._base.errors import InsufficientCacheError
+from .._core.v import V
+from ._gae import GAE
+
+
+def func_v(S, is_training):
+    return jnp.ravel(hk.Linear(1, w_init=hk.initializers.RandomNormal())(S))
+
+
+class TestGAE:
+    gamma = 0.9
+    segment_length = 8
+
+    @pytest.fixture
+    def v(self):
+        return V(func_v, gymnasium.make('CartPole-v1'), random_seed=13)
+
+    def episode(self):
+        rnd = onp.random.RandomState(7)
+        S = rnd.randn(20, 4).astype('float32')
+        A = rnd.randint(2, size=20)
+        R = rnd.randn(20)
+        D = onp.zeros(20, dtype='bool')
+        D[[3, 11]] = True  # the segments span multiple episodes
+        return S, A, R, D
+
+    def expected(self, v, S, R, D, lambda_):
+        V = onp.array([v(s) for s in S])
+        Adv = onp.zeros(self.segment_length)
+        Adv_next = 0.
+        for t in reversed(range(self.segment_length)):
+            c = self.gamma * (1 - D[t])
+            Adv[t] = Adv_next = R[t] + c * V[t + 1] - V[t] + lambda_ * c * Adv_next
+        return Adv, Adv + V[:-1]
+
+    @pytest.mark.parametrize('lambda_', [0., 0.8, 1.])
+    def test_pop(self, v, lambda_):
+        tracer = GAE(v, self.segment_length, gamma=self.gamma, lambda_=lambda_)
+        S, A, R, D = self.episode()
+        segments = []
+        for t in range(20):
+            tracer.add(S[t], A[t], R[t], D[t])
+            if tracer:
+                segments.append((t, tracer.pop()))
+                assert len(tracer) == 1
+
+        assert [t for t, _ in segments] == [8, 16]
+        for t, transition_batch in segments:
+            t0 = t - self.segment_length
+            seg = slice(t0, t + 1)
+            Adv, G = self.expected(v, S[seg], R[seg], D[seg], lambda_)
+            assert transition_batch.batch_size == self.segment_length
+            assert_array_almost_equal(transition_batch.S, S[t0:t])
+            assert_array_almost_equal(transition_batch.A, A[t0:t])
+            assert_array_almost_equal(transition_batch.Adv, Adv, decimal=5)
+            assert_array_almost_equal(transition_batch.Rn, G, decimal=5)
+            assert_array_almost_equal(transition_batch.In, onp.zeros(self.segment_length))
+
+    def test_insufficient(self, v):
+        tracer = GAE(v, self.segment_length, gamma=self.gamma)
+        S, A, R, D = self.episode()
+        for t in range(self.segment_length):
+            tracer.add(S[t], A[t], R[t], D[t])
+        assert not tracer
+        with pytest.raises(InsufficientCacheError):
+            tracer.pop()
+
+    def test_bad_args(self, v):
+        with pytest.raises(TypeError):
+            GAE(None, self.segment_length, gamma=self.gamma)
+        with pytest.raises(TypeError):
+            GAE(v, 0, gamma=self.gamma)
+        with pytest.raises(TypeError):
+            GAE(v, self.segment_length, gamma=self.gamma, lambda_=1.5)
@@ -1,5 +1,7 @@
+import numpy as onp
+
 from .._base.errors import InsufficientCacheError, EpisodeDoneError
-from ._base import BaseRewardTracer
+from ._base import BaseRewardTracer, _discounted_sum, _stack
 from ._transition import TransitionBatch
 
 
@@ -62,3 +64,32 @@ class MonteCarlo(BaseRewardTracer):
         return TransitionBatch.from_single(
             s=s, a=a, logp=logp, r=self._g, done=True, gamma=self.gamma,  # no bootstrapping
             s_next=s, a_next=a, logp_next=logp, w=w)                      # dummy values for *_next
+
+    def flush(self):
+        r"""
+        Flush all transitions from the cache.
+
+        Unlike repeated calls to :attr:`pop`, this stacks the cached transitions once and computes
+        all returns in a single vectorized pass. The transitions are in the same (reversed) order
+        as the ones obtained from repeated calls to :attr:`pop`.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        if not self:
+            raise InsufficientCacheError(
+                "cache needs to receive more transitions before it can be flushed")
+
+        S, A, R, logP, W = _stack(self._list[::-1])
+        G = _discounted_sum(R[::-1], self.gamma)[::-1]
+        self._list = []
+        self._g = G[-1]
+
+        return TransitionBatch.from_arrays(
+            S=S, A=A, logP=logP, Rn=G, Done=True, gamma=self.gamma,  # no bootstrapping
+            S_next=S, A_next=A, logP_next=logP,                        # dummy values for *_next
+            W=onp.asarray(W, dtype='float64'), validate=False)
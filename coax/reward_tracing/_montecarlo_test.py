@@ -7,6 +7,7 @@ from numpy.testing import assert_array_almost_equal
 
 from .._base.errors import InsufficientCacheError
 from ..utils import check_array
+from ._base import BaseRewardTracer
 from ._montecarlo import MonteCarlo
 
 
@@ -96,3 +97,15 @@ class TestMonteCarlo:
         assert_array_almost_equal(transitions.A, self.A[::-1])
         assert_array_almost_equal(transitions.Rn, self.G[::-1])
         assert_array_almost_equal(transitions.In, jnp.zeros(i))
+
+    def test_flush_consistent_with_pop(self):
+        cache1, cache2 = MonteCarlo(self.gamma), MonteCarlo(self.gamma)
+        for s, a, r, done in self.episode:
+            cache1.add(s, a, r, done, logp=-0.1 * a)
+            cache2.add(s, a, r, done, logp=-0.1 * a)
+
+        transitions = cache1.flush()
+        expected = BaseRewardTracer.flush(cache2)  # pops one at a time
+        assert not cache1 and not cache2
+        transitions.idx = expected.idx  # from_single sets idx=0
+        assert transitions == expected
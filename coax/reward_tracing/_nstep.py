@@ -1,10 +1,11 @@
 from collections import deque
 from itertools import islice
 
+import jax
 import numpy as onp
 
 from .._base.errors import InsufficientCacheError, EpisodeDoneError
-from ._base import BaseRewardTracer
+from ._base import BaseRewardTracer, _discounted_sum, _stack
 from ._transition import TransitionBatch
 
 
@@ -31,6 +32,8 @@ class NStep(BaseRewardTracer):
 
         Store all states, actions and rewards in the `extra_info` field
         of the `TransitionBatch`, e.g. for :code:`coax.regularizers.NStepEntropyRegularizer`.
+        The `extra_info` field is a dict of arrays with layout :code:`[batch, n+1, ...]`. Time
+        steps beyond the end of the episode repeat the last step and are marked as done.
     """
 
     def __init__(self, n, gamma, record_extra_info=False):
@@ -66,13 +69,15 @@ class NStep(BaseRewardTracer):
             raise InsufficientCacheError(
                 "cache needs to receive more transitions before it can be popped from")
 
+        extra_info = self._extra_info(1) if self.record_extra_info else None
+
         # pop state-action (propensities) pair
         s, a, logp, w = self._deque_s.popleft()
 
         # n-step partial return
         zipped = zip(self._gammas, self._deque_r)
         rn = sum(x * r for x, r in islice(zipped, self.n))
-        r = self._deque_r.popleft()
+        self._deque_r.popleft()
 
         # keep in mind that we've already popped (s, a, logp)
         if len(self) >= self.n:
@@ -82,45 +87,73 @@ class NStep(BaseRewardTracer):
             # no more bootstrapping
             s_next, a_next, logp_next, done = s, a, logp, True
 
-        extra_info = self._extra_info(
-            s, a, r, len(self) == 0, logp, w) if self.record_extra_info else None
-
-        return TransitionBatch.from_single(
+        transition_batch = TransitionBatch.from_single(
             s=s, a=a, logp=logp, r=rn, done=done, gamma=self._gamman,
-            s_next=s_next, a_next=a_next, logp_next=logp_next, w=w, extra_info=extra_info)
-
-    def _extra_info(self, s, a, r, done, logp, w):
-        last_s = s
-        last_a = a
-        last_r = r
-        last_done = done
-        last_logp = logp
-        last_w = w
-        states = []
-        actions = []
-        rewards = []
-        dones = []
-        log_props = []
-        weights = []
-        for i in range(self.n + 1):
-            states.append(last_s)
-            actions.append(last_a)
-            rewards.append(last_r)
-            dones.append(last_done)
-            log_props.append(last_logp)
-            weights.append(last_w)
-            if i < len(self._deque_s):
-                last_s, last_a, last_logp, last_w = self._deque_s[i]
-                last_r = self._deque_r[i]
-                if done or (i == len(self._deque_s) - 1 and self._done):
-                    last_done = True
-                else:
-                    last_done = False
-            else:
-                last_done = True
-        assert len(states) == len(actions) == len(
-            rewards) == len(dones) == len(log_props) == len(weights) == self.n + 1
-        extra_info = {'states': states, 'actions': actions,
-                      'rewards': rewards, 'dones': dones,
-                      'log_props': log_props, 'weights': weights}
-        return {k: tuple(v) for k, v in extra_info.items()}
+            s_next=s_next, a_next=a_next, logp_next=logp_next, w=w)
+        transition_batch.extra_info = extra_info
+        return transition_batch
+
+    def flush(self):
+        r"""
+        Flush all transitions from the cache.
+
+        Unlike repeated calls to :attr:`pop`, this stacks the cached transitions once and computes
+        all :math:`n`-step returns in a single vectorized pass.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        if not self:
+            raise InsufficientCacheError(
+                "cache needs to receive more transitions before it can be flushed")
+        num_cached = len(self)
+        num_flushed = num_cached if self._done else num_cached - self.n
+        extra_info = self._extra_info(num_flushed) if self.record_extra_info else None
+        S, A, logP, W = _stack(self._deque_s)
+        Rn = _discounted_sum(self._deque_r, self.gamma, self.n)
+
+        # bootstrap from S_{t+n} if it's in the cache, otherwise use dummy values for *_next
+        t = onp.arange(num_flushed)
+        bootstrap = t + self.n < num_cached
+        t_next = onp.where(bootstrap, t + self.n, t)
+
+        self._deque_s = deque(islice(self._deque_s, num_flushed, None))
+        self._deque_r = deque(islice(self._deque_r, num_flushed, None))
+
+        return TransitionBatch.from_arrays(
+            S=jax.tree_map(lambda x: x[:num_flushed], S),
+            A=A[:num_flushed],
+            logP=logP[:num_flushed],
+            Rn=Rn[:num_flushed],
+            Done=~bootstrap,
+            gamma=self._gamman,
+            S_next=jax.tree_map(lambda x: x[t_next], S),
+            A_next=A[t_next],
+            logP_next=logP[t_next],
+            W=onp.asarray(W[:num_flushed], dtype='float64'),
+            extra_info=extra_info,
+            validate=False)
+
+    def _extra_info(self, num_transitions):
+        """ the n-step windows of the first few cached transitions, layout: [batch, n+1, ...] """
+        num_cached = len(self)
+        num_window = min(num_cached, num_transitions + self.n)
+        S, A, logP, W = _stack(islice(self._deque_s, num_window))
+        R = onp.asarray(list(islice(self._deque_r, num_window)))
+
+        # pad windows beyond the end of the cache by repeating the last cached step
+        t = onp.arange(num_transitions)[:, None] + onp.arange(self.n + 1)
+        j = onp.minimum(t, num_window - 1)
+        dones = (t > num_cached - 1) | ((t == num_cached - 1) & self._done)
+
+        return {
+            'states': jax.tree_map(lambda x: x[j], S),
+            'actions': jax.tree_map(lambda x: x[j], A),
+            'rewards': R[j],
+            'dones': dones,
+            'log_props': logP[j],
+            'weights': W[j]}
@@ -7,6 +7,7 @@ from numpy.testing import assert_array_almost_equal
 
 from .._base.errors import InsufficientCacheError, EpisodeDoneError
 from ..utils import check_array
+from ._base import BaseRewardTracer
 from ._nstep import NStep
 
 
@@ -223,6 +224,22 @@ class TestNStep:
                 assert transition.A_next == self.A[i + self.n]
             i += 1
 
+    @pytest.mark.parametrize('done', [False, True])
+    def test_flush_consistent_with_pop(self, done):
+        cache1, cache2 = NStep(self.n, gamma=self.gamma), NStep(self.n, gamma=self.gamma)
+        for s, a, r, _ in self.episode:
+            cache1.add({'s': s}, a, r, False, logp=-0.1 * a, w=0.5)
+            cache2.add({'s': s}, a, r, False, logp=-0.1 * a, w=0.5)
+        cache1.add({'s': s}, a, r, done)
+        cache2.add({'s': s}, a, r, done)
+
+        transitions = cache1.flush()
+        expected = BaseRewardTracer.flush(cache2)  # pops one at a time
+        assert transitions.batch_size == (14 if done else 14 - self.n)
+        assert len(cache1) == len(cache2) == (0 if done else self.n)
+        transitions.idx = expected.idx  # from_single sets idx=0
+        assert transitions == expected
+
     def test_flush_insufficient(self):
         cache = NStep(self.n, gamma=self.gamma)
         for i, (s, a, r, done) in islice(enumerate(self.episode, 1), 4):
@@ -249,10 +266,13 @@ class TestNStep:
 
         transitions = cache.flush()
         assert type(transitions.extra_info) == dict
-        states = jnp.stack(transitions.extra_info['states'])
-        actions = jnp.stack(transitions.extra_info['actions'])
-        assert_array_almost_equal(states[0], transitions.S)
-        assert_array_almost_equal(actions[0], transitions.A)
+        states = transitions.extra_info['states']
+        actions = transitions.extra_info['actions']
+        assert states.shape == actions.shape == (13, self.n + 1)
+        assert_array_almost_equal(states[:, 0], transitions.S)
+        assert_array_almost_equal(actions[:, 0], transitions.A)
+        assert_array_almost_equal(states[:-self.n, self.n], transitions.S_next[:-self.n])
+        assert_array_almost_equal(states[-1], [12] * (self.n + 1))  # padded with the last step
 
     def test_extra_info_dones(self):
         cache = NStep(self.n, gamma=self.gamma, record_extra_info=True)
@@ -266,6 +286,21 @@ class TestNStep:
         assert cache
         transitions = cache.flush()
         assert type(transitions.extra_info) == dict
-        dones = jnp.stack(transitions.extra_info['dones'])
+        dones = transitions.extra_info['dones']
         for i in range(self.n + 2):
-            assert dones[:, i].sum() == i
+            assert dones[i].sum() == i
+
+    @pytest.mark.parametrize('done', [False, True])
+    def test_extra_info_flush_consistent_with_pop(self, done):
+        cache1 = NStep(self.n, gamma=self.gamma, record_extra_info=True)
+        cache2 = NStep(self.n, gamma=self.gamma, record_extra_info=True)
+        for s, a, r, _ in self.episode:
+            cache1.add(s, a, r, False)
+            cache2.add(s, a, r, False)
+        cache1.add(s, a, r, done)
+        cache2.add(s, a, r, done)
+
+        transitions = cache1.flush()
+        expected = BaseRewardTracer.flush(cache2)  # pops one at a time
+        transitions.idx = expected.idx
+        assert transitions == expected
@@ -1,5 +1,3 @@
-from functools import partial
-
 import jax
 import jax.numpy as jnp
 import numpy as onp
@@ -77,12 +75,17 @@ class TransitionBatch(CopyMixin):
         transition. For example, we need these values when we sample transitions from a
         :class:`PrioritizedReplayBuffer <coax.experience_replay.PrioritizedReplayBuffer>`.
 
+    Adv : ndarray, optional
+
+        A batch of advantage estimates :math:`\mathcal{A}(S_t, A_t)`. For example, these are
+        provided by the :class:`GAE <coax.reward_tracing.GAE>` tracer.
+
     """
     __slots__ = ('S', 'A', 'logP', 'Rn', 'In', 'S_next',
-                 'A_next', 'logP_next', 'W', 'idx', 'extra_info')
+                 'A_next', 'logP_next', 'W', 'idx', 'extra_info', 'Adv')
 
     def __init__(self, S, A, logP, Rn, In, S_next, A_next=None, logP_next=None, W=None, idx=None,
-                 extra_info=None):
+                 extra_info=None, Adv=None):
 
         self.S = S
         self.A = A
@@ -95,6 +98,7 @@ class TransitionBatch(CopyMixin):
         self.W = onp.ones_like(Rn) if W is None else W
         self.idx = onp.arange(Rn.shape[0], dtype='int32') if idx is None else idx
         self.extra_info = extra_info
+        self.Adv = Adv
 
     @classmethod
     def from_single(
@@ -182,10 +186,168 @@ class TransitionBatch(CopyMixin):
             extra_info=_single_to_batch(extra_info) if extra_info is not None else None
         )
 
+    @classmethod
+    def from_arrays(
+            cls, S, A, logP, Rn, Done, gamma, S_next=None, A_next=None, logP_next=None, W=None,
+            idx=None, extra_info=None, Adv=None, validate=True):
+        r"""
+
+        Create a TransitionBatch from arrays that already have a leading batch axis.
+
+        This is the bulk counterpart of :attr:`from_single`. The arguments are converted to numpy
+        arrays without copying them (unless they live on a device) and the bootstrap factors are
+        computed in one go, i.e. :math:`I_t=\gamma\,(1 - D_t)`.
+
+        Attributes
+        ----------
+        S : pytree with ndarray leaves
+
+            A batch of state observations :math:`S_t`.
+
+        A : pytree with ndarray leaves
+
+            A batch of actions :math:`A_t`.
+
+        logP : ndarray
+
+            A batch of log-propensities :math:`\log\pi(A_t|S_t)`.
+
+        Rn : ndarray
+
+            A batch of partial returns :math:`R^{(n)}_t`.
+
+        Done : bool or ndarray of bools
+
+            Whether to bootstrap, i.e. whether :math:`S_{t+n}` is a terminal state. A single bool
+            applies to the entire batch.
+
+        gamma : float between 0 and 1
+
+            The bootstrap factor that applies when :code:`Done` is False, e.g. :math:`\gamma^n`.
+
+        S_next : pytree with ndarray leaves, optional
+
+            A batch of next-state observations :math:`S_{t+n}`.
+
+        A_next : pytree with ndarray leaves, optional
+
+            A batch of next-actions :math:`A_{t+n}`.
+
+        logP_next : ndarray, optional
+
+            A batch of log-propensities :math:`\log\pi(A_{t+n}|S_{t+n})`.
+
+        W : ndarray, optional
+
+            A batch of importance weights.
+
+        idx : ndarray, optional
+
+            A batch of transition identifiers.
+
+        extra_info : pytree with ndarray leaves, optional
+
+            Some additional info about each transition.
+
+        Adv : ndarray, optional
+
+            A batch of advantage estimates.
+
+        validate : bool, optional
+
+            Whether to check the batch sizes and the values of :code:`logP`, :code:`logP_next`,
+            :code:`gamma` and :code:`W`. Callers that construct the arrays themselves, e.g. reward
+            tracers and replay buffers, may skip these checks.
+
+        """
+        Rn = onp.asarray(Rn)
+        batch_size = Rn.shape[0]
+        Done = onp.broadcast_to(onp.asarray(Done, dtype='float64'), (batch_size,))
+        In = float(gamma) * (1. - Done)
+        transition_batch = cls(
+            S=jax.tree_map(onp.asarray, S),
+            A=jax.tree_map(onp.asarray, A),
+            logP=onp.asarray(logP),
+            Rn=Rn,
+            In=In,
+            S_next=jax.tree_map(onp.asarray, S_next),
+            A_next=jax.tree_map(onp.asarray, A_next),
+            logP_next=None if logP_next is None else onp.asarray(logP_next),
+            W=None if W is None else onp.asarray(W),
+            idx=None if idx is None else onp.asarray(idx),
+            extra_info=jax.tree_map(onp.asarray, extra_info),
+            Adv=None if Adv is None else onp.asarray(Adv))
+
+        if validate:
+            if not (isinstance(gamma, (float, int)) and 0 <= gamma <= 1):
+                raise TypeError(f"gamma must be a float in the unit interval [0, 1], got: {gamma}")
+            if not onp.all(transition_batch.logP <= 0):
+                raise TypeError("logP must be non-positive")
+            if not (logP_next is None or onp.all(transition_batch.logP_next <= 0)):
+                raise TypeError("logP_next must be None or non-positive")
+            if not onp.all(transition_batch.W > 0):
+                raise TypeError("W must be positive")
+            for k, v in transition_batch.items():
+                leaves = jax.tree_util.tree_leaves(v)
+                if any(onp.shape(leaf)[:1] != (batch_size,) for leaf in leaves):
+                    raise ValueError(
+                        f"all leaves of field '{k}' must have a leading axis of size {batch_size}")
+
+        return transition_batch
+
     @property
     def batch_size(self):
         return onp.shape(self.Rn)[0]
 
+    def take(self, indices):
+        r"""
+
+        Gather a subset of the transitions.
+
+        Parameters
+        ----------
+        indices : 1d array of ints
+
+            The rows to gather.
+
+        Returns
+        -------
+        transition_batch : TransitionBatch
+
+            A new :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object whose leaves
+            are copies.
+
+        """
+        indices = onp.asarray(indices)
+        return jax.tree_map(lambda leaf: leaf[indices], self)
+
+    def slice(self, start, stop=None):
+        r"""
+
+        Get a contiguous range of transitions.
+
+        Parameters
+        ----------
+        start : int
+
+            The first row of the range. Negative values count from the end of the batch.
+
+        stop : int, optional
+
+            The end of the range (exclusive). If left unspecified, the range extends to the end of
+            the batch.
+
+        Returns
+        -------
+        transition_batch : TransitionBatch
+
+            A new :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object whose numpy
+            leaves are views, i.e. no data is copied.
+
+        """
+        s = slice(start, stop)
+        return jax.tree_map(lambda leaf: leaf[s], self)
+
     def to_singles(self):
         r"""
 
@@ -205,12 +367,8 @@ class TransitionBatch(CopyMixin):
             yield self
             return  # break out of generator
 
-        def lookup(i, pytree):
-            s = slice(i, i + 1)  # ndim-preserving lookup
-            return jax.tree_map(lambda leaf: leaf[s], pytree)
-
         for i in range(self.batch_size):
-            yield TransitionBatch(*map(partial(lookup, i), self))
+            yield self.slice(i, i + 1)  # ndim-preserving lookup
 
     def items(self):
         for k in self.__slots__:
@@ -0,0 +1,70 @@
+import jax
+import numpy as onp
+import pytest
+
+from ._transition import TransitionBatch
+
+
+def make_arrays(batch_size=5):
+    rnd = onp.random.RandomState(13)
+    return dict(
+        S={'x': rnd.randn(batch_size, 3), 'y': rnd.randint(4, size=batch_size)},
+        A=rnd.randint(2, size=batch_size),
+        logP=-rnd.rand(batch_size),
+        Rn=rnd.randn(batch_size),
+        Done=rnd.rand(batch_size) < 0.5,
+        S_next={'x': rnd.randn(batch_size, 3), 'y': rnd.randint(4, size=batch_size)},
+        A_next=rnd.randint(2, size=batch_size),
+        logP_next=-rnd.rand(batch_size),
+        W=rnd.rand(batch_size) + 0.5,
+    )
+
+
+def test_from_arrays_consistent_with_from_single():
+    arrays = make_arrays()
+    transition_batch = TransitionBatch.from_arrays(**arrays, gamma=0.9)
+    singles = [
+        TransitionBatch.from_single(
+            s=jax.tree_map(lambda x: x[i], arrays['S']), a=arrays['A'][i],
+            logp=arrays['logP'][i], r=arrays['Rn'][i], done=bool(arrays['Done'][i]), gamma=0.9,
+            s_next=jax.tree_map(lambda x: x[i], arrays['S_next']), a_next=arrays['A_next'][i],
+            logp_next=arrays['logP_next'][i], w=float(arrays['W'][i]), idx=i)
+        for i in range(5)]
+    expected = jax.tree_map(lambda *leaves: onp.concatenate(leaves, axis=0), *singles)
+    assert transition_batch == expected
+
+
+def test_from_arrays_validate():
+    arrays = make_arrays()
+    with pytest.raises(TypeError):
+        TransitionBatch.from_arrays(**arrays, gamma=1.5)
+    with pytest.raises(TypeError):
+        TransitionBatch.from_arrays(**{**arrays, 'logP': -arrays['logP']}, gamma=0.9)
+    with pytest.raises(TypeError):
+        TransitionBatch.from_arrays(**{**arrays, 'W': -arrays['W']}, gamma=0.9)
+    with pytest.raises(ValueError):
+        TransitionBatch.from_arrays(**{**arrays, 'A': arrays['A'][:3]}, gamma=0.9)
+
+    # the checks are skipped on request
+    transition_batch = TransitionBatch.from_arrays(
+        **{**arrays, 'W': -arrays['W']}, gamma=0.9, validate=False)
+    assert onp.all(transition_batch.W < 0)
+
+
+def test_take():
+    transition_batch = TransitionBatch.from_arrays(**make_arrays(), gamma=0.9)
+    subset = transition_batch.take([4, 0, 0])
+    assert subset.batch_size == 3
+    onp.testing.assert_array_equal(subset.idx, [4, 0, 0])
+    onp.testing.assert_array_equal(subset.S['x'], transition_batch.S['x'][[4, 0, 0]])
+    assert subset.extra_info is None and subset.Adv is None
+
+
+def test_slice():
+    transition_batch = TransitionBatch.from_arrays(**make_arrays(), gamma=0.9)
+    chunk = transition_batch.slice(1, 3)
+    assert chunk.batch_size == 2
+    onp.testing.assert_array_equal(chunk.idx, [1, 2])
+    assert onp.shares_memory(chunk.S['x'], transition_batch.S['x'])  # views, not copies
+    assert transition_batch.slice(-2).batch_size == 2
+    assert [t.idx[0] for t in transition_batch.to_singles()] == [0, 1, 2, 3, 4]
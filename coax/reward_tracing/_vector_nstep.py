@@ -0,0 +1,196 @@
+import jax
+import numpy as onp
+
+from .._base.errors import InsufficientCacheError
+from ._base import BaseRewardTracer
+from ._transition import TransitionBatch
+
+
+__all__ = (
+    'VectorNStep',
+)
+
+
+class VectorNStep(BaseRewardTracer):
+    r"""
+    A short-term cache for :math:`n`-step bootstrapping, for a batch of environments that are
+    stepped in lockstep, e.g. a :class:`gymnasium.vector.VectorEnv`.
+
+    This is the batched counterpart of :class:`NStep <coax.reward_tracing.NStep>`. Each call to
+    :attr:`add` takes one time step of all environments, where every argument has a leading axis of
+    size :code:`num_envs`. The last :math:`n` steps of each environment are kept in a fixed ring of
+    arrays, and the transitions that are ready after each time step are returned as a single
+    :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` by :attr:`pop`.
+
+    Episodes end independently for each environment. When :code:`Done[i]` is True, all cached
+    transitions of environment :code:`i` are released without bootstrapping and the next call to
+    :attr:`add` starts a new episode for that environment. This matches the autoreset behavior of
+    :class:`gymnasium.vector.VectorEnv`.
+
+    Example
+    -------
+
+    .. code::
+
+        env = gymnasium.vector.make('CartPole-v1', num_envs=64)
+        tracer = coax.reward_tracing.VectorNStep(n=3, gamma=0.99)
+
+        S, info = env.reset()
+        for t in range(...):
+            A, logP = pi.batch(S, return_logp=True)  # one action per env
+            S_next, R, terminated, truncated, info = env.step(A)
+            tracer.add(S, A, R, terminated | truncated, logP)
+            if tracer:
+                buffer.add(tracer.pop())
+            S = S_next
+
+    Parameters
+    ----------
+    n : positive int
+
+        The number of steps over which to bootstrap.
+
+    gamma : float between 0 and 1
+
+        The amount by which to discount future rewards.
+
+    """
+    def __init__(self, n, gamma):
+        self.n = int(n)
+        self.gamma = float(gamma)
+        self.reset()
+
+    def reset(self):
+        self._ring = None   # allocated upon the first call to add(), leaves: (n, num_envs, ...)
+        self._count = None  # number of cached time steps per env
+        self._t = 0
+        self._ready = []
+        self._gammas = onp.power(self.gamma, onp.arange(self.n))
+        self._gamman = onp.power(self.gamma, self.n)
+        # truncated returns: G[i] = sum_{j>=i} gamma^(j-i) R[j], computed as G = discounts @ R
+        i, j = onp.meshgrid(onp.arange(self.n), onp.arange(self.n), indexing='ij')
+        self._discounts = onp.where(j >= i, onp.power(self.gamma, onp.maximum(j - i, 0)), 0.)
+
+    def add(self, S, A, R, Done, logP=0.0, W=1.0):
+        r"""
+        Add a batch of transitions (one per environment) to the experience cache.
+
+        Parameters
+        ----------
+        S : pytree with ndarray leaves
+
+            A batch of state observations, one for each environment.
+
+        A : ndarray
+
+            A batch of actions.
+
+        R : 1d array of floats
+
+            A batch of observed rewards.
+
+        Done : 1d array of bools
+
+            Whether the episode has finished, for each environment.
+
+        logP : 1d array of floats, optional
+
+            The log-propensities :math:`\log\pi(a|s)`.
+
+        W : 1d array of floats, optional
+
+            Sample weights associated with the given state-action pairs.
+
+        """
+        R = onp.asarray(R, dtype='float64')
+        Done = onp.asarray(Done, dtype='bool')
+        if R.ndim != 1 or Done.shape != R.shape:
+            raise ValueError(
+                f"R and Done must be 1d arrays of the same shape, got: {R.shape} and {Done.shape}")
+        num_envs = R.shape[0]
+        entry = {
+            'S': jax.tree_map(onp.asarray, S),
+            'A': onp.asarray(A),
+            'logP': onp.broadcast_to(onp.asarray(logP, dtype='float64'), (num_envs,)),
+            'W': onp.broadcast_to(onp.asarray(W, dtype='float64'), (num_envs,)),
+            'R': R}
+        if not all(onp.shape(leaf)[:1] == (num_envs,) for leaf in jax.tree_util.tree_leaves(entry)):
+            raise ValueError(f"all inputs must have the same leading axis, num_envs={num_envs}")
+
+        if self._ring is None:
+            self._ring = jax.tree_map(
+                lambda x: onp.zeros((self.n,) + x.shape, dtype=x.dtype), entry)
+            self._count = onp.zeros(num_envs, dtype='int64')
+        if self._count.shape != (num_envs,):
+            raise ValueError(f"expected num_envs={len(self._count)}, got: {num_envs}")
+
+        slot = self._t % self.n  # all envs write to the same slot
+
+        # envs with n cached steps: the oldest one can now be bootstrapped from the new state
+        full = onp.flatnonzero(self._count == self.n)
+        if full.size:
+            order = (slot + onp.arange(self.n)) % self.n  # chronological, oldest first
+            oldest = jax.tree_map(lambda x: x[slot, full], self._ring)
+            self._ready.append(TransitionBatch.from_arrays(
+                S=oldest['S'],
+                A=oldest['A'],
+                logP=oldest['logP'],
+                Rn=self._gammas @ self._ring['R'][order][:, full],
+                Done=False,
+                gamma=self._gamman,
+                S_next=jax.tree_map(lambda x: x[full], entry['S']),
+                A_next=entry['A'][full],
+                logP_next=entry['logP'][full],
+                W=oldest['W'],
+                validate=False))
+
+        jax.tree_map(lambda ring, x: ring.__setitem__(slot, x), self._ring, entry)
+        self._count = onp.minimum(self._count + 1, self.n)
+        self._t += 1
+
+        # envs whose episode ended: release all cached steps, without bootstrapping
+        done = onp.flatnonzero(Done)
+        if done.size:
+            order = (slot + 1 + onp.arange(self.n)) % self.n  # chronological, newest last
+            valid = onp.arange(self.n)[:, None] >= (self.n - self._count[done])[None, :]
+            G = self._discounts @ (self._ring['R'][order][:, done] * valid)
+            i, j = onp.nonzero(valid)
+            cached = jax.tree_map(lambda x: x[order[i], done[j]], self._ring)
+            self._ready.append(TransitionBatch.from_arrays(
+                S=cached['S'],
+                A=cached['A'],
+                logP=cached['logP'],
+                Rn=G[i, j],
+                Done=True,
+                gamma=self.gamma,
+                S_next=cached['S'],  # dummy values for *_next
+                A_next=cached['A'],
+                logP_next=cached['logP'],
+                W=cached['W'],
+                validate=False))
+            self._count[done] = 0
+
+    def __len__(self):
+        return sum(transition_batch.batch_size for transition_batch in self._ready)
+
+    def __bool__(self):
+        return bool(self._ready)
+
+    def pop(self):
+        r"""
+        Pop all transitions that are ready from the cache.
+
+        Returns
+        -------
+        transitions : TransitionBatch
+
+            A :class:`TransitionBatch <coax.reward_tracing.TransitionBatch>` object.
+
+        """
+        if not self:
+            raise InsufficientCacheError(
+                "cache needs to receive more transitions before it can be popped from")
+        ready, self._ready = self._ready, []
+        if len(ready) == 1:
+            return ready[0]
+        return jax.tree_map(lambda *leaves: onp.concatenate(leaves, axis=0), *ready)
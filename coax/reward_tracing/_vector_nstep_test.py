@@ -0,0 +1,81 @@
+import numpy as onp
+import pytest
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+from .._base.errors import InsufficientCacheError
+from ._nstep import NStep
+from ._vector_nstep import VectorNStep
+
+
+class TestVectorNStep:
+    gamma = 0.85
+    n = 3
+    num_envs = 4
+    num_steps = 30
+
+    def rollout(self):
+        rnd = onp.random.RandomState(13)
+        S = onp.arange(self.num_steps * self.num_envs).reshape(self.num_steps, self.num_envs)
+        A = rnd.randint(10, size=S.shape)
+        R = rnd.randn(*S.shape)
+        D = rnd.rand(*S.shape) < 0.15
+        D[:, 0] = False  # one env that never finishes
+        return S, A, R, D
+
+    def test_consistent_with_nstep(self):
+        S, A, R, D = self.rollout()
+        vector_tracer = VectorNStep(self.n, gamma=self.gamma)
+        tracers = [NStep(self.n, gamma=self.gamma) for _ in range(self.num_envs)]
+        expected, actual = [], []
+        for t in range(self.num_steps):
+            vector_tracer.add(S[t], A[t], R[t], D[t], logP=-0.1 * A[t])
+            if vector_tracer:
+                actual.append(vector_tracer.pop())
+            assert not vector_tracer
+            for i, tracer in enumerate(tracers):
+                tracer.add(S[t, i], A[t, i], R[t, i], D[t, i], logp=-0.1 * A[t, i])
+                while tracer:
+                    expected.append(tracer.pop())
+
+        assert sum(tb.batch_size for tb in actual) == len(expected)
+        expected = {int(tb.S[0]): tb for tb in expected}
+        for tb in actual:
+            for k, s in enumerate(tb.S):
+                e = expected.pop(int(s))
+                assert_array_equal(tb.A[k], e.A[0])
+                assert_array_almost_equal(tb.logP[k], e.logP[0])
+                assert_array_almost_equal(tb.Rn[k], e.Rn[0])
+                assert_array_almost_equal(tb.In[k], e.In[0])
+                if e.In[0] > 0:
+                    assert_array_equal(tb.S_next[k], e.S_next[0])
+                    assert_array_equal(tb.A_next[k], e.A_next[0])
+        assert not expected
+
+    def test_single_batch_per_step(self):
+        vector_tracer = VectorNStep(self.n, gamma=self.gamma)
+        S = {'x': onp.zeros((self.num_envs, 2)), 'y': onp.arange(self.num_envs)}
+        for t in range(self.n):
+            vector_tracer.add(S, onp.zeros(self.num_envs), onp.ones(self.num_envs), [False] * 4)
+        assert not vector_tracer
+
+        vector_tracer.add(S, onp.zeros(self.num_envs), onp.ones(self.num_envs), [0, 1, 0, 0])
+        assert len(vector_tracer) == self.num_envs + self.n
+        transition_batch = vector_tracer.pop()
+        assert transition_batch.batch_size == self.num_envs + self.n
+        assert transition_batch.S['x'].shape == (self.num_envs + self.n, 2)
+        assert_array_almost_equal(
+            transition_batch.In,
+            [self.gamma ** self.n] * self.num_envs + [0] * self.n)
+        assert_array_almost_equal(
+            transition_batch.Rn[-self.n:], [1 + self.gamma + self.gamma ** 2, 1 + self.gamma, 1])
+
+        with pytest.raises(InsufficientCacheError):
+            vector_tracer.pop()
+
+    def test_bad_num_envs(self):
+        vector_tracer = VectorNStep(self.n, gamma=self.gamma)
+        vector_tracer.add(onp.zeros(4), onp.zeros(4), onp.zeros(4), onp.zeros(4, dtype=bool))
+        with pytest.raises(ValueError):
+            vector_tracer.add(onp.zeros(3), onp.zeros(3), onp.zeros(3), onp.zeros(3, dtype=bool))
+        with pytest.raises(ValueError):
+            vector_tracer.add(onp.zeros(3), onp.zeros(4), onp.zeros(4), onp.zeros(4, dtype=bool))
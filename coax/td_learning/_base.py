@@ -7,7 +7,9 @@ import optax
 import chex
 
 from .._base.mixins import RandomStateMixin
-from ..utils import get_grads_diagnostics, is_policy, is_stochastic, is_qfunction, is_vfunction, jit
+from ..utils import (
+    get_grads_diagnostics, get_transition_batch, is_policy, is_stochastic, is_qfunction,
+    is_vfunction, jit)
 from ..value_losses import huber, quantile_huber
 from ..regularizers import Regularizer
 from ..proba_dists import DiscretizedIntervalDist, EmpiricalQuantileDist
@@ -180,6 +182,51 @@ class BaseTDLearning(ABC, RandomStateMixin):
             self._f.params, self.target_params, self._f.function_state, self.target_function_state,
             self._f.rng, transition_batch)
 
+    def warmup(self, batch_sizes=(32,), env=None):
+        r"""
+
+        Compile the gradient computation, the TD-error computation and the parameter update ahead of
+        time (AOT), so that the first calls to :attr:`update` don't have to wait for XLA.
+
+        Parameters
+        ----------
+        batch_sizes : sequence of positive ints, optional
+
+            The sizes of the transition batches to compile for.
+
+        env : gymnasium environment, optional
+
+            An environment (or any object with :code:`observation_space` and :code:`action_space`
+            attributes) that determines the shapes of the example transitions. This defaults to the
+            function approximator itself, but it must be provided for state value functions, which
+            don't have an :code:`action_space`.
+
+        Returns
+        -------
+        report : dict
+
+            The compile time (in seconds) per function and batch size.
+
+        """
+        env = self._f if env is None else env
+        if not hasattr(env, 'action_space'):
+            raise TypeError("env must be provided, because the function approximator has no "
+                            "action_space")
+
+        rng = jax.random.PRNGKey(0)  # dummy key, so that warmup doesn't advance self._f.rng
+        report = {}
+        for batch_size in batch_sizes:
+            transition_batch = get_transition_batch(
+                env, batch_size, random_seed=self._f.random_seed)
+            args = (self._f.params, self.target_params, self._f.function_state,
+                    self.target_function_state, rng, transition_batch)
+            report[f'grads_and_metrics[batch_size={batch_size}]'] = \
+                self._grads_and_metrics_func.warmup(*args)
+            report[f'td_error[batch_size={batch_size}]'] = self._td_error_func.warmup(*args)
+        report['apply_grads'] = self._apply_grads_func.warmup(
+            self.optimizer, self.optimizer_state, self._f.params, self._f.params)
+        return report
+
     @property
     def optimizer(self):
         return self._optimizer
@@ -5,7 +5,7 @@ from optax import sgd
 from .._base.test_case import TestCase
 from .._core.q import Q
 from .._core.policy import Policy
-from ..utils import get_transition_batch
+from ..utils import get_transition_batch, enable_jit_profiling, disable_jit_profiling
 from ._qlearning import QLearning
 
 
@@ -99,3 +99,23 @@ class TestQLearning(TestCase):
         msg = r"pi_targ must be a Policy, got: .*"
         with self.assertRaisesRegex(TypeError, msg):
             QLearning(q, q_targ)
+
+    def test_warmup(self):
+        env = self.env_discrete
+        q = Q(self.func_q_type1, env, random_seed=11)
+        updater = QLearning(q, q_targ=q.copy(), optimizer=sgd(1.0))
+        report = updater.warmup(batch_sizes=(1,))
+        self.assertEqual(set(report), {
+            'grads_and_metrics[batch_size=1]', 'td_error[batch_size=1]', 'apply_grads'})
+
+        # warmup doesn't consume any random keys
+        self.assertArrayAlmostEqual(q.rng, Q(self.func_q_type1, env, random_seed=11).rng)
+
+        # the first update doesn't need to retrace
+        enable_jit_profiling()
+        try:
+            updater.update(self.transition_discrete)
+        finally:
+            disable_jit_profiling()
+        self.assertEqual(updater._grads_and_metrics_func._num_traces, 0)
+        self.assertEqual(updater._apply_grads_func._num_traces, 0)
@@ -23,14 +23,18 @@ This is a collection of utility (helper) functions used throughout the package.
     coax.utils.default_preprocessor
     coax.utils.diff_transform
     coax.utils.diff_transform_matrix
+    coax.utils.disable_jit_profiling
     coax.utils.docstring
     coax.utils.double_relu
     coax.utils.dump
     coax.utils.dumps
+    coax.utils.enable_compilation_cache
+    coax.utils.enable_jit_profiling
     coax.utils.enable_logging
     coax.utils.generate_gif
     coax.utils.get_env_attr
     coax.utils.get_grads_diagnostics
+    coax.utils.get_jit_profile
     coax.utils.get_magnitude_quantiles
     coax.utils.get_transition_batch
     coax.utils.has_env_attr
@@ -80,14 +84,18 @@ Object Reference
 .. autofunction:: coax.utils.default_preprocessor
 .. autofunction:: coax.utils.diff_transform
 .. autofunction:: coax.utils.diff_transform_matrix
+.. autofunction:: coax.utils.disable_jit_profiling
 .. autofunction:: coax.utils.docstring
 .. autofunction:: coax.utils.double_relu
 .. autofunction:: coax.utils.dump
 .. autofunction:: coax.utils.dumps
+.. autofunction:: coax.utils.enable_compilation_cache
+.. autofunction:: coax.utils.enable_jit_profiling
 .. autofunction:: coax.utils.enable_logging
 .. autofunction:: coax.utils.generate_gif
 .. autofunction:: coax.utils.get_env_attr
 .. autofunction:: coax.utils.get_grads_diagnostics
+.. autofunction:: coax.utils.get_jit_profile
 .. autofunction:: coax.utils.get_magnitude_quantiles
 .. autofunction:: coax.utils.get_transition_batch
 .. autofunction:: coax.utils.has_env_attr
@@ -147,7 +155,13 @@ from ._array import (
     tree_ravel,
     unvectorize,
 )
-from ._jit import jit
+from ._jit import (
+    disable_jit_profiling,
+    enable_compilation_cache,
+    enable_jit_profiling,
+    get_jit_profile,
+    jit,
+)
 from ._misc import (
     docstring,
     dump,
@@ -191,14 +205,18 @@ __all__ = (
     'default_preprocessor',
     'diff_transform',
     'diff_transform_matrix',
+    'disable_jit_profiling',
     'docstring',
     'double_relu',
     'dump',
     'dumps',
+    'enable_compilation_cache',
+    'enable_jit_profiling',
     'enable_logging',
     'generate_gif',
     'get_env_attr',
     'get_grads_diagnostics',
+    'get_jit_profile',
     'get_magnitude_quantiles',
     'get_transition_batch',
     'has_env_attr',
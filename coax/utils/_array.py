@@ -252,20 +252,13 @@ def chunks_pow2(transition_batch):
         A smaller chunk with batch_size equal to a power of 2.
 
     """
-    def leafslice(start, stop):
-        def func(leaf):
-            if leaf is None:
-                return None
-            return leaf[start:stop]
-        return func
-
     binary = bin(transition_batch.batch_size).replace('0b', '')
     start = 0
     for i, b in enumerate(binary, 1):
         if b == '0':
             continue
         stop = start + 2 ** (len(binary) - i)
-        yield jax.tree_map(leafslice(start, stop), transition_batch)
+        yield transition_batch.slice(start, stop)
         start = stop
 
 
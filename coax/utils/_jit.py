@@ -1,16 +1,160 @@
-
+import itertools
+import os
+import threading
+import warnings
+from collections import defaultdict
+from functools import wraps
 from inspect import signature
+from timeit import default_timer as timer
 
 import jax
 
 
 __all__ = (
     'JittedFunc',
+    'disable_jit_profiling',
+    'enable_compilation_cache',
+    'enable_jit_profiling',
+    'get_jit_profile',
     'jit',
 )
 
 
-def jit(func, static_argnums=(), donate_argnums=()):
+_compilation_cache_dir = None
+_BACKEND_COMPILE_EVENT = '/jax/core/compile/backend_compile_duration'
+_profiling = {
+    'enabled': False, 'warn_after': None, 'listening': False, 'num_compilations': 0,
+    'compile_secs': 0.}
+_profile = {}
+_instance_counters = defaultdict(itertools.count)  # numbers the instances per qualified name
+_local = threading.local()  # keeps track of nested tracing
+
+
+def enable_compilation_cache(cache_dir, min_compile_time_secs=0.):
+    r"""
+
+    Enable JAX's persistent compilation cache, so that compiled functions are reused across
+    processes and restarts.
+
+    This is useful when spinning up many workers (e.g. Ray actors) that all compile the same
+    functions. Once enabled, any :class:`JittedFunc` that is pickled and sent to another process
+    enables the same cache directory in that process as well.
+
+    Parameters
+    ----------
+    cache_dir : str
+
+        The directory in which to store the compiled executables. It is created if it doesn't exist
+        yet. The directory should be shared by all workers, e.g. on the same host.
+
+    min_compile_time_secs : non-negative float, optional
+
+        Only store compiled executables that took at least this long to compile.
+
+    Note that older versions of jax only support the persistent cache on GPU and TPU backends and
+    ignore :code:`min_compile_time_secs`.
+
+    """
+    global _compilation_cache_dir
+    if not (isinstance(min_compile_time_secs, (float, int)) and min_compile_time_secs >= 0):
+        raise TypeError(
+            f"min_compile_time_secs must be a non-negative float, got: {min_compile_time_secs}")
+
+    cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        jax.config.update('jax_persistent_cache_min_compile_time_secs', min_compile_time_secs)
+        jax.config.update('jax_compilation_cache_dir', cache_dir)
+    except AttributeError:  # older versions of jax, which don't support min_compile_time_secs
+        from jax.experimental.compilation_cache import compilation_cache
+        if compilation_cache.is_initialized():
+            compilation_cache.reset_cache()
+        compilation_cache.initialize_cache(cache_dir)
+    _compilation_cache_dir = cache_dir
+
+
+def enable_jit_profiling(warn_after=None):
+    r"""
+
+    Start counting the traces and compilations of all :class:`JittedFunc` instances, e.g. the
+    ones created by :func:`coax.utils.jit`.
+
+    Each trace is recorded together with the abstract input signature (shapes, dtypes and static
+    arguments) that caused it, which makes it easy to find out what triggers unexpected retraces,
+    e.g. varying batch sizes or Python scalars that change type. Calls that end up tracing are
+    timed as well, and so is the XLA compilation that they trigger. The results can be inspected
+    with :func:`coax.utils.get_jit_profile`. While profiling is enabled,
+    :class:`coax.wrappers.TrainMonitor` also records the number of traces and compilations per
+    episode as metrics, as well as the time spent on them.
+
+    Note that calls from within other jitted functions are attributed to the outermost function.
+
+    Parameters
+    ----------
+    warn_after : positive int, optional
+
+        If provided, a warning is raised whenever a single jitted function has been traced more than
+        this many times. The warning lists the inputs that changed compared to the previous trace.
+
+    """
+    if not (warn_after is None or (isinstance(warn_after, int) and warn_after > 0)):
+        raise TypeError(f"warn_after must be a positive int, got: {warn_after}")
+    if not _profiling['listening']:
+        jax.monitoring.register_event_duration_secs_listener(_on_event_duration)
+        _profiling['listening'] = True
+    _profiling['enabled'] = True
+    _profiling['warn_after'] = warn_after
+
+
+def disable_jit_profiling():
+    r"""
+
+    Stop counting traces and compilations, see :func:`coax.utils.enable_jit_profiling`.
+
+    """
+    _profiling['enabled'] = False
+
+
+def get_jit_profile(reset=False, events=True):
+    r"""
+
+    Get the traces and compilations that were recorded since profiling was enabled, see
+    :func:`coax.utils.enable_jit_profiling`.
+
+    Parameters
+    ----------
+    reset : bool, optional
+
+        Whether to clear the recorded profile.
+
+    events : bool, optional
+
+        Whether to include the list of individual traces. Leave this out to only get the running
+        totals, e.g. when polling the profile periodically.
+
+    Returns
+    -------
+    profile : dict
+
+        The profile per jitted function instance, keyed by :attr:`JittedFunc.name`. Each entry is a
+        dict with keys: ``num_traces``, ``num_compilations``, ``trace_secs`` (time spent tracing),
+        ``compile_secs`` (time spent in XLA compilation), ``total_secs`` (wall time of the calls
+        that traced) and, if requested, ``events``. The latter is a list with one dict per trace,
+        containing the ``signature`` that caused it, as well as its ``num_compilations``,
+        ``trace_secs``, ``compile_secs`` and ``total_secs``.
+
+    """
+    profile = {}
+    for name, stats in _profile.items():
+        profile[name] = {k: v for k, v in stats.items() if k != 'events'}
+        if events:
+            profile[name]['events'] = [dict(event) for event in stats['events']]
+    if reset:
+        _profile.clear()
+    return profile
+
+
+def jit(func, static_argnums=(), donate_argnums=(), name=None):
     r"""
 
     An alternative of :func:`jax.jit` that returns a picklable JIT-compiled function.
@@ -36,6 +180,12 @@ def jit(func, static_argnums=(), donate_argnums=()):
 
         To be donated arguments, see :func:`jax.jit`.
 
+    name : str, optional
+
+        The name under which the function is recorded by :func:`coax.utils.enable_jit_profiling`.
+        Defaults to the qualified name of :code:`func`, followed by a number that distinguishes
+        instances that wrap functions with the same qualified name, e.g. :code:`'func#0'`.
+
     Returns
     -------
     jitted_func : JittedFunc
@@ -43,21 +193,57 @@ def jit(func, static_argnums=(), donate_argnums=()):
         A picklable JIT-compiled function.
 
     """
-    return JittedFunc(func, static_argnums, donate_argnums)
+    return JittedFunc(func, static_argnums, donate_argnums, name)
 
 
 class JittedFunc:
-    __slots__ = ('func', 'static_argnums', 'donate_argnums', '_jitted_func')
+    __slots__ = (
+        'func', 'static_argnums', 'donate_argnums', '_name', '_default_name', '_jitted_func',
+        '_num_traces', '_last_signature')
 
-    def __init__(self, func, static_argnums=(), donate_argnums=()):
+    def __init__(self, func, static_argnums=(), donate_argnums=(), name=None):
         self.func = func
         self.static_argnums = static_argnums
         self.donate_argnums = donate_argnums
+        self._name = name
         self._init_jitted_func()
 
     def __call__(self, *args, **kwargs):
+        if _profiling['enabled'] and not getattr(_local, 'depth', 0):
+            return self._profiled_call(self._jitted_func, *args, **kwargs)
         return self._jitted_func(*args, **kwargs)
 
+    def warmup(self, *args, **kwargs):
+        r"""
+
+        Compile the function ahead of time (AOT) for the given input signature, without running it.
+
+        Subsequent calls with inputs of the same shapes and dtypes skip the XLA compilation.
+
+        Parameters
+        ----------
+        \*args, \*\*kwargs
+
+            Example inputs. Non-static arguments may be passed as :class:`jax.ShapeDtypeStruct`
+            instances instead of arrays.
+
+        Returns
+        -------
+        compile_time : float
+
+            The time it took to lower and compile the function, in seconds.
+
+        """
+        def compile(*args, **kwargs):
+            return self._jitted_func.lower(*args, **kwargs).compile()
+
+        t0 = timer()
+        if _profiling['enabled']:
+            self._profiled_call(compile, *args, **kwargs)
+        else:
+            compile(*args, **kwargs)
+        return timer() - t0
+
     @property
     def __signature__(self):
         return signature(self.func)
@@ -66,14 +252,115 @@ class JittedFunc:
         return self.__class__.__name__ + str(self.__signature__)
 
     def __getstate__(self):
-        return self.func, self.static_argnums, self.donate_argnums
+        return (
+            self.func, self.static_argnums, self.donate_argnums, _compilation_cache_dir, self._name)
 
     def __setstate__(self, state):
-        self.func, self.static_argnums, self.donate_argnums = state
+        self.func, self.static_argnums, self.donate_argnums, *extra = state
+        cache_dir, self._name = (extra + [None, None])[:2]
+        if cache_dir is not None and _compilation_cache_dir is None:
+            enable_compilation_cache(cache_dir)  # e.g. when unpickled in a remote worker
         self._init_jitted_func()
 
+    @property
+    def name(self):
+        r""" The name under which this function is recorded by the JIT profiler. """
+        return self._default_name if self._name is None else self._name
+
     def _init_jitted_func(self):
+        qualname = getattr(self.func, '__qualname__', None) or repr(self.func)
+        qualname = qualname.replace('.<locals>', '')
+        self._default_name = f'{qualname}#{next(_instance_counters[qualname])}'
+        self._num_traces = 0
+        self._last_signature = None
+        func = self.func
+
+        @wraps(func)
+        def traced_func(*args, **kwargs):
+            # this only runs while tracing, so there's no overhead once the function is compiled
+            depth = getattr(_local, 'depth', 0)
+            if not _profiling['enabled'] or depth:
+                return func(*args, **kwargs)
+            _local.depth = depth + 1
+            t0 = timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _local.depth = depth
+                self._record_trace(args, kwargs, timer() - t0)
+
         self._jitted_func = jax.jit(
-            self.func,
+            traced_func,
             static_argnums=self.static_argnums,
             donate_argnums=self.donate_argnums)
+
+    def _profiled_call(self, func, *args, **kwargs):
+        num_traces = self._num_traces
+        num_compilations, compile_secs = _profiling['num_compilations'], _profiling['compile_secs']
+        t0 = timer()
+        out = func(*args, **kwargs)
+        if self._num_traces > num_traces:
+            stats = _profile[self.name]
+            event = stats['events'][-1]
+            event['num_compilations'] = _profiling['num_compilations'] - num_compilations
+            event['compile_secs'] = _profiling['compile_secs'] - compile_secs
+            event['total_secs'] = timer() - t0
+            for k in ('num_compilations', 'compile_secs', 'total_secs'):
+                stats[k] += event[k]
+        return out
+
+    def _record_trace(self, args, kwargs, trace_secs):
+        sig = _abstract_signature(self.func, args, kwargs)
+        stats = _profile.setdefault(self.name, {
+            'num_traces': 0, 'num_compilations': 0, 'trace_secs': 0., 'compile_secs': 0.,
+            'total_secs': 0., 'events': []})
+        stats['num_traces'] += 1
+        stats['trace_secs'] += trace_secs
+        stats['events'].append({
+            'signature': sig, 'num_compilations': 0, 'trace_secs': trace_secs,
+            'compile_secs': 0., 'total_secs': 0.})
+
+        self._num_traces += 1
+        warn_after = _profiling['warn_after']
+        if warn_after is not None and self._num_traces > warn_after:
+            old = self._last_signature or {}
+            diff = {
+                k: (old.get(k), sig.get(k)) for k in sorted(set(old) | set(sig))
+                if old.get(k) != sig.get(k)}
+            warnings.warn(
+                f"{self.name} has been traced {self._num_traces} times; the inputs that changed "
+                f"since the previous trace are (old, new): {diff}")
+        self._last_signature = sig
+
+
+def _abstract_signature(func, args, kwargs):
+    """ flat dict {input path: abstract value}, e.g. {'S[0]': 'float32[32,4]'} """
+    try:
+        names = list(signature(func).parameters)
+    except (TypeError, ValueError):
+        names = []
+    named_args = [(names[i] if i < len(names) else f'args[{i}]', x) for i, x in enumerate(args)]
+    named_args += list(kwargs.items())
+
+    sig = {}
+    for name, arg in named_args:
+        leaves, _ = jax.tree_util.tree_flatten_with_path(arg)
+        for path, leaf in leaves:
+            sig[name + jax.tree_util.keystr(path)] = _abstract_value(leaf)
+    return sig
+
+
+def _abstract_value(x):
+    if isinstance(x, jax.core.Tracer):
+        aval = x.aval
+        shape = ','.join(map(str, getattr(aval, 'shape', ())))
+        weak = ' (weak)' if getattr(aval, 'weak_type', False) else ''
+        return f"{getattr(aval, 'dtype', aval)}[{shape}]{weak}"
+    r = repr(x)  # static argument
+    return r if len(r) <= 80 else r[:77] + '...'
+
+
+def _on_event_duration(event, duration, **kwargs):
+    if event == _BACKEND_COMPILE_EVENT and _profiling['enabled']:
+        _profiling['num_compilations'] += 1
+        _profiling['compile_secs'] += duration
@@ -0,0 +1,74 @@
+import pickle
+
+import jax
+import numpy as onp
+import pytest
+
+from . import _jit
+from ._jit import jit
+
+
+def func(x, n):
+    return x * n
+
+
+def test_warmup():
+    f = jit(func, static_argnums=1)
+    compile_time = f.warmup(jax.ShapeDtypeStruct((3,), 'float32'), 2)
+    assert isinstance(compile_time, float) and compile_time > 0
+    onp.testing.assert_array_equal(f(onp.ones(3, 'float32'), 2), [2, 2, 2])
+
+
+def test_pickle_enables_compilation_cache(monkeypatch):
+    enabled = []
+    monkeypatch.setattr(_jit, 'enable_compilation_cache', enabled.append)
+    monkeypatch.setattr(_jit, '_compilation_cache_dir', '/tmp/coax_compilation_cache')
+    s = pickle.dumps(jit(func, static_argnums=1))
+    monkeypatch.setattr(_jit, '_compilation_cache_dir', None)  # e.g. a fresh remote process
+    f = pickle.loads(s)
+    assert enabled == ['/tmp/coax_compilation_cache']
+    assert f(3., 2) == 6.
+
+
+def test_jit_profiling():
+    f = jit(func, static_argnums=1)
+    _jit.enable_jit_profiling(warn_after=2)
+    try:
+        with pytest.warns(UserWarning, match=r"'x': \('float32\[4\]', 'float32\[8\]'\)"):
+            for size in (2, 2, 4, 8):
+                f(onp.ones(size, 'float32'), 3)
+        f(onp.ones(8, 'float32'), 3)  # no retrace
+    finally:
+        _jit.disable_jit_profiling()
+        profile = _jit.get_jit_profile(reset=True)
+
+    stats = profile[f.name]
+    assert stats['num_traces'] == 3
+    assert stats['num_compilations'] == 3
+    assert stats['total_secs'] >= stats['trace_secs'] + stats['compile_secs']
+    assert stats['trace_secs'] > 0 and stats['compile_secs'] > 0
+    assert stats['events'][0]['signature'] == {'x': 'float32[2]', 'n': '3'}
+    assert _jit.get_jit_profile() == {}
+
+    # no longer recording
+    f(onp.ones(16, 'float32'), 3)
+    assert _jit.get_jit_profile() == {}
+
+
+def test_jit_profiling_per_instance():
+    f1, f2, f3 = jit(func, static_argnums=1), jit(func, static_argnums=1), jit(func, name='f3')
+    assert f1.name.startswith('func#') and f1.name != f2.name
+    assert f3.name == pickle.loads(pickle.dumps(f3)).name == 'f3'
+
+    _jit.enable_jit_profiling()
+    try:
+        f1(onp.ones(2, 'float32'), 3)
+        f2(onp.ones(2, 'float32'), 3)
+        f2(onp.ones(4, 'float32'), 3)
+    finally:
+        _jit.disable_jit_profiling()
+        profile = _jit.get_jit_profile(reset=True, events=False)
+
+    assert profile[f1.name]['num_traces'] == 1
+    assert profile[f2.name]['num_traces'] == 2
+    assert 'events' not in profile[f2.name]
@@ -14,7 +14,7 @@ from gymnasium.spaces import Discrete
 from tensorboardX import SummaryWriter
 
 from .._base.mixins import LoggerMixin
-from ..utils import enable_logging
+from ..utils import enable_logging, get_jit_profile
 
 
 __all__ = (
@@ -166,10 +166,12 @@ class TrainMonitor(Wrapper, LoggerMixin):
         self._ep_metrics = {}
         self._ep_actions = StreamingSample(maxlen=1000)
         self._period = {'T': {}, 'ep': {}}
+        self._jit_totals = _jit_totals()
 
     def reset(self):
         # write logs from previous episode:
         if self.ep:
+            self._record_jit_metrics()
             self._write_episode_logs()
 
         # increment global counters:
@@ -301,6 +303,22 @@ class TrainMonitor(Wrapper, LoggerMixin):
             if hasattr(self, '_tensorboard'):
                 del self._tensorboard
 
+    def _record_jit_metrics(self):
+        # only if jit profiling is enabled, see coax.utils.enable_jit_profiling
+        totals, prev = _jit_totals(), getattr(self, '_jit_totals', None)
+        if totals is None:
+            return
+        if prev is None or any(t < p for t, p in zip(totals, prev)):
+            prev = (0, 0, 0., 0.)  # the profile was reset
+        num_traces, num_compilations, trace_secs, compile_secs = (
+            t - p for t, p in zip(totals, prev))
+        self._jit_totals = totals
+        self.record_metrics({
+            'jit/num_traces': num_traces,
+            'jit/num_compilations': num_compilations,
+            'jit/trace_time_ms': 1000 * trace_secs,
+            'jit/compile_time_ms': 1000 * compile_secs})
+
     def _write_episode_logs(self):
         metrics = (
             f'{k:s}: {float(x) / n:.3g}'
@@ -310,6 +328,7 @@ class TrainMonitor(Wrapper, LoggerMixin):
                 or str(k).endswith('/entropy')
                 or str(k).endswith('/kl_div')
                 or str(k).startswith('throughput/')
+                or str(k).startswith('jit/')
             )
         )
         self.logger.info(
@@ -418,3 +437,12 @@ class TrainMonitor(Wrapper, LoggerMixin):
         with lz4.frame.open(filepath, 'rb') as f:
             counters = pickle.loads(f.read())
         self.set_counters(counters)
+
+
+def _jit_totals():
+    profile = get_jit_profile(events=False)  # only the running totals per jitted function
+    if not profile:
+        return None
+    return tuple(
+        sum(stats[k] for stats in profile.values())
+        for k in ('num_traces', 'num_compilations', 'trace_secs', 'compile_secs'))